@@ -0,0 +1,444 @@
+# Code for the binaryfile class (compact binary data files with typed columns)
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import os
+	import json
+	import numpy
+	from .misc	import misc
+except ImportError as e:
+	print (e)
+	raise
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / binaryfile class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+# format name and version written to the header:
+_FORMAT  = 'RUEDI-BINARY'
+_VERSION = 1
+
+# columns of the record tables (name, data type). Columns with data type 'i2' (except position and mz_offset) are codes of strings in the string dictionary of the file:
+_COMMON = [ ( 't' , '<f8' ) , ( 'source' , '<i2' ) , ( 'label' , '<i2' ) ]
+_TABLES = {
+	'PEAK':        _COMMON + [ ( 'mz' , '<f8' ) , ( 'intensity' , '<f8' ) , ( 'unit' , '<i2' ) , ( 'detector' , '<i2' ) , ( 'gate' , '<f8' ) , ( 'type' , '<i2' ) ],
+	'ZERO':        _COMMON + [ ( 'mz' , '<f8' ) , ( 'mz_offset' , '<i2' ) , ( 'intensity' , '<f8' ) , ( 'unit' , '<i2' ) , ( 'detector' , '<i2' ) , ( 'gate' , '<f8' ) , ( 'type' , '<i2' ) ],
+	'SCAN':        _COMMON + [ ( 'unit' , '<i2' ) , ( 'detector' , '<i2' ) , ( 'gate' , '<f8' ) , ( 'first' , '<i8' ) , ( 'n' , '<i8' ) ],
+	'PRESSURE':    _COMMON + [ ( 'value' , '<f8' ) , ( 'unit' , '<i2' ) ],
+	'TEMPERATURE': _COMMON + [ ( 'value' , '<f8' ) , ( 'unit' , '<i2' ) ],
+	'POSITION':    _COMMON + [ ( 'position' , '<i2' ) ],
+	'LINE':        _COMMON + [ ( 'identifier' , '<i2' ) , ( 'first' , '<i8' ) , ( 'n' , '<i8' ) ],
+}
+
+# variable-length values of the records (SCAN: mz and intensity values of each scan, LINE: UTF-8 text of each line). The 'first' and 'n' columns of the record table give the index of the first value and the number of values of each record:
+_VALUES = {
+	'SCAN': [ ( 'mz' , '<f8' ) , ( 'intensity' , '<f8' ) ],
+	'LINE': [ ( 'data' , 'u1' ) ],
+}
+
+
+class binaryfile:
+	"""
+	ruediPy class for writing data to compact binary files. The data are stored in a directory with one append-only file for each column of each record type (PEAK, ZERO, SCAN, PRESSURE, TEMPERATURE, POSITION, and LINE for all other records in their text form), plus a self-describing header (header.json) with the data types of the columns and the dictionary of the strings used in the records (caller, label, unit, detector, etc. are stored as int16 codes into the string dictionary).
+
+	The column files are raw little-endian arrays, so they can be loaded with numpy.memmap without any parsing (see binaryfile.load()).
+
+	The binaryfile objects are normally used by datafile objects (see datafile class, file_format option).
+	"""
+
+
+	########################################################################################################
+
+
+	def __init__(self,path):
+		'''
+		binaryfile.__init__(path)
+
+		Initialize BINARYFILE object, create directory for the data files.
+
+		INPUT:
+		path: path of the directory for the data files (string, the directory is created if it does not exist yet)
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._path = path
+		if not os.path.isdir(path):
+			os.makedirs(path)
+
+		# string dictionary:
+		self._strings = []
+		self._codes = {}
+		self._header_dirty = True
+
+		# buffered records (not yet written to disk) and values of each table:
+		self._rows = { k:[] for k in _TABLES.keys() }
+		self._values = { k:[] for k in _VALUES.keys() }
+		self._num_values = { k:0 for k in _VALUES.keys() }
+
+		# file objects of the column files (opened on first use):
+		self._files = {}
+		self._size = 0 # number of bytes written to the column files
+
+		self._write_header()
+
+
+	########################################################################################################
+
+
+	def label(self):
+		'''
+		label = binaryfile.label()
+
+		Return label / name of the BINARYFILE object
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		label: label / name (string)
+		'''
+
+		return 'BINARYFILE'
+
+
+	########################################################################################################
+
+
+	def warning(self,msg):
+		'''
+		binaryfile.warning(msg)
+
+		Issue warning about issues related to the binary file.
+
+		INPUT:
+		msg: warning message (string)
+
+		OUTPUT:
+		(none)
+		'''
+
+		misc.warnmessage ('[' + self.label() + '] ' + msg)
+
+
+	########################################################################################################
+
+
+	def name(self):
+		'''
+		n = binaryfile.name()
+
+		Return the path of the data directory.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		n: path (string)
+		'''
+
+		return self._path
+
+
+	########################################################################################################
+
+
+	def size(self):
+		'''
+		n = binaryfile.size()
+
+		Return the number of bytes written to the column files (not including buffered records, see binaryfile.flush()).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		n: number of bytes (integer)
+		'''
+
+		return self._size
+
+
+	########################################################################################################
+
+
+	def _code(self,s):
+		# return code of string s in the string dictionary (add s to the dictionary if it is not there yet):
+		if s is None:
+			return -1
+		c = self._codes.get(s)
+		if c is None:
+			if len(self._strings) >= 32767:
+				raise ValueError('too many different strings in binaryfile')
+			c = self._codes[s] = len(self._strings)
+			self._strings.append(s)
+			self._header_dirty = True
+		return c
+
+
+	########################################################################################################
+
+
+	def _write_header(self):
+		# write header file (write to a temporary file first, so that the header is never incomplete):
+		h = {
+			'format': _FORMAT,
+			'version': _VERSION,
+			'byteorder': 'little',
+			'tables': { k:{ 'columns': c , 'values': _VALUES.get(k,[]) } for k,c in _TABLES.items() },
+			'files': '<TABLE>.<COLUMN>.bin (values: <TABLE>_values.<COLUMN>.bin)',
+			'strings': self._strings,
+		}
+		fn = os.path.join(self._path,'header.json')
+		with open(fn + '.tmp','w') as f:
+			json.dump(h,f,indent=1)
+		os.replace(fn + '.tmp',fn)
+		self._header_dirty = False
+
+
+	########################################################################################################
+
+
+	def _file(self,fn):
+		# return file object for appending to column file fn:
+		f = self._files.get(fn)
+		if f is None:
+			f = self._files[fn] = open( os.path.join(self._path,fn) , 'ab' )
+		return f
+
+
+	########################################################################################################
+
+
+	def _add_values(self,table,*x):
+		# add variable-length values of a record, return index of first value and number of values:
+		first = self._num_values[table]
+		n = len(x[0])
+		self._values[table].append(x)
+		self._num_values[table] = first + n
+		return first,n
+
+
+	########################################################################################################
+
+
+	def write_peak(self,caller,label,mz,intensity,unit,det,gate,timestmp,peaktype=None):
+		'''
+		binaryfile.write_peak(caller,label,mz,intensity,unit,det,gate,timestmp,peaktype=None)
+
+		Add PEAK record (see datafile.write_peak()).
+		'''
+
+		self._rows['PEAK'].append( ( timestmp , self._code(caller) , self._code(label) , mz , intensity , self._code(unit) , self._code(det.replace(' ','').upper()) , gate , self._code(peaktype.upper() if peaktype else None) ) )
+
+
+	########################################################################################################
+
+
+	def write_zero(self,caller,label,mz,mz_offset,intensity,unit,det,gate,timestmp,zerotype=None):
+		'''
+		binaryfile.write_zero(caller,label,mz,mz_offset,intensity,unit,det,gate,timestmp,zerotype=None)
+
+		Add ZERO record (see datafile.write_zero()).
+		'''
+
+		self._rows['ZERO'].append( ( timestmp , self._code(caller) , self._code(label) , mz , mz_offset , intensity , self._code(unit) , self._code(det.replace(' ','').upper()) , gate , self._code(zerotype.upper() if zerotype else None) ) )
+
+
+	########################################################################################################
+
+
+	def write_scan(self,caller,label,mz,intensity,unit,det,gate,timestmp):
+		'''
+		binaryfile.write_scan(caller,label,mz,intensity,unit,det,gate,timestmp)
+
+		Add SCAN record (see datafile.write_scan()).
+		'''
+
+		first,n = self._add_values( 'SCAN' , numpy.asarray(mz,dtype='<f8') , numpy.asarray(intensity,dtype='<f8') )
+		self._rows['SCAN'].append( ( timestmp , self._code(caller) , self._code(label) , self._code(unit) , self._code(det.replace(' ','').upper()) , gate , first , n ) )
+
+
+	########################################################################################################
+
+
+	def write_pressure(self,caller,label,value,unit,timestmp):
+		'''
+		binaryfile.write_pressure(caller,label,value,unit,timestmp)
+
+		Add PRESSURE record (see datafile.write_pressure()).
+		'''
+
+		self._rows['PRESSURE'].append( ( timestmp , self._code(caller) , self._code(label) , value , self._code(unit) ) )
+
+
+	########################################################################################################
+
+
+	def write_temperature(self,caller,label,value,unit,timestmp):
+		'''
+		binaryfile.write_temperature(caller,label,value,unit,timestmp)
+
+		Add TEMPERATURE record (see datafile.write_temperature()).
+		'''
+
+		self._rows['TEMPERATURE'].append( ( timestmp , self._code(caller) , self._code(label) , value , self._code(unit) ) )
+
+
+	########################################################################################################
+
+
+	def write_valve_pos(self,caller,label,position,timestmp):
+		'''
+		binaryfile.write_valve_pos(caller,label,position,timestmp)
+
+		Add POSITION record (see datafile.write_valve_pos()).
+		'''
+
+		self._rows['POSITION'].append( ( timestmp , self._code(caller) , self._code(label) , position ) )
+
+
+	########################################################################################################
+
+
+	def write_line(self,caller,label,identifier,data,timestmp):
+		'''
+		binaryfile.write_line(caller,label,identifier,data,timestmp)
+
+		Add LINE record with the data string of a record type without its own table (e.g. COMMENT, ANALYSISTYPE, HISTSCAN; see datafile.writeln()).
+		'''
+
+		first,n = self._add_values( 'LINE' , numpy.frombuffer( data.encode('utf-8') , dtype='u1' ) )
+		self._rows['LINE'].append( ( timestmp , self._code(caller) , self._code(label) , self._code(identifier) , first , n ) )
+
+
+	########################################################################################################
+
+
+	def flush(self,fsync=False):
+		'''
+		binaryfile.flush(fsync=False)
+
+		Write the buffered records to the column files.
+
+		INPUT:
+		fsync (optional): flag to sync the files to the disk (fsync). Default: fsync = False
+
+		OUTPUT:
+		(none)
+		'''
+
+		# header first, so that all string codes in the column files are in the dictionary:
+		if self._header_dirty:
+			self._write_header()
+
+		used = []
+
+		for table,rows in self._rows.items():
+			if len(rows) == 0:
+				continue
+			for j,(col,dt) in enumerate(_TABLES[table]):
+				f = self._file( table + '.' + col + '.bin' )
+				x = numpy.array( [ r[j] for r in rows ] , dtype=dt )
+				x.tofile(f)
+				self._size = self._size + x.nbytes
+				used.append(f)
+			self._rows[table] = []
+
+		for table,vals in self._values.items():
+			if len(vals) == 0:
+				continue
+			for j,(col,dt) in enumerate(_VALUES[table]):
+				f = self._file( table + '_values.' + col + '.bin' )
+				x = numpy.concatenate( [ v[j] for v in vals ] ).astype(dt,copy=False)
+				x.tofile(f)
+				self._size = self._size + x.nbytes
+				used.append(f)
+			self._values[table] = []
+
+		for f in used:
+			f.flush()
+			if fsync:
+				os.fsync(f.fileno())
+
+
+	########################################################################################################
+
+
+	def close(self):
+		'''
+		binaryfile.close()
+
+		Write the buffered records to the column files and close the files.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		self.flush(fsync=True)
+		for f in self._files.values():
+			f.close()
+		self._files = {}
+
+
+	########################################################################################################
+
+
+	@staticmethod
+	def load(path):
+		'''
+		data = binaryfile.load(path)
+
+		Load the data of a binary data directory (memory mapped, the column files are not read into memory or parsed).
+
+		INPUT:
+		path: path of the data directory (string)
+
+		OUTPUT:
+		data: dict with one entry for each record table (PEAK, ZERO, SCAN, PRESSURE, TEMPERATURE, POSITION, LINE), and the string dictionary (data['strings'], list of strings). Each table is a dict of columns (numpy arrays, read-only memmaps). The variable-length values of the SCAN and LINE records are in the columns 'values.mz', 'values.intensity' and 'values.data' (see the 'first' and 'n' columns).
+
+		Example (intensities of all PEAK records at mz=40):
+			D = binaryfile.load('2026-10-17_12-00-00_SAMPLE.rbin')
+			P = D['PEAK']
+			k = P['mz'] == 40
+			t = P['t'][k]
+			y = P['intensity'][k]
+		'''
+
+		with open(os.path.join(path,'header.json')) as f:
+			h = json.load(f)
+		if h.get('format') != _FORMAT:
+			raise ValueError('not a RUEDI binary data directory: ' + path)
+
+		def col(fn,dt):
+			fn = os.path.join(path,fn)
+			if os.path.isfile(fn) and os.path.getsize(fn) >= numpy.dtype(dt).itemsize:
+				return numpy.memmap(fn,dtype=dt,mode='r')
+			return numpy.zeros(0,dtype=dt)
+
+		data = { 'strings': h['strings'] }
+		for table,d in h['tables'].items():
+			x = { c:col( table + '.' + c + '.bin' , dt ) for c,dt in d['columns'] }
+			# columns may have different lengths if writing was interrupted, use the complete records only:
+			n = min( [ len(v) for v in x.values() ] )
+			x = { c:v[:n] for c,v in x.items() }
+			for c,dt in d['values']:
+				x['values.' + c] = col( table + '_values.' + c + '.bin' , dt )
+			data[table] = x
+
+		return data
@@ -0,0 +1,679 @@
+# Code for the bufferplot class (fast updating of data plots)
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import time
+	import numpy
+	from .misc	import misc
+except ImportError as e:
+	print (e)
+	raise
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / bufferplot class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+class bufferplot:
+	"""
+	ruediPy class for fast updating of data plots (e.g. plots of data buffers) in a matplotlib axes object. Each data series is plotted by a line that is created once and then only updated with new data. Long data series are decimated to the first, last, min. and max. value within each pixel column of the plot (so that spikes remain visible), and the decimation is reused until the data change. The legend is rebuilt only if the set of data series changes, the axes limits are changed only if the data do not fit anymore (optionally with some hysteresis), and the plot is updated by blitting if the matplotlib backend supports it (only the data lines, legend and title are redrawn as long as the axes do not change). Updates that come in faster than the max. refresh rate are skipped, and the plot is then updated by a timer of the matplotlib canvas once the refresh interval has passed (so that the last update is not lost if no further updates follow).
+	"""
+
+
+	# default max. refresh rate (updates per second):
+	default_max_rate = 5
+
+
+	########################################################################################################
+
+
+	def __init__( self , ax , max_rate = None , blit = True , decimate = True ):
+		'''
+		bufferplot.__init__( ax , max_rate = None , blit = True , decimate = True )
+
+		Initialize BUFFERPLOT object.
+
+		INPUT:
+		ax: matplotlib axes object used for the plot
+		max_rate (optional): max. refresh rate (updates per second). Use max_rate = 0 to update the plot every time bufferplot.draw() is called. Default: max_rate = None (use bufferplot.default_max_rate)
+		blit (optional): flag to choose if blitting is used (if supported by the matplotlib backend). Default: blit = True
+		decimate (optional): flag to choose if long data series are decimated (see bufferplot.decimate()). Default: decimate = True
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._ax     = ax
+		self._fig    = ax.figure
+		self._lines  = {}	# data lines (key: series name)
+		self._labels = {}	# legend labels (key: series name)
+		self._legend = None
+		self._legend_keys = None
+		self._legend_kw = None
+		self._scales = None
+		self._bg = None
+		self._full_redraw = True
+		self._last_draw = None
+		self._pending = False
+		self._timer = None	# timer for deferred updates (False if not supported by the matplotlib backend)
+		self._timer_active = False
+		self._decimate = decimate
+		self._decimated = {}	# decimation of data series (key: series name)
+
+		if max_rate is None:
+			max_rate = self.default_max_rate
+		self._max_rate = max_rate
+
+		self._blit = blit and getattr(self._fig.canvas,'supports_blit',False)
+		if self._blit:
+			self._ax.title.set_animated(True)
+			self._fig.canvas.mpl_connect('draw_event',self._on_draw)
+
+
+	########################################################################################################
+
+
+	def line(self,key,*args,**kwargs):
+		'''
+		l = bufferplot.line(key,*args,**kwargs)
+
+		Return the line of a data series (the line is created if it does not exist yet).
+
+		INPUT:
+		key: name of the data series (any hashable object)
+		*args,**kwargs: format string and line properties used to create the line (see matplotlib.axes.Axes.plot())
+
+		OUTPUT:
+		l: matplotlib Line2D object
+		'''
+
+		l = self._lines.get(key)
+		if l is None:
+			l = self._ax.plot( [] , [] , *args , **kwargs )[0]
+			l.set_animated(self._blit)
+			self._lines[key] = l
+			self._full_redraw = True
+		return l
+
+
+	########################################################################################################
+
+
+	def set_data(self,key,x,y,label=None,*args,stamp=None,**kwargs):
+		'''
+		bufferplot.set_data(key,x,y,label=None,*args,stamp=None,**kwargs)
+
+		Set the data of a data series (the line is created if it does not exist yet). If the data series has more points than the plot has pixel columns, it is decimated (see bufferplot.decimate()).
+
+		INPUT:
+		key: name of the data series
+		x,y: data values (x values must be in ascending order for decimation)
+		label (optional): legend label of the data series (string). Default: label = None (no legend entry)
+		*args,**kwargs: format string and line properties used to create the line (see bufferplot.line()). The line properties given in kwargs are also applied if the line already exists.
+		stamp (optional): value that changes whenever the data of the series change (e.g. the timestamp of the last update of a data buffer). As long as the stamp does not change, the decimation of the previous call is reused. This also works if x and y were scaled or shifted (e.g. time relative to now). Default: stamp = None (decimate the data every time)
+
+		OUTPUT:
+		(none)
+		'''
+
+		new = key not in self._lines
+		l = self.line(key,*args,**kwargs)
+		if kwargs and not new:
+			l.set(**kwargs)
+
+		if self._decimate:
+			n = max( int(self._ax.bbox.width) , 100 ) # number of pixel columns
+			if len(x) > 4*n:
+				d = self._decimated.get(key)
+				if ( stamp is None ) or ( d is None ) or not ( d[0] == stamp and d[1] == n and d[2] == len(x) ):
+					d = ( stamp , n , len(x) , self.decimate(x,y,n) )
+					self._decimated[key] = d
+				if d[3] is not None:
+					x = numpy.asarray(x)[d[3]]
+					y = numpy.asarray(y)[d[3]]
+			else:
+				self._decimated.pop(key,None)
+
+		l.set_data(x,y)
+		if label is not None:
+			self._labels[key] = label
+
+
+	########################################################################################################
+
+
+	@staticmethod
+	def decimate(x,y,n):
+		'''
+		k = bufferplot.decimate(x,y,n)
+
+		Decimate data series for plotting: the x range is divided into n buckets of equal width (e.g. one bucket per pixel column of the plot), and the first, last, min. and max. points of each bucket are kept. The plot of the decimated data looks the same as the plot of the full data series (including spikes), but needs at most 4*n points.
+
+		INPUT:
+		x,y: data values (numpy arrays, x values in ascending order)
+		n: number of buckets
+
+		OUTPUT:
+		k: indices of the points to keep (numpy array), or None if the data can't be decimated (x values not finite or not in ascending order)
+		'''
+
+		x = numpy.asarray(x,dtype=float)
+		y = numpy.asarray(y,dtype=float)
+		if len(x) < 2:
+			return None
+		x0 = x[0]
+		x1 = x[-1]
+		if not ( numpy.isfinite(x0) and numpy.isfinite(x1) and x1 > x0 ):
+			return None
+
+		# bucket number of each point:
+		b = ( (x-x0) * (n/(x1-x0)) ).astype(int)
+		numpy.clip(b,0,n-1,out=b)
+		d = numpy.diff(b)
+		if ( d < 0 ).any():
+			return None
+
+		# first and last point of each (non-empty) bucket:
+		first = numpy.flatnonzero( numpy.concatenate( ([True],d > 0) ) )
+		last = numpy.concatenate( (first[1:]-1,[len(x)-1]) )
+
+		# min. and max. point of each bucket (NaN values are ignored):
+		seg = numpy.repeat( numpy.arange(len(first)) , numpy.diff( numpy.concatenate( (first,[len(x)]) ) ) )
+		k = [ first , last ]
+		for f,fill in ( ( numpy.minimum , numpy.inf ) , ( numpy.maximum , -numpy.inf ) ):
+			yy = numpy.where( numpy.isnan(y) , fill , y )
+			ext = f.reduceat(yy,first)
+			i = numpy.flatnonzero( yy == ext[seg] )
+			k.append( i[ numpy.concatenate( ([True],seg[i][1:] > seg[i][:-1]) ) ] ) # first extreme point of each bucket
+
+		return numpy.unique( numpy.concatenate(k) )
+
+
+	########################################################################################################
+
+
+	def keys(self):
+		'''
+		k = bufferplot.keys()
+
+		Return the names of the data series in the plot.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		k: list of data series names
+		'''
+
+		return list(self._lines.keys())
+
+
+	########################################################################################################
+
+
+	def keep_only(self,keys):
+		'''
+		bufferplot.keep_only(keys)
+
+		Remove all data series from the plot, except those given.
+
+		INPUT:
+		keys: names of the data series to keep
+
+		OUTPUT:
+		(none)
+		'''
+
+		keys = set(keys)
+		for k in [ k for k in self._lines if k not in keys ]:
+			self._lines.pop(k).remove()
+			self._labels.pop(k,None)
+			self._decimated.pop(k,None)
+			self._full_redraw = True
+
+
+	########################################################################################################
+
+
+	def legend(self,**kwargs):
+		'''
+		bufferplot.legend(**kwargs)
+
+		Show the legend with the labels of the data series (see bufferplot.set_data()). The legend is rebuilt only if the set of data series changes; otherwise only its labels are updated.
+
+		INPUT:
+		**kwargs: legend properties (see matplotlib.axes.Axes.legend())
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._legend_kw = kwargs
+
+
+	########################################################################################################
+
+
+	def set_title(self,s):
+		'''
+		bufferplot.set_title(s)
+
+		Set the plot title.
+
+		INPUT:
+		s: title (string)
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._ax.title.set_text(s)
+
+
+	########################################################################################################
+
+
+	def set_xlabel(self,s):
+		'''
+		bufferplot.set_xlabel(s)
+
+		Set the x-axis label (the plot is redrawn completely only if the label changes).
+
+		INPUT:
+		s: label (string)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if not self._ax.get_xlabel() == s:
+			self._ax.set_xlabel(s)
+			self._full_redraw = True
+
+
+	########################################################################################################
+
+
+	def set_ylabel(self,s):
+		'''
+		bufferplot.set_ylabel(s)
+
+		Set the y-axis label (the plot is redrawn completely only if the label changes).
+
+		INPUT:
+		s: label (string)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if not self._ax.get_ylabel() == s:
+			self._ax.set_ylabel(s)
+			self._full_redraw = True
+
+
+	########################################################################################################
+
+
+	def set_yscale(self,scale):
+		'''
+		bufferplot.set_yscale(scale)
+
+		Set scale of the y-axis.
+
+		INPUT:
+		scale: scale (string, 'linear' or 'log')
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._ax.set_yscale(scale)
+		self._full_redraw = True
+
+
+	########################################################################################################
+
+
+	def set_yformat(self,fmt):
+		'''
+		bufferplot.set_yformat(fmt)
+
+		Set format of the y-axis tick labels.
+
+		INPUT:
+		fmt: format string, e.g. fmt = '{:.1%}' (see str.format())
+
+		OUTPUT:
+		(none)
+		'''
+
+		from matplotlib.ticker import FuncFormatter
+		self._ax.yaxis.set_major_formatter( FuncFormatter( lambda y, _: fmt.format(y) ) )
+		self._full_redraw = True
+
+
+	########################################################################################################
+
+
+	def tight_layout(self,**kwargs):
+		'''
+		bufferplot.tight_layout(**kwargs)
+
+		Adjust the spacing of the panels in the figure to avoid overlapping labels / titles.
+
+		INPUT:
+		**kwargs: see matplotlib.figure.Figure.tight_layout()
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._fig.tight_layout(**kwargs)
+		self._full_redraw = True
+
+
+	########################################################################################################
+
+
+	def _new_lim(self,cur,lo,hi,log,hysteresis):
+		# return new axis limits for data range lo...hi (None if the current limits can be kept)
+
+		if log:
+			if hi <= 0:
+				return None
+			if lo <= 0:
+				lo = hi/10
+			cur = numpy.log10(cur)
+			lo = numpy.log10(lo)
+			hi = numpy.log10(hi)
+
+		c0,c1 = min(cur),max(cur)
+		if hysteresis > 0:
+			# keep current limits if the data fit and use at least half of the axis range:
+			if ( lo >= c0 ) and ( hi <= c1 ) and ( hi-lo >= 0.5*(c1-c0) ):
+				return None
+			d = hysteresis*(hi-lo)
+			lo = lo-d
+			hi = hi+d
+		if lo == hi:
+			d = 0.05*abs(lo) if log == False and not lo == 0 else 0.5
+			lo = lo-d
+			hi = hi+d
+		if ( lo == c0 ) and ( hi == c1 ):
+			return None
+		if log:
+			return 10**lo,10**hi
+		return lo,hi
+
+
+	########################################################################################################
+
+
+	def set_limits(self,xlim=None,ylim=None,hysteresis=0.0):
+		'''
+		bufferplot.set_limits(xlim=None,ylim=None,hysteresis=0.0)
+
+		Set axis limits. The plot is redrawn completely only if the limits change.
+
+		INPUT:
+		xlim, ylim (optional): data range that should be visible on the x- and y-axis (lower and upper value). Default: None (don't change the limits of the axis)
+		hysteresis (optional): if hysteresis > 0, the limits are only changed if the data range does not fit within the current limits, or if it uses less than half of the axis range. The new limits then include a margin of hysteresis times the data range on both sides, so that the limits don't need to be changed again with every small change of the data range. Default: hysteresis = 0 (always use the given limits)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if xlim is not None:
+			x = self._new_lim( self._ax.get_xlim() , xlim[0] , xlim[1] , self._ax.get_xscale() == 'log' , hysteresis )
+			if x is not None:
+				self._ax.set_xlim(x)
+				self._full_redraw = True
+
+		if ylim is not None:
+			y = self._new_lim( self._ax.get_ylim() , ylim[0] , ylim[1] , self._ax.get_yscale() == 'log' , hysteresis )
+			if y is not None:
+				self._ax.set_ylim(y)
+				self._full_redraw = True
+
+
+	########################################################################################################
+
+
+	def autoscale(self,margin=0.05,hysteresis=0.0):
+		'''
+		bufferplot.autoscale(margin=0.05,hysteresis=0.0)
+
+		Set axis limits to the range of the data in the plot (see also bufferplot.set_limits()).
+
+		INPUT:
+		margin (optional): margin added to the data range on both sides (fraction of the data range). Default: margin = 0.05
+		hysteresis (optional): see bufferplot.set_limits(). Default: hysteresis = 0
+
+		OUTPUT:
+		(none)
+		'''
+
+		xlog = self._ax.get_xscale() == 'log'
+		ylog = self._ax.get_yscale() == 'log'
+		X0 = X1 = Y0 = Y1 = None
+		for l in self._lines.values():
+			x = numpy.asarray(l.get_xdata(),dtype=float)
+			y = numpy.asarray(l.get_ydata(),dtype=float)
+			k = numpy.isfinite(x) & numpy.isfinite(y)
+			if xlog:
+				k = k & (x > 0)
+			if ylog:
+				k = k & (y > 0)
+			if not k.any():
+				continue
+			x = x[k]
+			y = y[k]
+			X0 = x.min() if X0 is None else min(X0,x.min())
+			X1 = x.max() if X1 is None else max(X1,x.max())
+			Y0 = y.min() if Y0 is None else min(Y0,y.min())
+			Y1 = y.max() if Y1 is None else max(Y1,y.max())
+
+		if X0 is None:
+			return
+
+		def pad(lo,hi,log):
+			if log:
+				d = (numpy.log10(hi)-numpy.log10(lo))*margin
+				return lo/10**d,hi*10**d
+			d = (hi-lo)*margin
+			return lo-d,hi+d
+
+		self.set_limits( pad(X0,X1,xlog) , pad(Y0,Y1,ylog) , hysteresis )
+
+
+	########################################################################################################
+
+
+	def invalidate(self):
+		'''
+		bufferplot.invalidate()
+
+		Make sure the plot is redrawn completely with the next update (e.g. after changing the axes outside of the BUFFERPLOT object).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._full_redraw = True
+
+
+	########################################################################################################
+
+
+	def _update_legend(self):
+		# rebuild the legend if the set of data series changed, otherwise update the labels only
+
+		if self._legend_kw is None:
+			return
+
+		keys = [ k for k in self._lines if k in self._labels ]
+		if not keys == self._legend_keys:
+			if self._legend is not None:
+				self._legend.remove()
+				self._legend = None
+			if keys:
+				self._legend = self._ax.legend( [ self._lines[k] for k in keys ] , [ self._labels[k] for k in keys ] , **self._legend_kw )
+				self._legend.set_animated(self._blit)
+			self._legend_keys = keys
+			self._full_redraw = True
+
+		elif self._legend is not None:
+			for txt,k in zip(self._legend.get_texts(),keys):
+				txt.set_text(self._labels[k])
+
+
+	########################################################################################################
+
+
+	def _bbox(self):
+		# region of the figure used for blitting (axes plus title)
+
+		from matplotlib.transforms import Bbox
+		b = self._ax.bbox
+		h = 2.5 * self._ax.title.get_fontsize() * self._fig.dpi / 72.0
+		return Bbox.from_extents( b.x0 , b.y0 , b.x1 , min( b.y1+h , self._fig.bbox.y1 ) )
+
+
+	########################################################################################################
+
+
+	def _draw_animated(self):
+		# draw the artists that are excluded from full redraws (data lines, legend, title)
+
+		for l in self._lines.values():
+			self._ax.draw_artist(l)
+		if self._legend is not None:
+			self._ax.draw_artist(self._legend)
+		self._ax.draw_artist(self._ax.title)
+
+
+	########################################################################################################
+
+
+	def _on_draw(self,event):
+		# the figure was redrawn completely: save background for blitting, draw the animated artists
+
+		if event is not None and not event.canvas == self._fig.canvas:
+			return
+		self._bg = self._fig.canvas.copy_from_bbox(self._bbox())
+		self._draw_animated()
+
+
+	########################################################################################################
+
+
+	def draw(self,force=False):
+		'''
+		ok = bufferplot.draw(force=False)
+
+		Update the plot on screen. If the previous update was less than 1/max_rate seconds ago, the update is skipped (unless force = True), and the plot is updated by a timer once 1/max_rate seconds have passed since the previous update (the timer runs in the event loop of the matplotlib backend, e.g. during plt.pause()).
+
+		INPUT:
+		force (optional): flag to update the plot regardless of the max. refresh rate. Default: force = False
+
+		OUTPUT:
+		ok: flag indicating if the plot was updated (bool)
+		'''
+
+		now = time.monotonic()
+		if ( not force ) and self._max_rate and ( self._last_draw is not None ) and ( now - self._last_draw < 1.0/self._max_rate ):
+			self._pending = True
+			self._schedule( 1.0/self._max_rate - (now - self._last_draw) )
+			return False
+		self._last_draw = now
+		self._pending = False
+
+		self._update_legend()
+
+		# axis scaling changed?
+		s = ( self._ax.get_xscale() , self._ax.get_yscale() )
+		if not s == self._scales:
+			self._scales = s
+			self._full_redraw = True
+
+		canvas = self._fig.canvas
+		if self._blit:
+			if self._full_redraw or self._bg is None:
+				canvas.draw() # this will also draw the animated artists (see bufferplot._on_draw())
+			else:
+				canvas.restore_region(self._bg)
+				self._draw_animated()
+			canvas.blit(self._bbox())
+		else:
+			canvas.draw_idle()
+		canvas.flush_events()
+		self._full_redraw = False
+
+		return True
+
+
+	########################################################################################################
+
+
+	def _schedule(self,delay):
+		# start the timer for a deferred update of the plot (unless it is running already)
+
+		if self._timer is None:
+			try:
+				self._timer = self._fig.canvas.new_timer()
+				self._timer.single_shot = True
+				self._timer.add_callback(self._on_timer)
+			except Exception:
+				self._timer = False # backend does not support timers
+
+		if self._timer and not self._timer_active:
+			self._timer.interval = max( int(round(delay*1000)) , 1 ) # milliseconds
+			self._timer_active = True
+			self._timer.start()
+
+
+	########################################################################################################
+
+
+	def _on_timer(self):
+		# deferred update of the plot (see bufferplot.draw())
+
+		self._timer_active = False
+		if self._pending:
+			try:
+				self.draw(force=True)
+			except Exception as e:
+				misc.warnmessage ( '[BUFFERPLOT] Deferred update of the plot failed (' + str(e) + ').' )
+
+
+	########################################################################################################
+
+
+	def pending(self):
+		'''
+		x = bufferplot.pending()
+
+		Check if the last update was skipped because of the max. refresh rate (see bufferplot.draw()).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		x: flag (bool)
+		'''
+
+		return self._pending
@@ -13,9 +13,16 @@ try:
 	import sys
 	import warnings
 	import os
+	import time
+	import base64
+	import gzip
+	import lzma
+	import numpy
 	from os.path		import expanduser
 
 	from .misc	import misc
+	from .binaryfile	import binaryfile
+	from .datafile_index	import datafile_index
 except ImportError as e:
 	print (e)
 	raise
@@ -24,6 +31,14 @@ except ImportError as e:
 if ( sys.version_info[0] < 3 ):
 	warnings.warn("ruediPy / rams_SRS class is running on Python version < 3. Version 3.0 or newer is recommended!")
 
+
+def _copy(x):
+	# copy of list or numpy array x (for data passed on to the background writer)
+	if hasattr(x,'copy'):
+		return x.copy()
+	return list(x)
+
+
 class datafile:
 	"""
 	ruediPy class for handling of data files.
@@ -32,14 +47,25 @@ class datafile:
 	########################################################################################################
 	
 
-	def __init__(self,pth):
+	def __init__(self,pth,flush_policy='line',flush_lines=100,flush_interval=1.0,fsync=False,writer=None,file_format='text',scan_format='list',rotate_size=None,rotate_interval=None,compression=None,compression_level=None,index=False):
 		"""
-		obj = datafile.__init__(self,pth)
+		obj = datafile.__init__(self,pth,flush_policy='line',flush_lines=100,flush_interval=1.0,fsync=False,writer=None,file_format='text',scan_format='list',rotate_size=None,rotate_interval=None,compression=None,compression_level=None,index=False)
 		
 		Initialize DATAFILE object
 		
 		INPUT:
 		pth: directory path where datafiles are stored (string)
+		flush_policy, flush_lines, flush_interval, fsync (optional): policy for flushing data to the file on disk (see datafile.set_flush_policy()). Default: flush every line (flush_policy = 'line')
+		writer (optional): datawriter object used to write the data in a background thread (see datawriter class). Several datafile objects may use the same datawriter. Default: writer = None (write data directly)
+		file_format (optional): format of the data files (string). Default: file_format = 'text'
+			file_format = 'text': RUEDI text format (*.txt file)
+			file_format = 'binary': compact binary format with typed columns (*.rbin directory, see binaryfile class)
+			file_format = 'text+binary': both formats in parallel
+		scan_format (optional): format of SCAN records in the text file (see datafile.set_scan_format()). Default: scan_format = 'list'
+		rotate_size, rotate_interval (optional): size (bytes of uncompressed data) and time interval (seconds) after which a new file is started automatically (see datafile.set_rotation()). Default: rotate_size = None, rotate_interval = None (no automatic rotation)
+		compression (optional): compression of the text file (string, see datafile.set_compression()). Default: compression = None (no compression)
+		compression_level (optional): compression level (see datafile.set_compression()). Default: compression_level = None (default level of the compression method)
+		index (optional): flag to write a sidecar index file with the record type, time stamp and byte offset of each line of the text file (data file name + '.idx', see datafile_index class). The index allows reading records of given types or time windows without parsing the whole file (see datafile_reader class). Default: index = False
 		
 		OUTPUT:
 		obj: dafafile object
@@ -61,6 +87,47 @@ class datafile:
 		
 		# init empty file ID:
 		self._fid = -1
+
+		# flush policy and state:
+		self._unflushed = 0 # number of lines written since last flush
+		self._last_flush = time.monotonic()
+		self._flushed_offset = 0 # file offset of data flushed to disk
+		self.set_flush_policy(flush_policy,flush_lines,flush_interval,fsync)
+
+		# background writer:
+		self._writer = writer
+
+		# file format(s):
+		file_format = file_format.lower().replace(' ','')
+		if not ( file_format in ( 'text' , 'binary' , 'text+binary' ) ):
+			self.warning ( 'Unknown file format ' + file_format + '. Using file_format = \'text\'...' )
+			file_format = 'text'
+		self._text = 'text' in file_format
+		self._binary = 'binary' in file_format
+		self._bin = None # binaryfile object of the current file
+
+		# format of SCAN records:
+		self.set_scan_format(scan_format)
+
+		# automatic rotation of data files:
+		self._next_args = None # arguments of the last call of datafile.next()
+		self._part = 1 # part number of current file in a series of rotated files
+		self._in_rotation = False
+		self._text_bytes = 0 # size of text data written to the current file
+		self._file_start = time.monotonic()
+		self.set_rotation(rotate_size,rotate_interval)
+
+		# compression of text files:
+		self._filename = ''
+		self.set_compression(compression,compression_level)
+
+		# sidecar index of text files:
+		self._use_index = index
+		self._index = None # datafile_index object of the current file
+
+		# cached line prefixes (key = (caller,label,identifier)) and PEAK / ZERO tails (key = (unit,detector,gate)):
+		self._prefixes = {}
+		self._tails = {}
 		
 	
 	########################################################################################################
@@ -181,6 +248,9 @@ class datafile:
 		if hasattr(self.fid, 'name'):
 			# return the file name
 			return self.fid.name
+		elif hasattr(self.fid, 'write'):
+			# compressed file objects may not have a name
+			return self._filename
 		else:
 			return ''
 	
@@ -188,6 +258,277 @@ class datafile:
 	########################################################################################################
 	
 	
+	def set_scan_format(self,scan_format='list'):
+		"""
+		datafile.set_scan_format(scan_format='list')
+		
+		Set the format of SCAN records in the text file. The compact formats store the m/z values as low, high, step and N (instead of the full list of m/z values), which makes the SCAN records much smaller and faster to write. They are written as SCAN_COMPACT records (format: low=LOW ; high=HIGH ; step=STEP ; N=N ; intensity=VALUES UNIT ; detector=DET ; gate=GATE s). If the m/z values of a scan are not evenly spaced, the SCAN record is written in the list format.
+		
+		INPUT:
+		scan_format (optional): SCAN format (string, default: scan_format = 'list'):
+			scan_format = 'list': list of m/z values and list of intensity values (SCAN records, compatible with older versions)
+			scan_format = 'text': intensity values as comma-separated text with fixed precision (%.6e, or %d for integer values such as raw counts)
+			scan_format = 'base64': intensity values as base64-encoded little-endian float32 values (VALUES = base64-float32:...), or int32 values for integer values such as raw counts (VALUES = base64-int32:...)
+		
+		OUTPUT:
+		(none)
+		"""
+		
+		scan_format = scan_format.lower()
+		if not ( scan_format in ( 'list' , 'text' , 'base64' ) ):
+			self.warning ( 'Unknown SCAN format ' + scan_format + '. Using scan_format = \'list\'...' )
+			scan_format = 'list'
+		self._scan_format = scan_format
+	
+	
+	########################################################################################################
+	
+	
+	def set_rotation(self,size=None,interval=None):
+		"""
+		datafile.set_rotation(size=None,interval=None)
+		
+		Set automatic rotation of data files. If the current file gets larger than the given size, or if it was started longer ago than the given time interval, the file is closed and a new file is started (with the same analysis type, sample name and standard gas information as given to datafile.next()). A ROTATION record is written to the end of the old file and to the beginning of the new file, so that the data of the rotated files can be stitched together for processing:
+			end of old file: DATAFILE ROTATION: part=N ; continued=next
+			start of new file: DATAFILE ROTATION: part=N+1 ; previous=NAME-OF-OLD-FILE
+		
+		INPUT:
+		size (optional): max. size of the data in the file (bytes of text data before compression, or of binary data if there is no text file). Default: size = None (no limit)
+		interval (optional): max. time interval covered by the file (seconds). Default: interval = None (no limit)
+		
+		OUTPUT:
+		(none)
+		"""
+		
+		self._rotate_size = size
+		self._rotate_interval = interval
+	
+	
+	########################################################################################################
+	
+	
+	def set_compression(self,compression=None,level=None):
+		"""
+		datafile.set_compression(compression=None,level=None)
+		
+		Set compression of the text data files (applies to files started after this call). The data are written through a streaming compressor, so the compressed file is written as the data arrive.
+		
+		INPUT:
+		compression (optional): compression method (string). Default: compression = None
+			compression = None: no compression (*.txt file)
+			compression = 'gzip': gzip compression (*.txt.gz file). Flushing the file (see datafile.set_flush_policy()) completes the compressed data up to the last line written, so that the data can be read while the file is written (flushing too often reduces the compression ratio).
+			compression = 'lzma': lzma / xz compression (*.txt.xz file, better compression than gzip, but slower). The compressed data are only complete once the file is closed.
+		level (optional): compression level (gzip: 1 ... 9, lzma: 0 ... 9). Default: level = None (gzip: 6, lzma: 6)
+		
+		OUTPUT:
+		(none)
+		"""
+		
+		if compression is not None:
+			compression = compression.lower()
+			if not ( compression in ( 'gzip' , 'lzma' ) ):
+				self.warning ( 'Unknown compression ' + compression + '. Not using compression...' )
+				compression = None
+		
+		self._compression = compression
+		self._compression_level = level
+	
+	
+	########################################################################################################
+	
+	
+	def _open_text(self,n):
+		# open text file n (with compression, if any)
+		
+		c = self._compression
+		if c == 'gzip':
+			return gzip.open( n , 'wt' , compresslevel = 6 if self._compression_level is None else self._compression_level )
+		elif c == 'lzma':
+			return lzma.open( n , 'wt' , preset = self._compression_level )
+		else:
+			return open(n, 'w')
+	
+	
+	########################################################################################################
+	
+	
+	def _rotate(self):
+		# close the current file and start a new one (see datafile.set_rotation)
+		
+		self._in_rotation = True
+		try:
+			old = os.path.basename( self.name() or self.binary_name() )
+			part = self._part
+			self.writeln( self.label() , '' , 'ROTATION' , 'part=' + str(part) + ' ; continued=next' , misc.now_UNIX() )
+			self.next(*self._next_args)
+			self._part = part + 1
+			self.writeln( self.label() , '' , 'ROTATION' , 'part=' + str(self._part) + ' ; previous=' + old , misc.now_UNIX() )
+		finally:
+			self._in_rotation = False
+	
+	
+	########################################################################################################
+	
+	
+	def _defer(self,func,*args):
+		# put a write call into the queue of the background writer (if any). Return True if the call was deferred, False if it must be done directly.
+
+		w = self._writer
+		if w is None or w.in_writer_thread() or not w.is_running():
+			return False
+		w.put(self,func,args)
+		return True
+	
+	
+	########################################################################################################
+	
+	
+	def drain(self,timeout=None):
+		"""
+		ok = datafile.drain(timeout=None)
+		
+		Wait until the background writer has written all data of this DATAFILE object (see datawriter class). Returns immediately if there is no background writer.
+		
+		INPUT:
+		timeout (optional): max. waiting time (seconds). Default: timeout = None (no limit)
+		
+		OUTPUT:
+		ok: flag indicating if all data were written (bool, False if the timeout expired)
+		"""
+		
+		if self._writer is None:
+			return True
+		return self._writer.drain(self,timeout)
+	
+	
+	########################################################################################################
+	
+	
+	def set_flush_policy(self,policy='line',lines=100,interval=1.0,fsync=False):
+		"""
+		datafile.set_flush_policy(policy='line',lines=100,interval=1.0,fsync=False)
+		
+		Set the policy for flushing data to the file on disk. Flushing after every line makes sure that every line is handed over to the operating system right away, but each line is then a separate write to the disk (which is slow and causes wear on SD-card or eMMC storage). The other policies collect the lines in the file buffer and write them in larger blocks. The file is always flushed (and synced to the disk with fsync) when it is closed or a new file is started (datafile.close() and datafile.next()).
+		
+		INPUT:
+		policy (optional): flush policy (string, default: policy = 'line'):
+			policy = 'line': flush after every line
+			policy = 'lines': flush after every N lines (see lines)
+			policy = 'interval': flush if the last flush is longer ago than T seconds (see interval; this is checked when writing a line)
+			policy = 'sample': flush only at the end of a sample / file (datafile.next() and datafile.close())
+		lines (optional): number of lines N between flushes for policy = 'lines' (default: lines = 100)
+		interval (optional): time T between flushes for policy = 'interval' (seconds, default: interval = 1.0)
+		fsync (optional): flag to sync the file to the disk (fsync) at every flush, not only at the end of a sample / file (default: fsync = False)
+		
+		OUTPUT:
+		(none)
+		"""
+		
+		policy = policy.lower()
+		if not ( policy in ( 'line' , 'lines' , 'interval' , 'sample' ) ):
+			self.warning ( 'Unknown flush policy ' + policy + '. Using flush_policy = \'line\'...' )
+			policy = 'line'
+		
+		self._flush_policy   = policy
+		self._flush_lines    = max(int(lines),1)
+		self._flush_interval = float(interval)
+		self._fsync          = fsync
+	
+	
+	########################################################################################################
+	
+	
+	def flush(self,fsync=None):
+		"""
+		datafile.flush(fsync=None)
+		
+		Flush the data written to the current data file to the disk (regardless of the flush policy).
+		
+		INPUT:
+		fsync (optional): flag to sync the file to the disk (fsync). Default: fsync = None (use the fsync setting of the flush policy, see datafile.set_flush_policy())
+		
+		OUTPUT:
+		(none)
+		"""
+		
+		if fsync is None:
+			fsync = self._fsync
+		
+		# make sure the data in the queue of the background writer are written first:
+		self.drain()
+		
+		if hasattr(self.fid, 'flush'):
+			try:
+				self.fid.flush()
+				if fsync:
+					os.fsync(self.fid.fileno())
+				if self._compression is None:
+					self._flushed_offset = self.fid.tell()
+				else: # size of compressed data
+					self._flushed_offset = os.fstat(self.fid.fileno()).st_size
+			except (IOError,ValueError) as e:
+				self.warning ('could not flush file ' + self.name() + ': ' + str(e))
+		
+		# write index records after the data lines they point to:
+		if self._index is not None:
+			try:
+				self._index.flush(fsync)
+			except (IOError,ValueError) as e:
+				self.warning ('could not flush index file ' + self._index.name() + ': ' + str(e))
+		
+		if self._bin is not None:
+			try:
+				self._bin.flush(fsync)
+			except (IOError,ValueError) as e:
+				self.warning ('could not flush binary data files ' + self._bin.name() + ': ' + str(e))
+		
+		self._unflushed = 0
+		self._last_flush = time.monotonic()
+	
+	
+	########################################################################################################
+	
+	
+	def flushed_offset(self):
+		"""
+		n = datafile.flushed_offset()
+		
+		Return the offset (number of bytes) up to which the data in the current data file have been flushed to the disk. Data are only flushed as complete lines, so that the file content up to this offset consists of complete lines, even if the program crashes before the remaining data are flushed. For compressed files, the offset is the size of the compressed data written to the disk.
+		
+		INPUT:
+		(none)
+		
+		OUTPUT:
+		n: file offset (bytes)
+		"""
+		
+		return self._flushed_offset
+	
+	
+	########################################################################################################
+	
+	
+	def binary_name(self):
+		"""
+		n = datafile.binary_name()
+		
+		Return the name of the current binary data directory (or empty string if no binary data directory has been created, see file_format option of datafile.__init__())
+		
+		INPUT:
+		(none)
+		
+		OUTPUT:
+		n: directory name (string)
+		"""
+		
+		if self._bin is None:
+			return ''
+		return self._bin.name()
+	
+	
+	########################################################################################################
+	
+	
 	def close(self):
 		"""
 		datafile.close()
@@ -201,13 +542,34 @@ class datafile:
 		(none)
 		"""
 		
+		# wait for the background writer:
+		self.drain()
+		
+		# close binary data files:
+		if self._bin is not None:
+			try:
+				self._bin.close()
+			except (IOError,ValueError) as e:
+				self.warning ('could not close binary data files ' + self._bin.name() + ': ' + str(e))
+		
 		#Check if file / fid has been created as a file object:
 		if hasattr(self.fid, 'close'):
+			# write remaining data to disk:
+			if not self.fid.closed:
+				self.flush(fsync=True)
 			# close current data file
 			try:
 				self.fid.close()
 			except IOError as e:
 				self.warning ('could not close file ' + self.fid.name() + ': ' + e)
+		
+		# close index file:
+		if self._index is not None:
+			try:
+				self._index.close()
+			except (IOError,ValueError) as e:
+				self.warning ('could not close index file ' + self._index.name() + ': ' + str(e))
+			self._index = None
 	
 	
 	########################################################################################################
@@ -240,6 +602,10 @@ class datafile:
 		# close the current datafile (if it exists and is still open)
 		self.close()
 		
+		# remember analysis type etc. for automatic rotation of data files:
+		self._next_args = ( typ , samplename , standardconc )
+		self._part = 1
+		
 		# parse analysis type:
 		typ = typ.replace(' ','')
 		typ = typ.upper()
@@ -259,19 +625,39 @@ class datafile:
 		n0 = self.basepath() + os.sep + n
 		n = n0
 		k = 1
-		while os.path.isfile(n + '.txt'):
+		ext = { None: '.txt' , 'gzip': '.txt.gz' , 'lzma': '.txt.xz' }[self._compression]
+		while os.path.isfile(n + '.txt') or os.path.isfile(n + ext) or os.path.isdir(n + '.rbin'):
 			n = n0 + '+' + str(k)
 			k = k+1
 		
 		# open the file
-		n = n + '.txt'
-		try:
-			self.fid = open(n, 'w')
+		self.fid = -1
+		self._bin = None
+		if self._binary:
+			try:
+				self._bin = binaryfile(n + '.rbin')
+			except (IOError,OSError) as e:
+				self.warning ('could not create binary data files (' + n + '.rbin): ' + str(e))
+				return # exit
+		if self._text:
+			n = n + ext
+			try:
+				self.fid = self._open_text(n)
+				self._filename = n
+				if self._use_index:
+					self._index = datafile_index(datafile_index.index_name(n))
 
-		except IOError as e:
-			self.fid = -1;
-			self.warning ('could not open new file (' + n + '): ' + str(e))
-			return # exit
+			except IOError as e:
+				self.fid = -1;
+				self.warning ('could not open new file (' + n + '): ' + str(e))
+				return # exit
+
+		# reset flush and rotation state for the new file:
+		self._unflushed = 0
+		self._last_flush = time.monotonic()
+		self._flushed_offset = 0
+		self._text_bytes = 0
+		self._file_start = time.monotonic()
 
 		# write header with data format info:
 		self.write_comment(self.label(),'RUEDI data file created ' + misc.now_string() )
@@ -322,6 +708,90 @@ class datafile:
 		(none)
 		"""
 		
+		if self._defer(self.writeln,caller,label,identifier,data,timestmp):
+			return
+		
+		# remove whitespace / spaces:
+		caller     = caller.replace(' ','')
+		label      = label.replace(' ','')
+		identifier = identifier.replace(' ','')
+		
+		# records without their own table in the binary data files are written as LINE records:
+		if self._bin is not None:
+			self._bin.write_line(caller,label,identifier,data,timestmp)
+		
+		self._writeln(caller,label,identifier,data,timestmp)
+
+
+	########################################################################################################
+
+
+	def _writeln(self,caller,label,identifier,data,timestmp):
+		# write text line to the data file (see datafile.writeln), and flush the file(s) according to the flush policy
+		
+		if self._text:
+			self._write_text( self._line(caller,label,identifier,data,timestmp) )
+		self._written(1)
+
+
+	########################################################################################################
+
+
+	def _written(self,n):
+		# count n lines written, flush the file buffer according to the flush policy (make sure data gets written to file, don't wait for the file buffer to fill up):
+		
+		self._unflushed = self._unflushed + n
+		p = self._flush_policy
+		if p == 'line':
+			self.flush()
+		elif p == 'lines':
+			if self._unflushed >= self._flush_lines:
+				self.flush()
+		elif p == 'interval':
+			if time.monotonic() - self._last_flush >= self._flush_interval:
+				self.flush()
+		
+		# start a new file if the current file is too large or too old:
+		if ( self._rotate_size is not None or self._rotate_interval is not None ) and not self._in_rotation and self._next_args is not None:
+			if self._text:
+				size = self._text_bytes
+			elif self._bin is not None:
+				size = self._bin.size()
+			else:
+				size = 0
+			if ( self._rotate_size is not None and size >= self._rotate_size ) or ( self._rotate_interval is not None and time.monotonic() - self._file_start >= self._rotate_interval ):
+				self._rotate()
+
+
+	########################################################################################################
+
+
+	def _line(self,caller,label,identifier,data,timestmp):
+		# return formatted text line (see datafile.writeln)
+		
+		try:
+			p = self._prefixes[ (caller,label,identifier) ]
+		except KeyError:
+			p = self._prefix(caller,label,identifier)
+		
+		# make sure the data string contains no newlines and line breaks:
+		if '\n' in data or '\r' in data:
+			data = data.replace('\n', '').replace('\r', '')
+		
+		S = str(timestmp) + p + data + '\n'
+		if self._index is not None:
+			self._index.add( identifier , timestmp , len(S) if S.isascii() else len(S.encode('utf-8')) )
+		return S
+
+
+	########################################################################################################
+
+
+	def _prefix(self,caller,label,identifier):
+		# return (and cache) the part of the text line between time stamp and data string (' CALLER[LABEL] IDENTIFIER: ')
+		
+		key = (caller,label,identifier)
+		
 		# remove whitespace / spaces:
 		caller     = caller.replace(' ','')
 		label      = label.replace(' ','')
@@ -333,20 +803,150 @@ class datafile:
 				caller = caller + '[' + label + ']'			
 		
 		# combine all fields:
-		S = caller + ' ' + identifier + ': ' + data
+		S = ' ' + caller + ' ' + identifier + ': '
 		
 		# make sure the string contains no newlines and line breaks:
 		S = S.replace('\n', '').replace('\r', '')
-				
-		# format line:
-		S = str(timestmp) + ' ' + S + '\n'
+		
+		if len(self._prefixes) > 1000: # don't let the cache grow forever (e.g. with changing labels)
+			self._prefixes = {}
+		self._prefixes[key] = S
+		return S
+
+
+	########################################################################################################
 
-		# write to file:
+
+	def _write_text(self,S):
+		# write text line(s) S to file
+		
+		self._text_bytes = self._text_bytes + len(S)
 		try:
-			self.fid.write(S)	# write line to data file
-			self.fid.flush()	# make sure data gets written to file now, don't wait for flushing file buffer
+			self.fid.write(S)	# write line(s) to data file
 		except IOError as e:
-			self.warning ('could not write to file ' + self.fid.name + ': ' + e)
+			self.warning ('could not write to file ' + self.fid.name + ': ' + str(e))
+
+
+	########################################################################################################
+
+
+	def write_records(self,records):
+		"""
+		datafile.write_records(records)
+		
+		Write several data records to the data file in one go (e.g. all PEAK and ZERO readings of a measurement cycle, or a block of sensor readings). The records are formatted in one pass and written with a single write call, and the flush policy is applied once for all records (see datafile.set_flush_policy()). See also datafile.batch().
+		
+		INPUT:
+		records: list of records. Each record is a tuple with the record type followed by the arguments of the corresponding write method:
+			( 'PEAK' , caller , label , mz , intensity , unit , det , gate , timestmp [, peaktype] ), see datafile.write_peak()
+			( 'ZERO' , caller , label , mz , mz_offset , intensity , unit , det , gate , timestmp [, zerotype] ), see datafile.write_zero()
+			( 'SCAN' , caller , label , mz , intensity , unit , det , gate , timestmp ), see datafile.write_scan()
+			( 'PRESSURE' , caller , label , value , unit , timestmp ), see datafile.write_pressure()
+			( 'TEMPERATURE' , caller , label , value , unit , timestmp ), see datafile.write_temperature()
+			( 'POSITION' , caller , label , position , timestmp ), see datafile.write_valve_pos()
+			( 'LINE' , caller , label , identifier , data , timestmp ), see datafile.writeln()
+		
+		Example:
+			f.write_records( [ ( 'PEAK' , 'RGA_SRS' , 'MS' , 28 , 1.2E-9 , 'A' , 'F' , 0.1 , t1 ) , ( 'PRESSURE' , 'PRESSURESENSOR_WIKA' , 'P' , 1.013 , 'bar' , t2 ) ] )
+		
+		OUTPUT:
+		(none)
+		"""
+		
+		if self._defer(self.write_records,list(records)):
+			return
+		
+		b = self._bin
+		lines = []
+		for r in records:
+			typ = r[0]
+			caller,label = r[1],r[2]
+			if typ == 'PEAK':
+				if b is not None:
+					b.write_peak(*r[1:])
+				p,x = self._peak_fields(*r[3:8],*r[9:10])
+				t = r[8]
+			elif typ == 'ZERO':
+				if b is not None:
+					b.write_zero(*r[1:])
+				p,x = self._zero_fields(*r[3:9],*r[10:11])
+				t = r[9]
+			elif typ == 'SCAN':
+				if b is not None:
+					b.write_scan(*r[1:])
+				p,x = self._scan_fields(*r[3:8])
+				t = r[8]
+			elif typ == 'PRESSURE':
+				if b is not None:
+					b.write_pressure(*r[1:])
+				p,x,t = 'PRESSURE' , str(r[3]) + ' ' + r[4] , r[5]
+			elif typ == 'TEMPERATURE':
+				if b is not None:
+					b.write_temperature(*r[1:])
+				p,x,t = 'TEMPERATURE' , str(r[3]) + ' ' + r[4] , r[5]
+			elif typ == 'POSITION':
+				if b is not None:
+					b.write_valve_pos(*r[1:])
+				p,x,t = 'POSITION' , str(r[3]) , r[4]
+			elif typ == 'LINE':
+				if b is not None:
+					b.write_line( caller.replace(' ','') , label.replace(' ','') , r[3].replace(' ','') , r[4] , r[5] )
+				p,x,t = r[3],r[4],r[5]
+			else:
+				self.warning ( 'Unknown record type ' + str(typ) + '. Skipping record...' )
+				continue
+			if self._text:
+				lines.append( self._line(caller,label,p,x,t) )
+		
+		if self._text and len(lines) > 0:
+			self._write_text( ''.join(lines) )
+		self._written(len(lines))
+
+
+	########################################################################################################
+
+	
+	def batch(self):
+		"""
+		b = datafile.batch()
+		
+		Return a batch object that collects data records and writes them to the data file in one go (see datafile.write_records()). The batch object provides the same write methods as the DATAFILE object (write_peak, write_zero, write_scan, write_pressure, write_temperature, write_valve_pos, writeln, write_comment), so it can be used instead of the DATAFILE object, e.g. with rgams_SRS.peak(). The collected records are written by b.write(), or at the end of a with block:
+			with f.batch() as b:
+				MS.peak(28,0.1,b)
+				MS.zero(28,-1,0.1,b)
+		
+		INPUT:
+		(none)
+		
+		OUTPUT:
+		b: batch object
+		"""
+		
+		return _datafile_batch(self)
+
+
+	########################################################################################################
+
+	
+	def source(self,caller,label):
+		"""
+		w = datafile.source(caller,label)
+		
+		Return a record writer with caller and label bound to it (e.g. for an instrument that writes many records to the same data file). The line prefixes of the records are prepared once, so that only the data values need to be formatted for each record.
+		
+		Example:
+			w = f.source('PRESSURESENSOR_WIKA','TOTALPRESSURE')
+			w.write_pressure(1.013,'bar',misc.now_UNIX())
+		
+		INPUT:
+		caller: type of calling object, i.e. the "data origin" (string)
+		label: name/label of the calling object (string)
+		
+		OUTPUT:
+		w: record writer, with the methods write_peak, write_zero, write_scan, write_pressure, write_temperature, write_valve_pos and writeln (same arguments as the DATAFILE methods, but without caller and label)
+		"""
+		
+		return _datafile_source(self,caller,label)
 
 
 	########################################################################################################
@@ -436,15 +1036,29 @@ class datafile:
 		(none)
 		"""
 		
-		det = det.replace(' ','');
+		if self._defer(self.write_peak,caller,label,mz,intensity,unit,det,gate,timestmp,peaktype):
+			return
 		
-		s = 'mz=' + str(mz) + ' ; intensity=' + str(intensity) + ' ' + unit + ' ; detector=' + det.upper() + ' ; gate=' + str(gate) + ' s'
+		if self._bin is not None:
+			self._bin.write_peak(caller,label,mz,intensity,unit,det,gate,timestmp,peaktype)
+		
+		p,s = self._peak_fields(mz,intensity,unit,det,gate,peaktype)
+		self._writeln(caller,label,p,s,timestmp)
+		
+
+	########################################################################################################
+
+	
+	def _peak_fields(self,mz,intensity,unit,det,gate,peaktype=None):
+		# return identifier and data string of PEAK record
+		
+		s = 'mz=' + str(mz) + ' ; intensity=' + str(intensity) + self._tail(unit,det,gate)
 		if peaktype:
 			p = 'PEAK_' + peaktype.upper()
 		else:
 			p = 'PEAK'
 
-		self.writeln(caller,label,p,s,timestmp)
+		return p,s
 		
 
 	########################################################################################################
@@ -472,7 +1086,22 @@ class datafile:
 		(none)
 		"""
 		
-		det = det.replace(' ','');
+		if self._defer(self.write_zero,caller,label,mz,mz_offset,intensity,unit,det,gate,timestmp,zerotype):
+			return
+		
+		if self._bin is not None:
+			self._bin.write_zero(caller,label,mz,mz_offset,intensity,unit,det,gate,timestmp,zerotype)
+		
+		p,s = self._zero_fields(mz,mz_offset,intensity,unit,det,gate,zerotype)
+		self._writeln(caller,label,p,s,timestmp)
+		
+
+	########################################################################################################
+
+	
+	def _zero_fields(self,mz,mz_offset,intensity,unit,det,gate,zerotype=None):
+		# return identifier and data string of ZERO record
+		
 		if mz_offset > 0:
 			offset = '+'+str(mz_offset)
 		else:
@@ -482,8 +1111,27 @@ class datafile:
 		else:
 			p = 'ZERO'
 
-		s = 'mz=' + str(mz) + ' ; mz-offset=' + offset + ' ; intensity=' + str(intensity) + ' ' + unit + ' ; detector=' + det.upper() + ' ; gate=' + str(gate) + ' s'
-		self.writeln(caller,label,p,s,timestmp)
+		s = 'mz=' + str(mz) + ' ; mz-offset=' + offset + ' ; intensity=' + str(intensity) + self._tail(unit,det,gate)
+		return p,s
+		
+
+	########################################################################################################
+
+	
+	def _tail(self,unit,det,gate):
+		# return (and cache) the constant part of PEAK and ZERO data strings after the intensity value (' UNIT ; detector=DET ; gate=GATE s')
+		
+		key = (unit,det,gate)
+		try:
+			return self._tails[key]
+		except KeyError:
+			pass
+		
+		s = ' ' + unit + ' ; detector=' + det.replace(' ','').upper() + ' ; gate=' + str(gate) + ' s'
+		if len(self._tails) > 1000:
+			self._tails = {}
+		self._tails[key] = s
+		return s
 		
 
 	########################################################################################################
@@ -491,26 +1139,132 @@ class datafile:
 	
 	def write_scan(self,caller,label,mz,intensity,unit,det,gate,timestmp):
 		"""
-		datafile.write_scan(caller,mz,intensity,unit,det,gate,timestmp)
+		datafile.write_scan(caller,label,mz,intensity,unit,det,gate,timestmp)
+		M,Y = datafile.write_scan(caller,label,scan_data,None,unit,det,gate,timestmp)
 		
-		Write PEAK data line to the data file.
+		Write SCAN data line to the data file.
 		
 		INPUT:
 		caller: type of calling object, i.e. the "data origin" (string)
 		label: name/label of the calling object (string)
-		mz: mz values (floats)
-		intensity: intensity values (floats)
+		mz: mz values (list or numpy array of floats), or iterable of scan data chunks (e.g. mz = rgams_SRS.scan_iter(...)) if intensity = None. In the latter case, the data chunks are collected as they arrive, and the SCAN line is written once all chunks are received.
+		intensity: intensity values (list or numpy array of floats), or None if mz is an iterable of scan data chunks
 		unit: unit of intensity values (string)
 		det: detector (string), e.g., det='F' for Faraday or det='M' for multiplier
 		gate: gate time (float)
-		timestmp: timestamp of the peak measurement (see misc.now_UNIX)
+		timestmp: timestamp of the scan (see misc.now_UNIX)
+		
+		OUTPUT:
+		M,Y: mz and intensity values collected from the scan data chunks (lists, only if intensity = None)
+		"""
+		
+		if intensity is None:
+			# collect the scan data chunks, then write the SCAN line (through the background writer, if any):
+			scan_data = mz
+			mz = []
+			intensity = []
+			for M,Y in scan_data:
+				mz.extend( M.tolist() if hasattr(M,'tolist') else M )
+				intensity.extend( Y.tolist() if hasattr(Y,'tolist') else Y )
+			self.write_scan(caller,label,mz,intensity,unit,det,gate,timestmp)
+			return mz,intensity
+
+		if self._defer(self.write_scan,caller,label,_copy(mz),_copy(intensity),unit,det,gate,timestmp):
+			return
+
+		if self._bin is not None:
+			self._bin.write_scan(caller,label,mz,intensity,unit,det,gate,timestmp)
+
+		p,s = self._scan_fields(mz,intensity,unit,det,gate)
+		self._writeln(caller,label,p,s,timestmp)
+		
+
+	########################################################################################################
+
+	
+	def _scan_fields(self,mz,intensity,unit,det,gate):
+		# return identifier and data string of SCAN record (or SCAN_COMPACT record, see datafile.set_scan_format)
+		
+		det = det.replace(' ','').upper()
+
+		if self._scan_format != 'list':
+			s = self._scan_compact(mz,intensity)
+			if s is not None:
+				return 'SCAN_COMPACT' , s + ' ' + unit + ' ; detector=' + det + ' ; gate=' + str(gate) + ' s'
+
+		# write numpy arrays in the same format as lists (str() would abbreviate long arrays):
+		if hasattr(mz,'tolist'):
+			mz = mz.tolist()
+		if hasattr(intensity,'tolist'):
+			intensity = intensity.tolist()
+
+		return 'SCAN' , 'mz=' + str(mz) + ' ; intensity=' + str(intensity) + ' ' + unit + '; detector=' + det + ' ; gate=' + str(gate) + ' s'
+		
+
+	########################################################################################################
+
+	
+	def _scan_compact(self,mz,intensity):
+		# return the m/z and intensity fields of a SCAN_COMPACT record (see datafile.set_scan_format), or None if the m/z values are not evenly spaced
+		
+		mz = numpy.asarray(mz,dtype=float)
+		y = numpy.asarray(intensity)
+		N = len(mz)
+		if N < 2 or len(y) != N:
+			return None
+		low = mz[0]
+		high = mz[-1]
+		step = (high-low)/(N-1)
+		if step <= 0 or numpy.abs( mz - ( low + step*numpy.arange(N) ) ).max() > 1E-6*step:
+			return None
+		
+		is_int = numpy.issubdtype(y.dtype,numpy.integer)
+		if self._scan_format == 'base64':
+			if is_int:
+				y = 'base64-int32:' + base64.b64encode( y.astype('<i4').tobytes() ).decode('ascii')
+			else:
+				y = 'base64-float32:' + base64.b64encode( y.astype('<f4').tobytes() ).decode('ascii')
+		else:
+			if is_int:
+				y = ','.join( ['%d']*N ) % tuple(y.tolist())
+			else:
+				y = ','.join( ['%.6e']*N ) % tuple(y.tolist())
+		
+		return 'low=' + repr(float(low)) + ' ; high=' + repr(float(high)) + ' ; step=' + repr(float(step)) + ' ; N=' + str(N) + ' ; intensity=' + y
+		
+
+	########################################################################################################
+
+	
+	def write_histogram_scan(self,caller,label,low,high,intensity,unit,det,gate,timestmp):
+		"""
+		datafile.write_histogram_scan(caller,label,low,high,intensity,unit,det,gate,timestmp)
+		
+		Write HISTSCAN data line to the data file (intensities at all integer m/z values from low to high).
+		
+		INPUT:
+		caller: type of calling object, i.e. the "data origin" (string)
+		label: name/label of the calling object (string)
+		low: low m/z value (integer)
+		high: high m/z value (integer)
+		intensity: intensity values (list or numpy array of floats, one value for each integer m/z value from low to high)
+		unit: unit of intensity values (string)
+		det: detector (string), e.g., det='F' for Faraday or det='M' for multiplier
+		gate: gate time (float)
+		timestmp: timestamp of the scan (see misc.now_UNIX)
 		
 		OUTPUT:
 		(none)
 		"""
 		
-		s = 'mz=' + str(mz) + ' ; intensity=' + str(intensity) + ' ' + unit + '; detector=' + det + ' ; gate=' + str(gate) + ' s'
-		self.writeln(caller,label,'SCAN',s,timestmp)
+		if self._defer(self.write_histogram_scan,caller,label,low,high,_copy(intensity),unit,det,gate,timestmp):
+			return
+		
+		if hasattr(intensity,'tolist'):
+			intensity = intensity.tolist()
+
+		s = 'mz=' + str(int(low)) + ':' + str(int(high)) + ' ; intensity=' + str(intensity) + ' ' + unit + ' ; detector=' + det.upper() + ' ; gate=' + str(gate) + ' s'
+		self.writeln(caller,label,'HISTSCAN',s,timestmp)
 		
 
 	########################################################################################################
@@ -538,6 +1292,9 @@ class datafile:
 		(none)
 		"""
 		
+		if self._defer(self.write_ms_deconv,caller,label,target_mz,target_species,deconv_detector,ms_EE,basis,timestmp):
+			return
+		
 		s = 'target_mz=' + str(target_mz) + ' ; target_species=' + target_species + ' ; detector = ' + deconv_detector.upper() + ' ; MS_EE=' + str(ms_EE) + ' eV ; basis=' + str(basis)
 		self.writeln(caller,label,'DECONVOLUTION',s,timestmp)
 		
@@ -561,9 +1318,15 @@ class datafile:
 		(none)
 		"""
 		
+		if self._defer(self.write_valve_pos,caller,label,position,timestmp):
+			return
+		
+		if self._bin is not None:
+			self._bin.write_valve_pos(caller,label,position,timestmp)
+		
 		# s = 'position=' + str(position)
 		s = str(position)		
-		self.writeln(caller,label,'POSITION',s,timestmp)
+		self._writeln(caller,label,'POSITION',s,timestmp)
 		
 
 	########################################################################################################
@@ -586,8 +1349,14 @@ class datafile:
 		(none)
 		"""
 				
+		if self._defer(self.write_pressure,caller,label,value,unit,timestmp):
+			return
+		
+		if self._bin is not None:
+			self._bin.write_pressure(caller,label,value,unit,timestmp)
+		
 		s = str(value) + ' ' + unit
-		self.writeln(caller,label,'PRESSURE',s,timestmp)
+		self._writeln(caller,label,'PRESSURE',s,timestmp)
 		
 
 	########################################################################################################
@@ -610,5 +1379,99 @@ class datafile:
 		(none)
 		"""
 				
+		if self._defer(self.write_temperature,caller,label,value,unit,timestmp):
+			return
+		
+		if self._bin is not None:
+			self._bin.write_temperature(caller,label,value,unit,timestmp)
+		
 		s = str(value) + ' ' + unit
-		self.writeln(caller,label,'TEMPERATURE',s,timestmp)
+		self._writeln(caller,label,'TEMPERATURE',s,timestmp)
+
+
+
+class _datafile_batch:
+	# collects data records for writing with datafile.write_records (see datafile.batch)
+
+	def __init__(self,f):
+		self._f = f
+		self._records = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,exc_type,exc_value,traceback):
+		self.write()
+
+	def __getattr__(self,name):
+		# other methods are handled by the DATAFILE object (write the collected records first to keep the order of the records):
+		self.write()
+		return getattr(self._f,name)
+
+	def write(self):
+		# write the collected records to the data file
+		if len(self._records) > 0:
+			r = self._records
+			self._records = []
+			self._f.write_records(r)
+
+	def write_peak(self,caller,label,mz,intensity,unit,det,gate,timestmp,peaktype=None):
+		self._records.append( ( 'PEAK' , caller , label , mz , intensity , unit , det , gate , timestmp , peaktype ) )
+
+	def write_zero(self,caller,label,mz,mz_offset,intensity,unit,det,gate,timestmp,zerotype=None):
+		self._records.append( ( 'ZERO' , caller , label , mz , mz_offset , intensity , unit , det , gate , timestmp , zerotype ) )
+
+	def write_scan(self,caller,label,mz,intensity,unit,det,gate,timestmp):
+		if intensity is None: # iterable of scan data chunks
+			self.write()
+			return self._f.write_scan(caller,label,mz,intensity,unit,det,gate,timestmp)
+		self._records.append( ( 'SCAN' , caller , label , _copy(mz) , _copy(intensity) , unit , det , gate , timestmp ) )
+
+	def write_pressure(self,caller,label,value,unit,timestmp):
+		self._records.append( ( 'PRESSURE' , caller , label , value , unit , timestmp ) )
+
+	def write_temperature(self,caller,label,value,unit,timestmp):
+		self._records.append( ( 'TEMPERATURE' , caller , label , value , unit , timestmp ) )
+
+	def write_valve_pos(self,caller,label,position,timestmp):
+		self._records.append( ( 'POSITION' , caller , label , position , timestmp ) )
+
+	def writeln(self,caller,label,identifier,data,timestmp):
+		self._records.append( ( 'LINE' , caller , label , identifier , data , timestmp ) )
+
+	def write_comment(self,caller,cmt):
+		self._records.append( ( 'LINE' , caller , '' , 'COMMENT' , cmt , misc.now_UNIX() ) )
+
+
+
+class _datafile_source:
+	# data record writers with caller and label bound to them (see datafile.source)
+
+	def __init__(self,f,caller,label):
+		self._f = f
+		self._caller = caller
+		self._label = label
+		# prepare line prefixes of the most common record types:
+		for p in ( 'PEAK' , 'ZERO' , 'PRESSURE' , 'TEMPERATURE' ):
+			f._prefix(caller,label,p)
+
+	def write_peak(self,mz,intensity,unit,det,gate,timestmp,peaktype=None):
+		self._f.write_peak(self._caller,self._label,mz,intensity,unit,det,gate,timestmp,peaktype)
+
+	def write_zero(self,mz,mz_offset,intensity,unit,det,gate,timestmp,zerotype=None):
+		self._f.write_zero(self._caller,self._label,mz,mz_offset,intensity,unit,det,gate,timestmp,zerotype)
+
+	def write_scan(self,mz,intensity,unit,det,gate,timestmp):
+		return self._f.write_scan(self._caller,self._label,mz,intensity,unit,det,gate,timestmp)
+
+	def write_pressure(self,value,unit,timestmp):
+		self._f.write_pressure(self._caller,self._label,value,unit,timestmp)
+
+	def write_temperature(self,value,unit,timestmp):
+		self._f.write_temperature(self._caller,self._label,value,unit,timestmp)
+
+	def write_valve_pos(self,position,timestmp):
+		self._f.write_valve_pos(self._caller,self._label,position,timestmp)
+
+	def writeln(self,identifier,data,timestmp):
+		self._f.writeln(self._caller,self._label,identifier,data,timestmp)
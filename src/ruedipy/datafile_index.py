@@ -0,0 +1,311 @@
+# Code for the datafile_index class (sidecar byte-offset index of RUEDI data files)
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import os
+	import numpy
+	from .misc	import misc
+except ImportError as e:
+	print (e)
+	raise
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / datafile_index class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+# header of the index file (magic string, version, size of the index records in bytes):
+_MAGIC   = b'RUEDIIDX'
+_VERSION = 1
+_HEADER  = numpy.dtype( [ ( 'magic' , 'S8' ) , ( 'version' , '<u4' ) , ( 'size' , '<u4' ) ] )
+
+# index records (one for each line of the data file): record type code, time stamp, byte offset of the line in the (uncompressed) data file:
+_DTYPE = numpy.dtype( [ ( 'code' , 'u1' ) , ( 't' , '<f8' ) , ( 'offset' , '<u8' ) ] )
+
+
+class datafile_index:
+	"""
+	ruediPy class for writing and reading the sidecar index files of RUEDI data files. The index file (data file name + '.idx') has one fixed-width binary record for each line of the data file, with the record type code (see datafile_index.codes), the time stamp and the byte offset of the line. This allows reading the records of a given type or time window without parsing the whole data file (see datafile_reader.read()).
+
+	The index files are written by datafile objects (see datafile class, index option), or they can be built for existing data files (see datafile_reader.index()).
+	"""
+
+
+	# data type of the index records:
+	dtype = _DTYPE
+
+	# record type codes (PEAK_xyz and ZERO_xyz records have their own codes, all other / unknown records have code 0):
+	codes = {
+		'PEAK':          1,
+		'PEAK_xyz':      2,
+		'ZERO':          3,
+		'ZERO_xyz':      4,
+		'SCAN':          5,
+		'SCAN_COMPACT':  6,
+		'PRESSURE':      7,
+		'TEMPERATURE':   8,
+		'POSITION':      9,
+		'STANDARD':      10,
+		'DECONVOLUTION': 11,
+		'HISTSCAN':      12,
+		'COMMENT':       13,
+		'SAMPLENAME':    14,
+		'ANALYSISTYPE':  15,
+		'ROTATION':      16,
+	}
+
+
+	########################################################################################################
+
+
+	def __init__(self,path):
+		'''
+		datafile_index.__init__(path)
+
+		Initialize DATAFILE_INDEX object, create index file for writing.
+
+		INPUT:
+		path: path of the index file (string, see datafile_index.index_name())
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._path = path
+		self._rows = []
+		self._offset = 0 # byte offset of the next line in the data file
+		self._fid = open(path,'wb')
+		self._fid.write( numpy.array( [ ( _MAGIC , _VERSION , _DTYPE.itemsize ) ] , dtype=_HEADER ).tobytes() )
+
+
+	########################################################################################################
+
+
+	def label(self):
+		'''
+		label = datafile_index.label()
+
+		Return label / name of the DATAFILE_INDEX object
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		label: label / name (string)
+		'''
+
+		return 'DATAFILE_INDEX'
+
+
+	########################################################################################################
+
+
+	def warning(self,msg):
+		'''
+		datafile_index.warning(msg)
+
+		Issue warning about issues related to the index file.
+
+		INPUT:
+		msg: warning message (string)
+
+		OUTPUT:
+		(none)
+		'''
+
+		misc.warnmessage ('[' + self.label() + '] ' + msg)
+
+
+	########################################################################################################
+
+
+	def name(self):
+		'''
+		n = datafile_index.name()
+
+		Return the path of the index file.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		n: path (string)
+		'''
+
+		return self._path
+
+
+	########################################################################################################
+
+
+	@staticmethod
+	def index_name(path):
+		'''
+		n = datafile_index.index_name(path)
+
+		Return the path of the index file of a data file.
+
+		INPUT:
+		path: path of the data file (string)
+
+		OUTPUT:
+		n: path of the index file (string)
+		'''
+
+		return path + '.idx'
+
+
+	########################################################################################################
+
+
+	@staticmethod
+	def code(identifier):
+		'''
+		c = datafile_index.code(identifier)
+
+		Return the record type code of a data line identifier (see datafile_index.codes).
+
+		INPUT:
+		identifier: identifier of the data line (string, e.g. 'PEAK' or 'PEAK_DECONV')
+
+		OUTPUT:
+		c: record type code (integer)
+		'''
+
+		c = datafile_index.codes.get(identifier)
+		if c is None:
+			if identifier.startswith('PEAK_'):
+				c = datafile_index.codes['PEAK_xyz']
+			elif identifier.startswith('ZERO_'):
+				c = datafile_index.codes['ZERO_xyz']
+			else:
+				c = 0
+		return c
+
+
+	########################################################################################################
+
+
+	def add(self,identifier,t,n):
+		'''
+		datafile_index.add(identifier,t,n)
+
+		Add index record of the next line of the data file (the record is written to the index file with the next datafile_index.flush()).
+
+		INPUT:
+		identifier: identifier of the data line (string)
+		t: time stamp of the data line
+		n: length of the data line (number of bytes, including the line break)
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._rows.append( ( self.code(identifier) , t , self._offset ) )
+		self._offset = self._offset + n
+
+
+	########################################################################################################
+
+
+	def flush(self,fsync=False):
+		'''
+		datafile_index.flush(fsync=False)
+
+		Write the buffered index records to the index file. This should be done after the lines have been flushed to the data file, so that the index does not point to lines that are not in the data file yet.
+
+		INPUT:
+		fsync (optional): flag to sync the file to the disk (fsync). Default: fsync = False
+
+		OUTPUT:
+		(none)
+		'''
+
+		if len(self._rows) > 0:
+			self._fid.write( numpy.array( self._rows , dtype=_DTYPE ).tobytes() )
+			self._rows = []
+		self._fid.flush()
+		if fsync:
+			os.fsync(self._fid.fileno())
+
+
+	########################################################################################################
+
+
+	def close(self):
+		'''
+		datafile_index.close()
+
+		Write the buffered index records and close the index file.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if not self._fid.closed:
+			self.flush(fsync=True)
+			self._fid.close()
+
+
+	########################################################################################################
+
+
+	@staticmethod
+	def load(path):
+		'''
+		idx = datafile_index.load(path)
+
+		Load an index file (memory mapped).
+
+		INPUT:
+		path: path of the index file (string)
+
+		OUTPUT:
+		idx: index records (numpy structured array with fields code, t and offset, read-only memmap). If the index file is incomplete (e.g. because writing was interrupted), only the complete records are returned.
+		'''
+
+		h = numpy.fromfile(path,dtype=_HEADER,count=1)
+		if len(h) == 0 or h[0]['magic'] != _MAGIC or h[0]['size'] != _DTYPE.itemsize:
+			raise ValueError('not a RUEDI data file index: ' + path)
+
+		n = ( os.path.getsize(path) - _HEADER.itemsize ) // _DTYPE.itemsize
+		if n == 0:
+			return numpy.zeros(0,dtype=_DTYPE)
+		return numpy.memmap( path , dtype=_DTYPE , mode='r' , offset=_HEADER.itemsize , shape=(n,) )
+
+
+	########################################################################################################
+
+
+	@staticmethod
+	def save(path,idx):
+		'''
+		datafile_index.save(path,idx)
+
+		Write index records to an index file (e.g. an index built for an existing data file, see datafile_reader.index()). The file is written to a temporary file first, so that the index file is never incomplete.
+
+		INPUT:
+		path: path of the index file (string)
+		idx: index records (numpy structured array with fields code, t and offset)
+
+		OUTPUT:
+		(none)
+		'''
+
+		with open(path + '.tmp','wb') as f:
+			f.write( numpy.array( [ ( _MAGIC , _VERSION , _DTYPE.itemsize ) ] , dtype=_HEADER ).tobytes() )
+			f.write( numpy.asarray(idx).astype(_DTYPE).tobytes() )
+		os.replace(path + '.tmp',path)
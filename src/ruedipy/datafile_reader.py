@@ -0,0 +1,752 @@
+# Code for the datafile_reader class (fast reading of RUEDI data files into numpy arrays)
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import os
+	import re
+	import mmap
+	import gzip
+	import lzma
+	import base64
+	import numpy
+	from .misc	import misc
+	from .datafile_index	import datafile_index
+except ImportError as e:
+	print (e)
+	raise
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / datafile_reader class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+# regular expressions for the record types (see datafile class for the format of the data lines). Every data line starts with the time stamp and the CALLER[LABEL] field. The lines are matched in multi-line mode, so that all records of a given type are found in a chunk of the file with one regex scan:
+_HEAD  = rb'^([^ \n]+) ([^ \n]+) '
+_NUM   = rb'([^ \n]+)'
+_STR   = rb'([^ \n]*)'
+_TAIL  = rb' ; detector=' + _STR + rb' ; gate=' + _NUM + rb' s\r?$'
+_REGEX = {
+	'PEAK':          _HEAD + rb'PEAK(?:_([^ :\n]*))?: mz=' + _NUM + rb' ; intensity=' + _NUM + rb' ' + _STR + _TAIL,
+	'ZERO':          _HEAD + rb'ZERO(?:_([^ :\n]*))?: mz=' + _NUM + rb' ; mz-offset=' + _NUM + rb' ; intensity=' + _NUM + rb' ' + _STR + _TAIL,
+	'SCAN':          _HEAD + rb'SCAN: mz=\[([^\]\n]*)\] ; intensity=\[([^\]\n]*)\] ([^ ;\n]*); detector=' + _STR + rb' ; gate=' + _NUM + rb' s\r?$',
+	'SCAN_COMPACT':  _HEAD + rb'SCAN_COMPACT: low=' + _NUM + rb' ; high=' + _NUM + rb' ; step=' + _NUM + rb' ; N=' + _NUM + rb' ; intensity=' + _NUM + rb' ' + _STR + _TAIL,
+	'PRESSURE':      _HEAD + rb'PRESSURE: ' + _NUM + rb' ([^\r\n]*?)\r?$',
+	'TEMPERATURE':   _HEAD + rb'TEMPERATURE: ' + _NUM + rb' ([^\r\n]*?)\r?$',
+	'POSITION':      _HEAD + rb'POSITION: ' + _NUM + rb'\r?$',
+	'STANDARD':      _HEAD + rb'STANDARD: species=([^\n]*?) ; concentration=' + _NUM + rb' vol/vol ; mz=' + _NUM + rb'\r?$',
+	'DECONVOLUTION': _HEAD + rb'DECONVOLUTION: target_mz=' + _NUM + rb' ; target_species=([^\n]*?) ; detector = ' + _STR + rb' ; MS_EE=' + _NUM + rb' eV ; basis=([^\r\n]*)\r?$',
+}
+_REGEX = { k:re.compile(r,re.M) for k,r in _REGEX.items() }
+
+# fields of the record types (name, data type, index of regex group; 'U' = string):
+_SOURCE = [ ( 't' , 'f8' , 0 ) , ( 'caller' , 'U' , 1 ) , ( 'label' , 'U' , 1 ) ]
+_FIELDS = {
+	'PEAK':          _SOURCE + [ ( 'type' , 'U' , 2 ) , ( 'mz' , 'f8' , 3 ) , ( 'intensity' , 'f8' , 4 ) , ( 'unit' , 'U' , 5 ) , ( 'detector' , 'U' , 6 ) , ( 'gate' , 'f8' , 7 ) ],
+	'ZERO':          _SOURCE + [ ( 'type' , 'U' , 2 ) , ( 'mz' , 'f8' , 3 ) , ( 'mz_offset' , 'f8' , 4 ) , ( 'intensity' , 'f8' , 5 ) , ( 'unit' , 'U' , 6 ) , ( 'detector' , 'U' , 7 ) , ( 'gate' , 'f8' , 8 ) ],
+	'SCAN':          _SOURCE + [ ( 'unit' , 'U' , 4 ) , ( 'detector' , 'U' , 5 ) , ( 'gate' , 'f8' , 6 ) ],
+	'SCAN_COMPACT':  _SOURCE + [ ( 'unit' , 'U' , 7 ) , ( 'detector' , 'U' , 8 ) , ( 'gate' , 'f8' , 9 ) ],
+	'PRESSURE':      _SOURCE + [ ( 'value' , 'f8' , 2 ) , ( 'unit' , 'U' , 3 ) ],
+	'TEMPERATURE':   _SOURCE + [ ( 'value' , 'f8' , 2 ) , ( 'unit' , 'U' , 3 ) ],
+	'POSITION':      _SOURCE + [ ( 'position' , 'f8' , 2 ) ],
+	'STANDARD':      _SOURCE + [ ( 'species' , 'U' , 2 ) , ( 'concentration' , 'f8' , 3 ) , ( 'mz' , 'f8' , 4 ) ],
+	'DECONVOLUTION': _SOURCE + [ ( 'target_mz' , 'f8' , 2 ) , ( 'target_species' , 'U' , 3 ) , ( 'detector' , 'U' , 4 ) , ( 'MS_EE' , 'f8' , 5 ) , ( 'basis' , 'U' , 6 ) ],
+}
+
+# fields of the record types that are parsed directly from the space separated tokens of the lines (number of tokens, and name, token index and length of prefix like 'mz=' of each field). The first three tokens of every line are the time stamp, CALLER[LABEL] and the identifier. Lines with a different number of tokens (e.g. a unit containing spaces) are parsed with the regular expressions:
+_TOKENS = {
+	'PEAK':        ( 12 , [ ( 'mz' , 3 , 3 ) , ( 'intensity' , 5 , 10 ) , ( 'unit' , 6 , 0 ) , ( 'detector' , 8 , 9 ) , ( 'gate' , 10 , 5 ) ] ),
+	'ZERO':        ( 14 , [ ( 'mz' , 3 , 3 ) , ( 'mz_offset' , 5 , 10 ) , ( 'intensity' , 7 , 10 ) , ( 'unit' , 8 , 0 ) , ( 'detector' , 10 , 9 ) , ( 'gate' , 12 , 5 ) ] ),
+	'PRESSURE':    ( 5 , [ ( 'value' , 3 , 0 ) , ( 'unit' , 4 , 0 ) ] ),
+	'TEMPERATURE': ( 5 , [ ( 'value' , 3 , 0 ) , ( 'unit' , 4 , 0 ) ] ),
+	'POSITION':    ( 4 , [ ( 'position' , 3 , 0 ) ] ),
+}
+
+# record types that can be requested (SCAN includes the SCAN_COMPACT records):
+_TYPES = ( 'PEAK' , 'ZERO' , 'SCAN' , 'PRESSURE' , 'TEMPERATURE' , 'POSITION' , 'STANDARD' , 'DECONVOLUTION' )
+
+# index codes of the record types (see datafile_index class):
+_CODES = { t:[ c for n,c in datafile_index.codes.items() if n == t or n == t + '_xyz' or ( t == 'SCAN' and n == 'SCAN_COMPACT' ) ] for t in _TYPES }
+
+
+class datafile_reader:
+	"""
+	ruediPy class for reading RUEDI data files (as written by the datafile class) into numpy structured arrays, e.g. for data processing. The file is read in chunks (through mmap for uncompressed files, or through the gzip / lzma decompressors for *.txt.gz / *.txt.xz files), and all records of a given type are parsed from a chunk in one go. Only the requested record types are kept in memory.
+
+	Example (intensities of all PEAK records at mz=40):
+		R = datafile_reader('2026-10-17_12-00-00_SAMPLE.txt')
+		P = R.read('PEAK')['PEAK']
+		k = ( P['mz'] == 40 ) & ( P['type'] == '' )
+		t = P['t'][k]
+		y = P['intensity'][k]
+
+	If the data file has a sidecar index (see datafile_index class), or if a time window is given, datafile_reader.read() uses the index to read only the relevant parts of the file. The index of files without a sidecar index is built when it is first needed (see datafile_reader.index()).
+	"""
+
+
+	########################################################################################################
+
+
+	def __init__(self,path,chunk_size=16*1024*1024):
+		'''
+		datafile_reader.__init__(path,chunk_size=16*1024*1024)
+
+		Initialize DATAFILE_READER object.
+
+		INPUT:
+		path: path of the data file (string; plain text, or gzip / lzma compressed)
+		chunk_size (optional): size of the chunks of the file that are parsed in one go (bytes). Default: chunk_size = 16*1024*1024
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._path = os.path.expanduser(path)
+		self._chunk_size = int(chunk_size)
+		self._idx = None # index of the file (see datafile_reader.index())
+		self._idx_size = None # file size at the time the index was loaded / built
+
+
+	########################################################################################################
+
+
+	def label(self):
+		'''
+		label = datafile_reader.label()
+
+		Return label / name of the DATAFILE_READER object
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		label: label / name (string)
+		'''
+
+		return 'DATAFILE_READER'
+
+
+	########################################################################################################
+
+
+	def warning(self,msg):
+		'''
+		datafile_reader.warning(msg)
+
+		Issue warning about issues related to reading the data file.
+
+		INPUT:
+		msg: warning message (string)
+
+		OUTPUT:
+		(none)
+		'''
+
+		misc.warnmessage ('[' + self.label() + '] ' + msg)
+
+
+	########################################################################################################
+
+
+	def name(self):
+		'''
+		n = datafile_reader.name()
+
+		Return the path of the data file.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		n: path (string)
+		'''
+
+		return self._path
+
+
+	########################################################################################################
+
+
+	def _compression(self):
+		# return compression of the data file (None, 'gzip' or 'lzma'), determined from the first bytes of the file
+		with open(self._path,'rb') as f:
+			m = f.read(6)
+		if m[:2] == b'\x1f\x8b':
+			return 'gzip'
+		if m == b'\xfd7zXZ\x00':
+			return 'lzma'
+		return None
+
+
+	########################################################################################################
+
+
+	def _raw_chunks(self,start=0,stop=None):
+		# yield (offset,chunk) of the file content between byte offsets start and stop (offsets of the uncompressed data). Every chunk ends with a complete line. A truncated last line (e.g. if the file is still being written) is not returned.
+
+		c = self._compression()
+		size = self._chunk_size
+
+		if c is None:
+			with open(self._path,'rb') as f:
+				if os.fstat(f.fileno()).st_size == 0:
+					return
+				with mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) as m:
+					n = len(m) if stop is None else min(stop,len(m))
+					pos = start
+					while pos < n:
+						end = min(pos+size,n)
+						if end < len(m) or m[end-1:end] != b'\n':
+							k = m.rfind(b'\n',pos,end)
+							if k < 0: # line longer than chunk size
+								k = m.find(b'\n',end)
+								if k < 0:
+									return
+							end = k + 1
+						yield pos , m[pos:end]
+						pos = end
+			return
+
+		if c == 'gzip':
+			f = gzip.open(self._path,'rb')
+		else:
+			f = lzma.open(self._path,'rb')
+		with f:
+			pos = 0
+			rest = b''
+			while stop is None or pos < stop:
+				try:
+					x = f.read(size)
+				except EOFError: # compressed stream is incomplete (file is still being written)
+					x = b''
+				if not x:
+					break
+				x = rest + x
+				k = x.rfind(b'\n')
+				if k < 0:
+					rest = x
+					continue
+				rest = x[k+1:]
+				chunk = x[:k+1]
+				p0 = pos
+				pos = pos + len(chunk)
+				if pos <= start:
+					continue
+				if p0 < start: # skip to first line at or after start
+					chunk = chunk[start-p0:]
+					p0 = start
+				if stop is not None and pos > stop:
+					chunk = chunk[:stop-p0]
+				yield p0 , chunk
+
+
+	########################################################################################################
+
+
+	def chunks(self,types=None):
+		'''
+		for data in datafile_reader.chunks(types=None):
+			...
+
+		Iterate over the data file chunk by chunk, and return the records of the requested types in each chunk (see datafile_reader.read() for the format of the data). This allows processing files that are too large to keep all records in memory.
+
+		INPUT:
+		types (optional): record type or list of record types (PEAK, ZERO, SCAN, PRESSURE, TEMPERATURE, POSITION, STANDARD, DECONVOLUTION). Default: types = None (all types)
+
+		OUTPUT:
+		data: dict with the records of the requested types in the chunk (see datafile_reader.read())
+		'''
+
+		types = self._types(types)
+		for pos,chunk in self._raw_chunks():
+			yield self._parse(chunk,types)
+
+
+	########################################################################################################
+
+
+	def read(self,types=None,t_min=None,t_max=None):
+		'''
+		data = datafile_reader.read(types=None,t_min=None,t_max=None)
+
+		Read the records of the requested types from the data file. If there is a sidecar index file, or if a time window is given, only the parts of the file with records of the requested types within the time window are read (see datafile_reader.index()).
+
+		INPUT:
+		types (optional): record type or list of record types (PEAK, ZERO, SCAN, PRESSURE, TEMPERATURE, POSITION, STANDARD, DECONVOLUTION). Default: types = None (all types)
+		t_min, t_max (optional): time window (records with t_min <= t <= t_max). Default: t_min = None, t_max = None (no limits)
+
+		OUTPUT:
+		data: dict with one numpy structured array for each requested record type, with the fields
+			all types: t (time stamp), caller, label
+			PEAK: type (the xyz of PEAK_xyz records, empty for PEAK records), mz, intensity, unit, detector, gate
+			ZERO: type (the xyz of ZERO_xyz records, empty for ZERO records), mz, mz_offset, intensity, unit, detector, gate
+			SCAN: unit, detector, gate, first, n (SCAN and SCAN_COMPACT records)
+			PRESSURE, TEMPERATURE: value, unit
+			POSITION: position
+			STANDARD: species, concentration, mz
+			DECONVOLUTION: target_mz, target_species, detector, MS_EE, basis (string)
+		The mz and intensity values of the SCAN records are in data['SCAN.values'] (structured array with fields mz and intensity). The values of the i-th scan are data['SCAN.values'][first[i]:first[i]+n[i]].
+		'''
+
+		types = self._types(types)
+
+		if t_min is None and t_max is None and not os.path.isfile(datafile_index.index_name(self._path)):
+			parts = [ self._parse(chunk,types) for pos,chunk in self._raw_chunks() ]
+			return self._concatenate(parts,types)
+
+		return self._read_index(types,t_min,t_max)
+
+
+	########################################################################################################
+
+
+	def index(self,build=True,save=False):
+		'''
+		idx = datafile_reader.index(build=True,save=False)
+
+		Return the index of the data file (record type code, time stamp and byte offset of each line, see datafile_index class). The index is loaded from the sidecar index file (if it exists). Lines that are not in the sidecar index (e.g. lines added to the data file after the index was written), or all lines if there is no sidecar index, are indexed by scanning the data file (without parsing the records).
+
+		INPUT:
+		build (optional): flag to build the index if there is no sidecar index file. Default: build = True
+		save (optional): flag to write the index to the sidecar index file (if it was built or extended), so that it does not need to be built again. Default: save = False
+
+		OUTPUT:
+		idx: index (numpy structured array with fields code, t and offset), or None if there is no sidecar index file and build = False
+		'''
+
+		size = os.path.getsize(self._path)
+		if self._idx is not None and self._idx_size == size:
+			return self._idx[0]
+
+		fn = datafile_index.index_name(self._path)
+		idx = None
+		if os.path.isfile(fn):
+			try:
+				idx = datafile_index.load(fn)
+			except ValueError as e:
+				self.warning( str(e) + '. Rebuilding index...' )
+			if idx is not None and len(idx) > 0 and self._compression() is None and int(idx['offset'][-1]) >= size:
+				self.warning( 'Index file ' + fn + ' does not match the data file. Rebuilding index...' )
+				idx = None
+		elif not build:
+			return None
+
+		# index the remaining lines (starting with the last line in the index, which may be incomplete):
+		n = 0
+		if idx is not None and len(idx) > 0:
+			n = len(idx) - 1
+		start = int(idx['offset'][n]) if n > 0 else 0
+		parts = [ idx[:n] ] if n > 0 else []
+		for pos,chunk in self._raw_chunks(start):
+			parts.append( _lines(chunk).index(pos) )
+		idx = numpy.concatenate(parts) if len(parts) > 0 else numpy.zeros( 0 , dtype=datafile_index.dtype )
+
+		if save and ( n == 0 or len(idx) > n+1 ):
+			datafile_index.save(fn,idx)
+
+		# running max. of the time stamps from the start, and running min. from the end (the time stamps in the file may not be strictly in ascending order), used to find the lines of a time window by binary search:
+		t = idx['t']
+		lo = numpy.maximum.accumulate( numpy.where( numpy.isnan(t) , -numpy.inf , t ) )
+		hi = numpy.minimum.accumulate( numpy.where( numpy.isnan(t) , numpy.inf , t )[::-1] )[::-1]
+
+		self._idx = ( idx , lo , hi )
+		self._idx_size = size
+		return idx
+
+
+	########################################################################################################
+
+
+	def _read_index(self,types,t_min,t_max):
+		# read records of given types within time window using the index
+
+		self.index()
+		idx,lo,hi = self._idx
+		N = len(idx)
+
+		# lines in the time window (binary search):
+		a = 0 if t_min is None else numpy.searchsorted( lo , t_min , side='left' )
+		b = N if t_max is None else numpy.searchsorted( hi , t_max , side='right' )
+
+		# lines of the requested types:
+		k = a + numpy.flatnonzero( numpy.isin( idx['code'][a:b] , sum( [ _CODES[t] for t in types ] , [] ) ) )
+		if len(k) == 0:
+			return self._concatenate([],types)
+		offset = idx['offset']
+		end = lambda j: int(offset[j+1]) if j+1 < N else None
+
+		parts = []
+		if self._compression() is not None or len(k)*8 >= b-a:
+			# many lines in the range: read the whole range
+			for pos,chunk in self._raw_chunks( int(offset[k[0]]) , end(k[-1]) ):
+				parts.append( self._parse(chunk,types) )
+		else:
+			# few lines in the range: read only the lines of the requested types (runs of consecutive lines)
+			j = numpy.flatnonzero( numpy.diff(k) != 1 )
+			runs = zip( k[ numpy.append(0,j+1) ] , k[ numpy.append(j,len(k)-1) ] )
+			with open(self._path,'rb') as f:
+				with mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) as m:
+					x = []
+					n = 0
+					for r0,r1 in runs:
+						e = end(r1)
+						x.append( m[ int(offset[r0]) : e ] )
+						n = n + len(x[-1])
+						if n >= self._chunk_size:
+							parts.append( self._parse(b''.join(x),types) )
+							x = []
+							n = 0
+					if len(x) > 0:
+						parts.append( self._parse(b''.join(x),types) )
+
+		data = self._concatenate(parts,types)
+
+		# remove records outside the time window:
+		if t_min is not None or t_max is not None:
+			for typ in types:
+				r = data[typ]
+				u = numpy.ones( len(r) , dtype=bool )
+				if t_min is not None:
+					u &= r['t'] >= t_min
+				if t_max is not None:
+					u &= r['t'] <= t_max
+				if u.all():
+					continue
+				if typ == 'SCAN':
+					data['SCAN.values'] = data['SCAN.values'][ numpy.repeat(u,r['n']) ]
+					r = r[u]
+					r['first'] = numpy.concatenate( ( [0] , numpy.cumsum(r['n'])[:-1] ) )
+				else:
+					r = r[u]
+				data[typ] = r
+
+		return data
+
+
+	########################################################################################################
+
+
+	def _types(self,types):
+		# return list of requested record types
+		if types is None:
+			return list(_TYPES)
+		if isinstance(types,str):
+			types = [types]
+		types = [ t.upper() for t in types ]
+		for t in types:
+			if not t in _TYPES:
+				raise ValueError('unknown record type ' + t)
+		return types
+
+
+	########################################################################################################
+
+
+	def _parse(self,chunk,types):
+		# parse records of the given types in a chunk of the data file (bytes)
+
+		L = _lines(chunk)
+		data = {}
+		for typ in types:
+			k = L.select(typ)
+			if typ == 'SCAN':
+				r,v = self._parse_scan(L.join(k))
+				data['SCAN'] = r
+				data['SCAN.values'] = v
+			elif typ in _TOKENS:
+				data[typ] = self._tokens(L,k,typ)
+			else:
+				data[typ] = self._records( _REGEX[typ].findall(L.join(k)) , typ )
+		return data
+
+
+	########################################################################################################
+
+
+	def _tokens(self,L,k,typ):
+		# parse records of type typ from the tokens of lines k (lines with an unexpected number of tokens are parsed with the regular expression)
+
+		n,fields = _TOKENS[typ]
+		ok = L.ntok[k] == n
+		j = k[ok]
+		if len(j) == 0:
+			return self._records( _REGEX[typ].findall(L.join(k)) , typ )
+
+		cols = {}
+		cols['t'] = _float( L.token(j,0) )
+		cols['caller'],cols['label'] = _source( L.token(j,1) )
+		if typ in ( 'PEAK' , 'ZERO' ):
+			cols['type'] = L.subtype[ L.ident[j] ]
+		for f,i,p in fields:
+			if f in ( 'unit' , 'detector' ):
+				cols[f] = _decode( L.token(j,i,p) )
+			else:
+				cols[f] = _float( L.token(j,i,p,64) )
+		r = _struct( cols , [ f for f,dt,i in _FIELDS[typ] ] )
+
+		if not ok.all():
+			# parse the other lines one by one, and combine them with the records parsed from the tokens (in the order of the file):
+			x = [ ( i , _REGEX[typ].match(L.join([i])) ) for i in k[~ok] ]
+			x = [ ( i , m.groups() ) for i,m in x if m is not None ]
+			if len(x) > 0:
+				r = _cat( [ r , self._records( [ m for i,m in x ] , typ ) ] )
+				p = numpy.concatenate( ( j , [ i for i,m in x ] ) )
+				r = r[ numpy.argsort(p,kind='stable') ]
+		return r
+
+
+	########################################################################################################
+
+
+	def _records(self,x,typ):
+		# convert list of regex matches to structured array of record type typ
+		fields = _FIELDS[typ]
+		if len(x) == 0:
+			return numpy.zeros( 0 , dtype = [ ( n , 'U1' if dt == 'U' else dt ) for n,dt,j in fields ] )
+		x = numpy.array(x)
+		cols = {}
+		for n,dt,j in fields:
+			if n == 'caller':
+				cols['caller'],cols['label'] = _source(x[:,j])
+			elif n == 'label':
+				pass
+			elif dt == 'U':
+				cols[n] = _decode(x[:,j])
+			else:
+				cols[n] = _float(x[:,j])
+		return _struct(cols,[ n for n,dt,j in fields ])
+
+
+	########################################################################################################
+
+
+	def _parse_scan(self,chunk):
+		# parse SCAN and SCAN_COMPACT records in a chunk of the data file, return records (with first/n of values, in the order of the file) and values
+
+		recs = []
+		pos = []
+		mz = []
+		y = []
+
+		for typ in ( 'SCAN' , 'SCAN_COMPACT' ):
+			if not ( b' ' + typ.encode() + b':' ) in chunk:
+				continue
+			x = [ ( m.start() , m.groups() ) for m in _REGEX[typ].finditer(chunk) ]
+			if len(x) == 0:
+				continue
+			recs.append( self._records( [ r for p,r in x ] , typ ) )
+			for p,r in x:
+				if typ == 'SCAN':
+					M = numpy.fromstring(r[2],sep=',') if r[2].strip() else numpy.zeros(0)
+					Y = numpy.fromstring(r[3],sep=',') if r[3].strip() else numpy.zeros(0)
+				else:
+					N = int(r[5])
+					M = float(r[2]) + float(r[4])*numpy.arange(N)
+					Y = _intensity(r[6])
+				n = min(len(M),len(Y))
+				pos.append(p)
+				mz.append(M[:n])
+				y.append(Y[:n])
+
+		if len(recs) == 0:
+			r = numpy.zeros( 0 , dtype = [ ( n , 'U1' if dt == 'U' else dt ) for n,dt,j in _FIELDS['SCAN'] ] + [ ( 'first' , 'i8' ) , ( 'n' , 'i8' ) ] )
+			return r , numpy.zeros( 0 , dtype = [ ( 'mz' , 'f8' ) , ( 'intensity' , 'f8' ) ] )
+
+		# combine SCAN and SCAN_COMPACT records in the order of the file:
+		o = numpy.argsort(pos,kind='stable')
+		r = _cat(recs)[o]
+		mz = [ mz[i] for i in o ]
+		y = [ y[i] for i in o ]
+		n = numpy.array( [ len(M) for M in mz ] , dtype='i8' )
+		cols = { k:r[k] for k in r.dtype.names }
+		cols['first'] = numpy.concatenate( ( [0] , numpy.cumsum(n)[:-1] ) ).astype('i8')
+		cols['n'] = n
+		r = _struct( cols , list(r.dtype.names) + [ 'first' , 'n' ] )
+
+		v = numpy.zeros( int(n.sum()) , dtype = [ ( 'mz' , 'f8' ) , ( 'intensity' , 'f8' ) ] )
+		if len(v) > 0:
+			v['mz'] = numpy.concatenate(mz)
+			v['intensity'] = numpy.concatenate(y)
+
+		return r,v
+
+
+	########################################################################################################
+
+
+	def _concatenate(self,parts,types):
+		# combine the data of all chunks
+		data = {}
+		for typ in types:
+			data[typ] = _cat( [ p[typ] for p in parts ] ) if len(parts) > 0 else self._parse(b'',[typ])[typ]
+		if 'SCAN' in types and len(parts) > 0:
+			v = [ p['SCAN.values'] for p in parts ]
+			offset = numpy.cumsum( [0] + [ len(x) for x in v[:-1] ] )
+			data['SCAN']['first'] = numpy.concatenate( [ p['SCAN']['first'] + o for p,o in zip(parts,offset) ] )
+			data['SCAN.values'] = numpy.concatenate(v)
+		elif 'SCAN' in types:
+			data['SCAN.values'] = self._parse(b'',['SCAN'])['SCAN.values']
+		return data
+
+
+########################################################################################################
+# helper functions for converting the fields of the regex matches (numpy arrays of bytes):
+
+
+def _float(x):
+	# convert to float (unparseable values are NaN)
+	try:
+		return x.astype('f8')
+	except ValueError:
+		y = numpy.empty(len(x))
+		for i,v in enumerate(x):
+			try:
+				y[i] = float(v)
+			except ValueError:
+				y[i] = numpy.nan
+		return y
+
+
+def _unique(x):
+	# unique values of numpy array of bytes strings x, and indices of the unique values for each element of x (same as numpy.unique(x,return_inverse=True), but sorts hash values of the strings instead of the strings)
+	w = x.dtype.itemsize
+	W = -(-w//8)*8
+	if W != w:
+		x = x.astype('S' + str(W))
+	h = numpy.zeros( len(x) , dtype='u8' )
+	for c in x.view('u8').reshape(len(x),W//8).T:
+		h = h * numpy.uint64(0x9E3779B97F4A7C15) + c
+		h = h ^ ( h >> numpy.uint64(29) )
+	h,j,k = numpy.unique( h , return_index = True , return_inverse = True )
+	return x[j],k
+
+
+def _decode(x):
+	# convert to strings (the fields have only a few distinct values, so decode each of them only once)
+	if len(x) == 0:
+		return numpy.zeros(0,dtype='U1')
+	u,k = _unique(x)
+	return numpy.array( [ v.decode('utf-8','replace') for v in u ] )[k]
+
+
+def _source(x):
+	# split CALLER[LABEL] fields into caller and label
+	if len(x) == 0:
+		return numpy.zeros(0,dtype='U1') , numpy.zeros(0,dtype='U1')
+	u,k = _unique(x)
+	c = []
+	l = []
+	for v in u:
+		v = v.decode('utf-8','replace')
+		if v.endswith(']') and '[' in v:
+			j = v.index('[')
+			c.append(v[:j])
+			l.append(v[j+1:-1])
+		else:
+			c.append(v)
+			l.append(v)
+	return numpy.array(c)[k] , numpy.array(l)[k]
+
+
+def _intensity(s):
+	# parse intensity values of SCAN_COMPACT record (comma separated list, or base64 encoded binary data)
+	if s.startswith(b'base64-float32:'):
+		return numpy.frombuffer( base64.b64decode(s[15:]) , dtype='<f4' ).astype('f8')
+	if s.startswith(b'base64-int32:'):
+		return numpy.frombuffer( base64.b64decode(s[13:]) , dtype='<i4' ).astype('f8')
+	return numpy.fromstring(s,sep=',')
+
+
+def _struct(cols,names):
+	# combine columns to structured array
+	n = len(cols[names[0]])
+	a = numpy.zeros( n , dtype = [ ( k , cols[k].dtype ) for k in names ] )
+	for k in names:
+		a[k] = cols[k]
+	return a
+
+
+def _cat(x):
+	# concatenate structured arrays (string fields may have different lengths)
+	x = [ a for a in x if len(a) > 0 ] or x[:1]
+	if len(x) == 1:
+		return x[0]
+	names = x[0].dtype.names
+	return _struct( { k:numpy.concatenate( [ a[k] for a in x ] ) for k in names } , names )
+
+
+class _lines:
+	# lines of a chunk of a data file, split into space separated tokens (all operations are vectorized on the bytes of the chunk, so that the lines are not handled one by one in Python)
+
+	def __init__(self,chunk):
+		self.chunk = chunk
+		b = numpy.frombuffer(chunk + bytes(256),dtype='u1') # padded for reading tokens of max. width 256
+		self.w = numpy.lib.stride_tricks.sliding_window_view(b,256)
+		b = b[:len(chunk)]
+		nl = numpy.flatnonzero( b == 10 )
+		self.start = numpy.concatenate( ( [0] , nl[:-1]+1 ) ).astype('i8')
+		self.end = nl - ( b[nl-1] == 13 ) if len(nl) > 0 and nl[0] > 0 else nl # ignore CR of CRLF line ends
+		self.sp = numpy.flatnonzero( b == 32 )
+		self.j = numpy.searchsorted(self.sp,self.start) # index of first space of each line
+		self.ntok = numpy.diff( numpy.append(self.j,len(self.sp)) ) + 1 # number of tokens of each line (there are no spaces between the end of a line and the start of the next line)
+
+		# identifiers of the lines (third token, without the colon):
+		k = numpy.flatnonzero( self.ntok >= 3 )
+		ident = numpy.zeros( len(nl) , dtype='i8' )
+		u = []
+		if len(k) > 0:
+			u,ident[k] = _unique( self.token(k,2,0,32) )
+		self.ident = ident
+		self.names = [ '' ] * len(u)
+		subtype = [ '' ] * len(u)
+		for i,x in enumerate(u):
+			x = x.decode('utf-8','replace')
+			if x.endswith(':'):
+				x = x[:-1]
+				self.names[i] = x
+				if x.startswith('PEAK_') or x.startswith('ZERO_'):
+					subtype[i] = x[5:]
+		self.subtype = numpy.array( subtype + [''] )
+		self.valid = self.ntok >= 3
+
+	def select(self,typ):
+		# indices of the lines of record type typ
+		i = [ j for j,x in enumerate(self.names) if x == typ or ( typ in ( 'PEAK' , 'ZERO' ) and x.startswith(typ + '_') ) or ( typ == 'SCAN' and x == 'SCAN_COMPACT' ) ]
+		if len(i) == 0:
+			return numpy.zeros(0,dtype='i8')
+		return numpy.flatnonzero( numpy.isin(self.ident,i) & self.valid )
+
+	def token(self,k,i,prefix=0,width=256):
+		# i-th token of lines k (without the prefix of the given length) as numpy array of bytes strings (max. width)
+		j = self.j[k]
+		s = self.start[k] if i == 0 else self.sp[j+i-1] + 1 + prefix
+		e = numpy.where( self.ntok[k] > i+1 , self.sp[ numpy.minimum(j+i,len(self.sp)-1) ] , self.end[k] )
+		n = numpy.clip( e-s , 0 , width )
+		w = max( int(n.max()) if len(n) > 0 else 1 , 1 )
+		x = self.w[s,:w]
+		x *= ( numpy.arange(w) < n[:,None] )
+		return x.view('S' + str(w)).ravel()
+
+	def join(self,k):
+		# lines k as bytes
+		return b''.join( [ self.chunk[s:e+1] for s,e in zip( self.start[k] , self.end[k] ) ] )
+
+	def index(self,pos):
+		# index records of the lines (see datafile_index class), pos = offset of the chunk in the file
+		code = numpy.array( [ datafile_index.code(x) for x in self.names ] + [0] , dtype='u1' )
+		k = numpy.arange(len(self.start))
+		x = numpy.zeros( len(k) , dtype=datafile_index.dtype )
+		x['code'] = code[self.ident] * self.valid
+		x['t'] = _float( self.token(k,0,0,64) )
+		x['offset'] = pos + self.start
+		return x
+
@@ -0,0 +1,285 @@
+# Code for the datawriter class (background thread for writing data files)
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import queue
+	import threading
+	import atexit
+	import time
+	from .misc	import misc
+except ImportError as e:
+	print (e)
+	raise
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / datawriter class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+class datawriter:
+	"""
+	ruediPy class for writing data files in a background thread. The datafile objects using a datawriter put their data records (with the time stamps taken at the time of the measurement) into a queue, and the writer thread formats the records and writes them to the files. A slow disk therefore does not stall the data acquisition (unless the queue is full, see the policy option).
+
+	Several datafile objects can share the same datawriter (and writer thread), e.g.:
+		W = datawriter()
+		DATAFILE = datafile ( '~/data' , writer = W )
+		LOGFILE = datafile ( '~/log' , writer = W )
+	"""
+
+
+	########################################################################################################
+
+
+	def __init__( self , queue_size = 10000 , policy = 'block' , label = 'DATAWRITER' ):
+		'''
+		datawriter.__init__( queue_size = 10000 , policy = 'block' , label = 'DATAWRITER' )
+
+		Initialize DATAWRITER object, start writer thread.
+
+		INPUT:
+		queue_size (optional): max. number of data records waiting in the queue for the writer thread. Default: queue_size = 10000
+		policy (optional): what to do with new data records if the queue is full (string). Default: policy = 'block'
+			policy = 'block': wait until the writer thread has caught up (no data are lost, but the data acquisition is slowed down)
+			policy = 'drop': drop the new data records (the data acquisition is not slowed down, but the dropped data are lost, see datawriter.dropped())
+		label (optional): label / name of the DATAWRITER object (string). Default: label = 'DATAWRITER'
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._label = label
+
+		policy = policy.lower()
+		if not ( policy in ( 'block' , 'drop' ) ):
+			self.warning ( 'Unknown queue policy ' + policy + '. Using policy = \'block\'...' )
+			policy = 'block'
+		self._block = ( policy == 'block' )
+
+		self._queue = queue.Queue(queue_size)
+		self._dropped = 0
+		self._drop_warning_time = None # time of last warning about dropped records
+
+		# number of records in the queue for each datafile object (key = datafile object):
+		self._pending = {}
+		self._cond = threading.Condition()
+
+		self._thread = threading.Thread( target = self._run , name = label )
+		self._thread.daemon = True
+		self._thread.start()
+
+		# write remaining data records before the program exits:
+		atexit.register(self.close)
+
+
+	########################################################################################################
+
+
+	def label(self):
+		'''
+		label = datawriter.label()
+
+		Return label / name of the DATAWRITER object
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		label: label / name (string)
+		'''
+
+		return self._label
+
+
+	########################################################################################################
+
+
+	def warning(self,msg):
+		'''
+		datawriter.warning(msg)
+
+		Issue warning about issues related to the data writer.
+
+		INPUT:
+		msg: warning message (string)
+
+		OUTPUT:
+		(none)
+		'''
+
+		misc.warnmessage ('[' + self.label() + '] ' + msg)
+
+
+	########################################################################################################
+
+
+	def in_writer_thread(self):
+		'''
+		x = datawriter.in_writer_thread()
+
+		Check if the calling code is running in the writer thread.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		x: flag (bool)
+		'''
+
+		return threading.current_thread() is self._thread
+
+
+	########################################################################################################
+
+
+	def put(self,obj,func,args):
+		'''
+		ok = datawriter.put(obj,func,args)
+
+		Put a data record into the queue. The writer thread will call func(*args).
+
+		INPUT:
+		obj: datafile object the record belongs to (see datawriter.drain())
+		func: function / method to be called by the writer thread
+		args: arguments for func (tuple)
+
+		OUTPUT:
+		ok: flag indicating if the record was put into the queue (bool, False if the record was dropped)
+		'''
+
+		with self._cond:
+			self._pending[obj] = self._pending.get(obj,0) + 1
+
+		try:
+			self._queue.put( ( obj , func , args ) , block = self._block )
+
+		except queue.Full:
+			with self._cond:
+				self._pending[obj] = self._pending[obj] - 1
+			self._dropped = self._dropped + 1
+			t = time.monotonic()
+			if self._drop_warning_time is None or t - self._drop_warning_time > 10: # don't warn more than every 10 seconds
+				self._drop_warning_time = t
+				self.warning( 'Queue is full, dropping data records (' + str(self._dropped) + ' records dropped so far).' )
+			return False
+
+		return True
+
+
+	########################################################################################################
+
+
+	def _run(self):
+		# writer thread: take records from the queue and write them
+
+		while True:
+			x = self._queue.get()
+			if x is None:
+				break
+
+			obj,func,args = x
+			try:
+				func(*args)
+			except Exception as e:
+				self.warning( 'Could not write data record (' + str(e) + ').' )
+			finally:
+				with self._cond:
+					self._pending[obj] = self._pending[obj] - 1
+					self._cond.notify_all()
+
+
+	########################################################################################################
+
+
+	def drain(self,obj=None,timeout=None):
+		'''
+		ok = datawriter.drain(obj=None,timeout=None)
+
+		Wait until the data records in the queue have been written.
+
+		INPUT:
+		obj (optional): datafile object. Default: obj = None (wait for the records of all datafile objects)
+		timeout (optional): max. waiting time (seconds). Default: timeout = None (no limit)
+
+		OUTPUT:
+		ok: flag indicating if all records were written (bool, False if the timeout expired)
+		'''
+
+		if self.in_writer_thread() or not self.is_running():
+			return self._queue.empty()
+
+		if obj is None:
+			f = lambda: not any( self._pending.values() )
+		else:
+			f = lambda: self._pending.get(obj,0) == 0
+
+		with self._cond:
+			return self._cond.wait_for( f , timeout )
+
+
+	########################################################################################################
+
+
+	def dropped(self):
+		'''
+		n = datawriter.dropped()
+
+		Return the number of data records that were dropped because the queue was full (only with policy = 'drop').
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		n: number of dropped records (integer)
+		'''
+
+		return self._dropped
+
+
+	########################################################################################################
+
+
+	def is_running(self):
+		'''
+		x = datawriter.is_running()
+
+		Check if the writer thread is running.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		x: flag (bool)
+		'''
+
+		return self._thread.is_alive()
+
+
+	########################################################################################################
+
+
+	def close(self):
+		'''
+		datawriter.close()
+
+		Write the remaining data records and stop the writer thread. The datafile objects using this datawriter will then write their data directly (without background thread).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if self._thread.is_alive():
+			self._queue.put(None)
+			self._thread.join()
@@ -0,0 +1,354 @@
+# Code for the historybuffer class (multi-resolution history of data series)
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import numpy
+except ImportError as e:
+	print (e)
+	raise
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / historybuffer class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+class _ring:
+	# ring of up to M records with the given fields. Each record is stored twice (at i and i+N of arrays with length 2N), so that the records are always available as contiguous views in chronological order. The arrays start small and grow on demand (N = current capacity, doubled until it reaches M), so that rings that get only a few records use little memory.
+
+	__slots__ = ( 'f' , 'N' , 'M' , 'i' , 'n' )
+
+	def __init__(self,N,fields,N0=64):
+		self.M = N
+		self.N = min(N,N0)
+		self.f = { k:numpy.zeros(2*self.N) for k in fields }
+		self.i = 0 # index of the next record to be written
+		self.n = 0 # number of records
+
+	def _grow(self,n):
+		# make room for n records (as long as the capacity is less than M). The ring does not wrap around before it has reached its max. capacity, so the records are at 0...n-1.
+		if n <= self.N or self.N >= self.M:
+			return
+		N = self.N
+		while N < n and N < self.M:
+			N = min(2*N,self.M)
+		for k,a in self.f.items():
+			b = numpy.zeros(2*N)
+			b[:self.n] = b[N:N+self.n] = a[:self.n]
+			self.f[k] = b
+		self.N = N
+		self.i = self.n
+
+	def append(self,**v):
+		if self.n == self.N:
+			self._grow(self.n+1)
+		i = self.i
+		for k,x in v.items():
+			a = self.f[k]
+			a[i] = a[i+self.N] = x
+		self.i = (i+1) % self.N
+		if self.n < self.N:
+			self.n = self.n + 1
+
+	def append_many(self,**v):
+		self._grow( self.n + len(next(iter(v.values()))) )
+		n = min( len(next(iter(v.values()))) , self.N )
+		k = ( self.i + numpy.arange(n) ) % self.N
+		for f,x in v.items():
+			a = self.f[f]
+			a[k] = a[k+self.N] = x[-n:]
+		self.i = (self.i + n) % self.N
+		self.n = min(self.n + n,self.N)
+
+	def full(self):
+		# check if the ring has reached its max. capacity and is full (new records overwrite the oldest records)
+		return self.n == self.M
+
+	def set(self,j,**v):
+		# set values of record j (j = -1: most recent record)
+		j = ( self.i + j ) % self.N
+		for k,x in v.items():
+			a = self.f[k]
+			a[j] = a[j+self.N] = x
+
+	def get(self,j,k):
+		return self.f[k][ ( self.i + j ) % self.N ]
+
+	def view(self,k,first=0):
+		# records first...n-1 of field k (chronological order)
+		j = self.i + self.N - self.n
+		return self.f[k][j+first:j+self.n]
+
+	def clear(self):
+		self.i = 0
+		self.n = 0
+
+
+class historybuffer:
+	"""
+	ruediPy class for keeping a long-term history of a data series (e.g. PEAK readings of one m/z value, or pressure readings) in bounded memory. The raw data are kept for a limited time (e.g. the last 10 minutes), older data are kept as rollups (mean, min, max and number of data points in time bins of e.g. 10 s, 1 min and 1 h). All data are stored in arrays with a fixed max. size (which are allocated on demand), so the memory use does not grow with time.
+
+	Use historybuffer.get() to retrieve the data at the resolution that fits a given time window.
+	"""
+
+
+	# default rollup levels (bin width in seconds, number of bins):
+	default_levels = ( ( 10 , 2160 ) , ( 60 , 4320 ) , ( 3600 , 2160 ) ) # 10 s for 6 h, 1 min for 3 days, 1 h for 90 days
+
+
+	########################################################################################################
+
+
+	def __init__( self , raw_window = 600 , raw_len = 6000 , levels = None ):
+		'''
+		historybuffer.__init__( raw_window = 600 , raw_len = 6000 , levels = None )
+
+		Initialize HISTORYBUFFER object.
+
+		INPUT:
+		raw_window (optional): time window for keeping raw data (seconds). Default: raw_window = 600
+		raw_len (optional): max. number of raw data points. Default: raw_len = 6000
+		levels (optional): rollup levels, list of (bin width, number of bins) pairs (bin width in seconds, in ascending order). Default: levels = None (use historybuffer.default_levels)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if levels is None:
+			levels = self.default_levels
+
+		self._raw_window = raw_window
+		self._raw = _ring( max(int(raw_len),1) , ( 't' , 'x' ) )
+		self._dt = [ float(dt) for dt,N in levels ]
+		self._levels = [ _ring( max(int(N),1) , ( 't' , 'sum' , 'min' , 'max' , 'count' ) ) for dt,N in levels ]
+
+
+	########################################################################################################
+
+
+	def levels(self):
+		'''
+		dt = historybuffer.levels()
+
+		Return the bin widths of the rollup levels.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		dt: list of bin widths (seconds)
+		'''
+
+		return list(self._dt)
+
+
+	########################################################################################################
+
+
+	def add(self,t,x):
+		'''
+		historybuffer.add(t,x)
+
+		Add data point(s). Several data points can be added in one go by using arrays for t and x (in chronological order). NaN values are kept in the raw data, but are not included in the rollups.
+
+		INPUT:
+		t: epoch time(s)
+		x: data value(s)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if numpy.ndim(x) == 0:
+			# single data point:
+			self._raw.append( t = t , x = x )
+			if x == x: # not NaN
+				for dt,r in zip(self._dt,self._levels):
+					self._add_bin( r , t - t % dt , x , x , x , 1 )
+
+		else:
+			# several data points:
+			x = numpy.asarray(x,dtype=float)
+			t = numpy.broadcast_to( numpy.asarray(t,dtype=float) , x.shape )
+			if len(x) == 0:
+				return
+			self._raw.append_many( t = t , x = x )
+			k = ~numpy.isnan(x)
+			if not k.any():
+				return
+			t = t[k]
+			x = x[k]
+			for dt,r in zip(self._dt,self._levels):
+				b = t - t % dt # start of bin
+				o = numpy.argsort(b,kind='stable')
+				b = b[o]
+				xs = x[o]
+				j = numpy.flatnonzero( numpy.concatenate( ( [True] , b[1:] > b[:-1] ) ) ) # first data point in each bin
+				c = numpy.diff( numpy.append(j,len(xs)) )
+				for bin_data in zip( b[j] , numpy.add.reduceat(xs,j) , numpy.minimum.reduceat(xs,j) , numpy.maximum.reduceat(xs,j) , c ):
+					self._add_bin( r , *bin_data )
+
+
+	########################################################################################################
+
+
+	def _add_bin(self,r,b,s,mn,mx,c):
+		# add data to bin starting at time b (sum s, min. mn, max. mx, count c). The data of an older bin (data arriving out of order) are discarded if the bin is no longer in the buffer, or if it does not exist (no new bins are inserted between existing bins).
+
+		if r.n == 0 or b > r.get(-1,'t'):
+			# new bin:
+			r.append( t = b , sum = s , min = mn , max = mx , count = c )
+			return
+
+		if r.get(-1,'t') == b:
+			j = -1 # current bin
+		else:
+			t = r.view('t')
+			j = numpy.searchsorted(t,b)
+			if not ( j < len(t) and t[j] == b ):
+				return
+			j = j - len(t)
+
+		r.set( j , sum = r.get(j,'sum') + s , min = min(r.get(j,'min'),mn) , max = max(r.get(j,'max'),mx) , count = r.get(j,'count') + c )
+
+
+	########################################################################################################
+
+
+	def clear(self):
+		'''
+		historybuffer.clear()
+
+		Remove all data.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._raw.clear()
+		for r in self._levels:
+			r.clear()
+
+
+	########################################################################################################
+
+
+	def raw(self,window=None):
+		'''
+		t,x = historybuffer.raw(window=None)
+
+		Return the raw data within a time window that ends with the most recent data point (views of the buffer memory, which are only valid until the next data point is added). Only data within the raw-data time window of the HISTORYBUFFER object are returned.
+
+		INPUT:
+		window (optional): length of the time window (seconds). Default: window = None (raw-data time window of the HISTORYBUFFER object)
+
+		OUTPUT:
+		t: epoch times (numpy array)
+		x: data values (numpy array)
+		'''
+
+		if window is None or window > self._raw_window:
+			window = self._raw_window
+
+		t = self._raw.view('t')
+		j = numpy.searchsorted( t , t[-1]-window , side='left' ) if len(t) > 0 else 0
+		return t[j:] , self._raw.view('x',j)
+
+
+	########################################################################################################
+
+
+	def rollup(self,dt,window=None):
+		'''
+		t,mean,min,max,count = historybuffer.rollup(dt,window=None)
+
+		Return the rollup data of a given level within a time window that ends with the most recent bin.
+
+		INPUT:
+		dt: bin width of the rollup level (seconds), see historybuffer.levels()
+		window (optional): length of the time window (seconds). Default: window = None (all bins of the rollup level)
+
+		OUTPUT:
+		t: start times of the bins (epoch times, numpy array)
+		mean, min, max: mean, min. and max. of the data in each bin (numpy arrays)
+		count: number of data points in each bin (numpy array)
+		'''
+
+		r = self._levels[ self._dt.index(float(dt)) ]
+		t = r.view('t')
+		j = 0
+		if ( window is not None ) and len(t) > 0:
+			j = numpy.searchsorted( t , t[-1]-window , side='left' )
+		c = r.view('count',j)
+		return t[j:] , r.view('sum',j)/c , r.view('min',j) , r.view('max',j) , c
+
+
+	########################################################################################################
+
+
+	def resolution(self,window,max_points=None):
+		'''
+		dt = historybuffer.resolution(window,max_points=None)
+
+		Return the finest resolution that covers a given time window: raw data if the window is within the raw-data time window (and the raw data go back far enough), otherwise the finest rollup level that covers the window.
+
+		INPUT:
+		window: length of the time window (seconds)
+		max_points (optional): max. number of data points (if there are more data points at a given resolution, the next coarser resolution is used). Default: max_points = None (no limit)
+
+		OUTPUT:
+		dt: bin width of the rollup level (seconds), or 0 for raw data
+		'''
+
+		t = self._raw.view('t')
+		if window <= self._raw_window and len(t) > 0 and ( not self._raw.full() or t[-1]-t[0] >= window ):
+			j = numpy.searchsorted( t , t[-1]-window , side='left' )
+			if max_points is None or len(t)-j <= max_points:
+				return 0
+
+		for dt,r in zip(self._dt,self._levels):
+			if max_points is not None and window/dt > max_points:
+				continue
+			if not r.full() or dt*r.M >= window:
+				return dt
+
+		return self._dt[-1]
+
+
+	########################################################################################################
+
+
+	def get(self,window,max_points=None):
+		'''
+		dt,t,mean,min,max,count = historybuffer.get(window,max_points=None)
+
+		Return the data within a time window at the resolution that fits the window (see historybuffer.resolution()).
+
+		INPUT:
+		window: length of the time window (seconds)
+		max_points (optional): max. number of data points. Default: max_points = None (no limit)
+
+		OUTPUT:
+		dt: bin width of the rollup level (seconds), or 0 for raw data
+		t: epoch times (raw data) or start times of the bins (numpy array)
+		mean, min, max: mean, min. and max. of the data in each bin (numpy arrays; mean = min = max = data values for raw data)
+		count: number of data points in each bin (numpy array; 1 for raw data)
+		'''
+
+		dt = self.resolution(window,max_points)
+		if dt == 0:
+			t,x = self.raw(window)
+			return 0 , t , x , x , x , numpy.ones(len(x))
+		return ( dt , ) + self.rollup(dt,window)
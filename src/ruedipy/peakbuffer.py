@@ -0,0 +1,569 @@
+# Code for the peakbuffer class (ring buffer for PEAK readings of mass spectrometers)
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import numpy
+	from .misc	import misc
+	from .historybuffer	import historybuffer
+except ImportError as e:
+	print (e)
+	raise
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / peakbuffer class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+class _series:
+	# readings of one (mz,detector) series of the peakbuffer, in chronological order. The readings are kept in contiguous arrays (entries head...tail-1), so that the series data can be returned as views.
+
+	__slots__ = ( 't' , 'intens' , 'unit' , 'head' , 'tail' )
+
+	def __init__(self):
+		self.t      = numpy.empty(16)
+		self.intens = numpy.empty(16)
+		self.unit   = numpy.empty(16,dtype='u1')
+		self.head   = 0
+		self.tail   = 0
+
+	def __len__(self):
+		return self.tail - self.head
+
+	def append(self,t,intens,unit):
+		n = numpy.size(intens)
+		if self.tail + n > self.t.shape[0]:
+			# move data to the start of the arrays, make arrays bigger if necessary:
+			m = self.tail - self.head
+			N = max( 16 , 2*(m+n) )
+			for f in ( 't' , 'intens' , 'unit' ):
+				x = getattr(self,f)
+				y = numpy.empty(N,dtype=x.dtype)
+				y[:m] = x[self.head:self.tail]
+				setattr(self,f,y)
+			self.head = 0
+			self.tail = m
+		self.t[self.tail:self.tail+n]      = t
+		self.intens[self.tail:self.tail+n] = intens
+		self.unit[self.tail:self.tail+n]   = unit
+		self.tail = self.tail + n
+
+	def drop(self,n):
+		# remove the n oldest readings:
+		self.head = min(self.head + n,self.tail)
+		if self.head == self.tail:
+			self.head = 0
+			self.tail = 0
+
+
+class peakbuffer:
+	"""
+	ruediPy class for buffering PEAK readings (time, m/z value, intensity, detector, unit) in a fixed-size ring buffer. Adding a reading does not copy the data already in the buffer. Once the buffer is full, the oldest readings are overwritten. Detector and unit strings are stored as small integer codes.
+
+	The readings of each (mz,detector) series are also indexed separately, so that the data of a given series (and time window) can be retrieved without searching the whole buffer (see peakbuffer.series()).
+
+	The readings of each (mz,detector) series are also added to a long-term history with rollups (see peakbuffer.history() and historybuffer class), which is kept if the buffer is cleared. The number of series with a history is limited (max_history), and readings added in bulk from scans are not added to the history (see peakbuffer.add()).
+	"""
+
+
+	# data type of the buffer entries:
+	_dtype = numpy.dtype( [ ('t','f8') , ('mz','f8') , ('intens','f8') , ('det','u1') , ('unit','u1') ] )
+
+	# size of the history of each series (number of raw readings, and rollup levels: 10 s for 6 hours, 1 min for 1 day, 1 h for 90 days). The ring buffers grow on demand, a series with full history takes about 0.5 MB (i.e. up to about 30 MB with max_history = 64):
+	history_raw_len = 600
+	history_levels = ( ( 10 , 2160 ) , ( 60 , 1440 ) , ( 3600 , 2160 ) )
+
+
+	########################################################################################################
+
+
+	def __init__( self , max_len = 500 , history = True , max_history = 64 ):
+		'''
+		peakbuffer.__init__( max_len = 500 , history = True , max_history = 64 )
+
+		Initialize PEAKBUFFER object.
+
+		INPUT:
+		max_len (optional): max. number of readings in the buffer. Once this limit is reached, the oldest readings will be removed from the buffer. Default: max_len = 500
+		history (optional): flag to indicate if the readings are also added to a long-term history of each (mz,detector) series (see peakbuffer.history()). Default: history = True
+		max_history (optional): max. number of (mz,detector) series with a long-term history (readings of further series are not added to the history). Default: max_history = 64
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._data = numpy.zeros( max(int(max_len),1) , dtype=self._dtype )
+		self._i = 0 # index of the next entry to be written
+		self._n = 0 # number of readings in the buffer
+		self._lastupdate_timestamp = -1
+
+		# detector and unit strings (codes used in the buffer are the index to these lists):
+		self._det_names  = []
+		self._unit_names = []
+
+		# index of (mz,detector) series: key = (mz,detector code), value = _series object
+		self._series = {}
+
+		# long-term history of (mz,detector) series: key = (mz,detector code), value = historybuffer object (None if history is disabled)
+		self._history = {} if history else None
+		self._max_history = max_history
+		self._history_warned = False
+
+
+	########################################################################################################
+
+
+	def __len__(self):
+		return self._n
+
+
+	########################################################################################################
+
+
+	def max_len(self):
+		'''
+		N = peakbuffer.max_len()
+
+		Return the max. number of readings in the buffer.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		N: max. number of readings (integer)
+		'''
+
+		return self._data.shape[0]
+
+
+	########################################################################################################
+
+
+	def _code(self,names,x):
+		# return code for string x (add x to the names list if it is not there yet):
+		try:
+			return names.index(x)
+		except ValueError:
+			if len(names) > 255:
+				raise ValueError('too many different detector or unit values in peakbuffer')
+			names.append(x)
+			return len(names)-1
+
+
+	########################################################################################################
+
+
+	def add(self,t,mz,intens,det,unit,history=True):
+		'''
+		peakbuffer.add(t,mz,intens,det,unit,history=True)
+
+		Add reading(s) to the buffer. Several readings can be added in one go by using arrays for mz and intens (t, det and unit may then be single values applying to all readings, or arrays / lists of the same length as mz).
+
+		INPUT:
+		t: epoch time
+		mz: mz value(s)
+		intens: intensity value(s)
+		det: detector (char/string)
+		unit: unit of intensity value (char/string)
+		history (optional): flag to indicate if the reading(s) are also added to the long-term history of their series (use history = False for readings from scans, which would otherwise create a history for every m/z value of the scan). Default: history = True
+
+		OUTPUT:
+		(none)
+		'''
+
+		d = self._data
+		N = d.shape[0]
+
+		if numpy.ndim(mz) == 0:
+			# single reading:
+			i = self._i
+			if self._n == N:
+				# oldest reading will be overwritten, remove it from its series:
+				self._series[ ( d['mz'][i] , d['det'][i] ) ].drop(1)
+			else:
+				self._n = self._n + 1
+			dc = self._code(self._det_names,det)
+			uc = self._code(self._unit_names,unit)
+			d[i] = ( t , mz , intens , dc , uc )
+			self._i = (i+1) % N
+
+			# add reading to its series:
+			key = ( d['mz'][i] , dc )
+			s = self._series.get(key)
+			if s is None:
+				s = self._series[key] = _series()
+			s.append( d['t'][i] , d['intens'][i] , uc )
+			if history:
+				self._history_add( key , d['t'][i] , d['intens'][i] )
+
+		else:
+			# several readings:
+			n = len(mz)
+			if n > 0:
+				if isinstance(det,str):
+					det = numpy.full(n,self._code(self._det_names,det))
+				else:
+					det = [ self._code(self._det_names,x) for x in det ]
+				if isinstance(unit,str):
+					unit = numpy.full(n,self._code(self._unit_names,unit))
+				else:
+					unit = [ self._code(self._unit_names,x) for x in unit ]
+				x = numpy.empty(n,dtype=self._dtype)
+				x['t']      = t
+				x['mz']     = mz
+				x['intens'] = intens
+				x['det']    = det
+				x['unit']   = unit
+				if n > N: # keep only the most recent readings
+					x = x[-N:]
+					n = N
+				k = ( self._i + numpy.arange(n) ) % N
+
+				# oldest readings that will be overwritten, remove them from their series:
+				if n > N - self._n:
+					ev = d[ k[N-self._n:] ]
+					keys,cnt = numpy.unique( ev[['mz','det']] , return_counts=True )
+					for key,c in zip(keys.tolist(),cnt.tolist()):
+						self._series[key].drop(c)
+
+				d[k] = x
+				self._i = (self._i + n) % N
+				self._n = min(self._n + n,N)
+
+				# add readings to their series:
+				keys,inv = numpy.unique( x[['mz','det']] , return_inverse=True )
+				for j,key in enumerate(keys.tolist()):
+					xx = x[ inv.ravel() == j ]
+					s = self._series.get(key)
+					if s is None:
+						s = self._series[key] = _series()
+					s.append( xx['t'] , xx['intens'] , xx['unit'] )
+					if history:
+						self._history_add( key , xx['t'] , xx['intens'] )
+
+		self._lastupdate_timestamp = misc.now_UNIX()
+
+
+	########################################################################################################
+
+
+	def _history_add(self,key,t,intens):
+		# add reading(s) to the history of the (mz,detector code) series key:
+		if self._history is None:
+			return
+		h = self._history.get(key)
+		if h is None:
+			if len(self._history) >= self._max_history:
+				if not self._history_warned:
+					misc.warnmessage ( '[PEAKBUFFER] Max. number of series with long-term history reached (' + str(self._max_history) + '). Not keeping history of further series...' )
+					self._history_warned = True
+				return
+			h = self._history[key] = historybuffer( raw_len = self.history_raw_len , levels = self.history_levels )
+		h.add(t,intens)
+
+
+	########################################################################################################
+
+
+	def clear(self):
+		'''
+		peakbuffer.clear()
+
+		Remove all readings from the buffer (the long-term history of the series is kept, see peakbuffer.history()).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._i = 0
+		self._n = 0
+		self._series = {}
+		self._lastupdate_timestamp = misc.now_UNIX()
+
+
+	########################################################################################################
+
+
+	def set_length(self,N):
+		'''
+		peakbuffer.set_length(N)
+
+		Set max. number of readings in the buffer (the most recent readings are kept if the buffer is made smaller).
+
+		INPUT:
+		N: max. number of readings
+
+		OUTPUT:
+		(none)
+		'''
+
+		x = self.data()[-int(N):] if N > 0 else self.data()[[]]
+		self._data = numpy.zeros( max(int(N),1) , dtype=self._dtype )
+		n = x.shape[0]
+		self._data[:n] = x
+		self._n = n
+		self._i = n % self._data.shape[0]
+
+		# rebuild index of (mz,detector) series:
+		self._series = {}
+		for r in x.tolist():
+			key = ( r[1] , r[3] )
+			s = self._series.get(key)
+			if s is None:
+				s = self._series[key] = _series()
+			s.append( r[0] , r[2] , r[4] )
+
+
+	########################################################################################################
+
+
+	def get_timestamp(self):
+		'''
+		timestamp = peakbuffer.get_timestamp()
+
+		Get time stamp of last update to the buffer (-1 if the buffer was never updated).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		timestamp: UNIX time of last update
+		'''
+
+		return self._lastupdate_timestamp
+
+
+	########################################################################################################
+
+
+	def data(self):
+		'''
+		x = peakbuffer.data()
+
+		Return the readings in the buffer in chronological order (oldest first). This is a view of the buffer memory as long as the buffer has not wrapped around, and a copy otherwise.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		x: numpy structured array with fields 't', 'mz', 'intens', 'det' (detector code) and 'unit' (unit code), see also peakbuffer.det_names() and peakbuffer.unit_names()
+		'''
+
+		d = self._data
+		if self._n < d.shape[0]:
+			return d[:self._n]
+		return numpy.concatenate( ( d[self._i:] , d[:self._i] ) )
+
+
+	########################################################################################################
+
+
+	def det_names(self):
+		'''
+		x = peakbuffer.det_names()
+
+		Return the detector strings corresponding to the detector codes in the buffer (x[code] is the detector string).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		x: numpy array of strings
+		'''
+
+		return numpy.array(self._det_names,dtype=str)
+
+
+	########################################################################################################
+
+
+	def unit_names(self):
+		'''
+		x = peakbuffer.unit_names()
+
+		Return the unit strings corresponding to the unit codes in the buffer (x[code] is the unit string).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		x: numpy array of strings
+		'''
+
+		return numpy.array(self._unit_names,dtype=str)
+
+
+	########################################################################################################
+
+
+	def get(self):
+		'''
+		t,mz,intens,det,unit = peakbuffer.get()
+
+		Return the readings in the buffer in chronological order (oldest first).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		t: time values (numpy array of floats)
+		mz: m/z values (numpy array of floats)
+		intens: intensities (numpy array of floats)
+		det: detectors (numpy array of strings)
+		unit: units (numpy array of strings)
+		'''
+
+		x = self.data()
+		det  = self.det_names()
+		unit = self.unit_names()
+		if x.shape[0] == 0:
+			return x['t'].copy(),x['mz'].copy(),x['intens'].copy(),numpy.array([],dtype=str),numpy.array([],dtype=str)
+		return x['t'].copy(),x['mz'].copy(),x['intens'].copy(),det[x['det']],unit[x['unit']]
+
+
+	########################################################################################################
+
+
+	def series_keys(self):
+		'''
+		keys = peakbuffer.series_keys()
+
+		Return the (mz,detector) pairs of the data series in the buffer.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		keys: list of (mz,det) tuples, sorted by mz and detector (mz: float, det: string)
+		'''
+
+		return sorted( [ ( k[0] , self._det_names[k[1]] ) for k,s in self._series.items() if len(s) > 0 ] )
+
+
+	########################################################################################################
+
+
+	def _get_series(self,mz,det):
+		# return _series object of given mz / detector (None if there is no such series)
+		try:
+			dc = self._det_names.index(det)
+		except ValueError:
+			return None
+		s = self._series.get( ( float(mz) , dc ) )
+		if s is None or len(s) == 0:
+			return None
+		return s
+
+
+	########################################################################################################
+
+
+	def series(self,mz,det,t_from=None,t_to=None):
+		'''
+		t,intens = peakbuffer.series(mz,det,t_from=None,t_to=None)
+
+		Return the readings of one (mz,detector) series in the buffer, optionally restricted to a time window. The readings of each series are indexed separately, and the time window is found by binary search in the (chronologically ordered) time values, so this does not search the whole buffer.
+
+		INPUT:
+		mz: m/z value
+		det: detector (string)
+		t_from, t_to (optional): start and end of the time window (epoch time). Default: t_from = None, t_to = None (no limit)
+
+		OUTPUT:
+		t: time values (numpy array of floats)
+		intens: intensities (numpy array of floats)
+
+		NOTE: t and intens are views of the buffer memory. Make a copy if the data are needed after adding more readings to the buffer.
+		'''
+
+		s = self._get_series(mz,det)
+		if s is None:
+			return numpy.array([]),numpy.array([])
+
+		t = s.t[s.head:s.tail]
+		y = s.intens[s.head:s.tail]
+		i = 0 if t_from is None else numpy.searchsorted(t,t_from,side='left')
+		j = len(t) if t_to is None else numpy.searchsorted(t,t_to,side='right')
+		return t[i:j],y[i:j]
+
+
+	########################################################################################################
+
+
+	def series_unit(self,mz,det):
+		'''
+		unit = peakbuffer.series_unit(mz,det)
+
+		Return the unit of the oldest reading of an (mz,detector) series in the buffer.
+
+		INPUT:
+		mz: m/z value
+		det: detector (string)
+
+		OUTPUT:
+		unit: unit (string, None if there is no such series in the buffer)
+		'''
+
+		s = self._get_series(mz,det)
+		if s is None:
+			return None
+		return self._unit_names[ s.unit[s.head] ]
+
+
+	########################################################################################################
+
+
+	def history_keys(self):
+		'''
+		keys = peakbuffer.history_keys()
+
+		Return the (mz,detector) pairs with a long-term history (see peakbuffer.history()).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		keys: list of (mz,detector) tuples, sorted by mz
+		'''
+
+		if self._history is None:
+			return []
+		return sorted( [ ( k[0] , self._det_names[k[1]] ) for k in self._history.keys() ] )
+
+
+	########################################################################################################
+
+
+	def history(self,mz,det):
+		'''
+		h = peakbuffer.history(mz,det)
+
+		Return the long-term history of an (mz,detector) series (raw data of the recent readings and rollups of older readings). The history is not affected by peakbuffer.clear() and peakbuffer.set_length().
+
+		INPUT:
+		mz: m/z value
+		det: detector (string)
+
+		OUTPUT:
+		h: historybuffer object (see historybuffer class), or None if there is no history of this series
+		'''
+
+		if self._history is None:
+			return None
+		try:
+			dc = self._det_names.index(det)
+		except ValueError:
+			return None
+		return self._history.get( ( float(mz) , dc ) )
@@ -0,0 +1,421 @@
+# Code for the plotserver class (plotting of data buffers in a separate process)
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import os
+	import time
+	import queue
+	import multiprocessing
+	import numpy
+	from .misc	import misc
+	from .bufferplot	import bufferplot
+except ImportError as e:
+	print (e)
+	raise
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / plotserver class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+# number of buckets for decimation of long data series before sending them to the plot server process (see bufferplot.decimate()):
+_DECIMATE_BUCKETS = 2000
+
+# bufferplot methods that can be called in the plot server process:
+_PANEL_CALLS = ( 'line' , 'set_data' , 'keep_only' , 'legend' , 'set_title' , 'set_xlabel' , 'set_ylabel' , 'set_yscale' , 'set_yformat' , 'set_limits' , 'autoscale' , 'tight_layout' , 'invalidate' )
+
+
+class plotserver:
+	"""
+	ruediPy class for plotting of data buffers in a separate process. The plot server process receives the plot data through a queue and updates the plots at its own pace, so that the data acquisition never waits for matplotlib or the window system. If the plot server can't keep up with the updates, the updates are dropped (only the latest data are plotted).
+
+	Use the same plotserver object for all instruments (the plot server should be started before any other plot windows are set up), e.g.:
+		PS = plotserver()
+		MS = rgams_SRS ( serialport = '/dev/serial/by-id/...' , label = 'MS' , plot_server = PS )
+		P = pressuresensor_WIKA ( serialport = '/dev/serial/by-id/...' , label = 'TOTALPRESSURE' , plot_server = PS )
+
+	NOTE: on systems where new processes can't be forked (e.g. Windows, macOS), the main script is imported again by the plot server process, and the code of the main script must therefore be protected by "if __name__ == '__main__':".
+	"""
+
+
+	########################################################################################################
+
+
+	def __init__( self , max_rate = 5 , queue_size = 8 , label = 'PLOTSERVER' ):
+		'''
+		plotserver.__init__( max_rate = 5 , queue_size = 8 , label = 'PLOTSERVER' )
+
+		Initialize PLOTSERVER object, start plot server process.
+
+		INPUT:
+		max_rate (optional): max. refresh rate of the plots (updates per second). Default: max_rate = 5
+		queue_size (optional): max. number of plot updates waiting in the queue for the plot server process. Further plot updates are dropped until the plot server has caught up. Default: queue_size = 8
+		label (optional): label / name of the PLOTSERVER object (string). Default: label = 'PLOTSERVER'
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._label = label
+		self._num_figures = 0
+		self._dropped = 0
+
+		if sys.platform.startswith('linux'):
+			ctx = multiprocessing.get_context('fork')
+		else:
+			ctx = multiprocessing.get_context('spawn')
+
+		self._queue = ctx.Queue(queue_size)
+		self._proc = ctx.Process( target = _plotserver_main , args = ( self._queue , max_rate , os.getpid() ) , name = label )
+		self._proc.daemon = True
+		self._proc.start()
+
+
+	########################################################################################################
+
+
+	def label(self):
+		'''
+		label = plotserver.label()
+
+		Return label / name of the PLOTSERVER object
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		label: label / name (string)
+		'''
+
+		return self._label
+
+
+	########################################################################################################
+
+
+	def warning(self,msg):
+		'''
+		plotserver.warning(msg)
+
+		Issue warning about issues related to the plot server.
+
+		INPUT:
+		msg: warning message (string)
+
+		OUTPUT:
+		(none)
+		'''
+
+		misc.warnmessage ('[' + self.label() + '] ' + msg)
+
+
+	########################################################################################################
+
+
+	def figure( self , title , num_panels = 1 , fig_w = 6.5 , fig_h = 5 ):
+		'''
+		panels = plotserver.figure( title , num_panels = 1 , fig_w = 6.5 , fig_h = 5 )
+
+		Set up a new figure window in the plot server process.
+
+		INPUT:
+		title: window title (string)
+		num_panels (optional): number of plot panels in the figure (panels are arranged on top of each other). Default: num_panels = 1
+		fig_w, fig_h (optional): width and height of figure window (inches)
+
+		OUTPUT:
+		panels: list of plot panels. The panels provide the same methods as bufferplot objects for setting up and updating the plots (see bufferplot class), but the plotting is done by the plot server process.
+		'''
+
+		fid = self._num_figures
+		self._num_figures = self._num_figures + 1
+
+		try:
+			self._queue.put( ( 'figure' , fid , title , num_panels , fig_w , fig_h ) , timeout = 5 )
+		except queue.Full:
+			self.warning( 'Could not set up figure ' + title + ' (plot server is not responding).' )
+
+		return [ _plotserver_panel( self , fid , k ) for k in range(num_panels) ]
+
+
+	########################################################################################################
+
+
+	def _send(self,msg,wait=False):
+		# send message to the plot server process, return False if the message was dropped
+
+		try:
+			if wait:
+				self._queue.put( msg , timeout = 1 )
+			else:
+				self._queue.put_nowait( msg )
+		except queue.Full:
+			self._dropped = self._dropped + 1
+			return False
+
+		return True
+
+
+	########################################################################################################
+
+
+	def dropped(self):
+		'''
+		n = plotserver.dropped()
+
+		Return the number of plot updates that were dropped because the plot server could not keep up.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		n: number of dropped updates (integer)
+		'''
+
+		return self._dropped
+
+
+	########################################################################################################
+
+
+	def is_running(self):
+		'''
+		x = plotserver.is_running()
+
+		Check if the plot server process is running.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		x: flag (bool)
+		'''
+
+		return self._proc.is_alive()
+
+
+	########################################################################################################
+
+
+	def close(self):
+		'''
+		plotserver.close()
+
+		Stop the plot server process (this also closes the plot windows).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if self._proc.is_alive():
+			try:
+				self._queue.put( None , timeout = 1 )
+			except queue.Full:
+				pass
+			self._proc.join(timeout = 5)
+			if self._proc.is_alive():
+				self._proc.terminate()
+
+
+########################################################################################################
+
+
+class _plotserver_panel:
+	# Plot panel in the plot server process. The method calls are collected and sent to the plot server process with the next plot update (bufferplot.draw()). If an update is dropped, the calls are kept and sent with the next update (calls that are replaced by later calls are removed).
+
+	def __init__(self,server,fid,panel):
+		self._server = server
+		self._id = ( fid , panel )
+		self._calls = {}
+		self._keys = []
+		self._created = set() # lines that exist in the plot server process
+		self._fmt = {} # format / line properties of the lines that have not been created yet
+		self._decimated = {} # decimation of the data series
+		self._pending = False
+
+	def _call(self,slot,name,*args,**kwargs):
+		self._calls.pop(slot,None) # remove previous call (and move the slot to the end)
+		self._calls[slot] = ( name , args , kwargs )
+
+	def _add_key(self,key,args,kwargs):
+		# register line, return format / line properties for creating the line (keep those of previous calls if the line has not been created yet)
+		if key not in self._keys:
+			self._keys.append(key)
+		if key in self._created:
+			return args,kwargs
+		a,kw = self._fmt.get(key,((),{}))
+		if args:
+			a = args
+		kw = dict(kw,**kwargs)
+		self._fmt[key] = (a,kw)
+		return a,kw
+
+	def line(self,key,*args,**kwargs):
+		args,kwargs = self._add_key(key,args,kwargs)
+		if ('set_data',key) in self._calls:
+			name,a,kw = self._calls[('set_data',key)]
+			self._calls[('set_data',key)] = ( name , a[:4] + args , kwargs )
+		else:
+			self._call( ('line',key) , 'line' , key , *args , **kwargs )
+
+	def set_data(self,key,x,y,label=None,*args,stamp=None,**kwargs):
+		# decimate long data series before sending them to the plot server (see bufferplot.decimate()):
+		if len(x) > 4*_DECIMATE_BUCKETS:
+			d = self._decimated.get(key)
+			if ( stamp is None ) or ( d is None ) or not ( d[0] == stamp and d[1] == len(x) ):
+				d = ( stamp , len(x) , bufferplot.decimate(x,y,_DECIMATE_BUCKETS) )
+				self._decimated[key] = d
+			if d[2] is not None:
+				x = numpy.asarray(x)[d[2]]
+				y = numpy.asarray(y)[d[2]]
+		# copy the data, the queue may pickle them later:
+		x = numpy.array(x,dtype=float)
+		y = numpy.array(y,dtype=float)
+		args,kwargs = self._add_key(key,args,kwargs)
+		self._calls.pop( ('line',key) , None )
+		self._call( ('set_data',key) , 'set_data' , key , x , y , label , *args , stamp = stamp , **kwargs )
+
+	def keys(self):
+		return list(self._keys)
+
+	def keep_only(self,keys):
+		keys = list(keys)
+		self._keys = [ k for k in self._keys if k in keys ]
+		self._created = set( k for k in self._created if k in keys )
+		self._fmt = { k:f for k,f in self._fmt.items() if k in keys }
+		self._decimated = { k:d for k,d in self._decimated.items() if k in keys }
+		for slot in [ s for s in self._calls if s[0] in ('line','set_data') and s[1] not in keys ]:
+			del self._calls[slot]
+		self._call( ('keep_only',) , 'keep_only' , keys )
+
+	def legend(self,**kwargs):
+		self._call( ('legend',) , 'legend' , **kwargs )
+
+	def set_title(self,s):
+		self._call( ('set_title',) , 'set_title' , s )
+
+	def set_xlabel(self,s):
+		self._call( ('set_xlabel',) , 'set_xlabel' , s )
+
+	def set_ylabel(self,s):
+		self._call( ('set_ylabel',) , 'set_ylabel' , s )
+
+	def set_yscale(self,scale):
+		self._call( ('set_yscale',) , 'set_yscale' , scale )
+
+	def set_yformat(self,fmt):
+		self._call( ('set_yformat',) , 'set_yformat' , fmt )
+
+	def set_limits(self,xlim=None,ylim=None,hysteresis=0.0):
+		self._call( ('set_limits',xlim is None,ylim is None) , 'set_limits' , xlim , ylim , hysteresis )
+
+	def autoscale(self,margin=0.05,hysteresis=0.0):
+		self._call( ('autoscale',) , 'autoscale' , margin , hysteresis )
+
+	def tight_layout(self,**kwargs):
+		self._call( ('tight_layout',) , 'tight_layout' , **kwargs )
+
+	def invalidate(self):
+		self._call( ('invalidate',) , 'invalidate' )
+
+	def draw(self,force=False):
+		# send the collected calls to the plot server process (force: wait for the plot server if the queue is full)
+		if self._calls:
+			self._pending = not self._server._send( ( 'frame' , ) + self._id + ( list(self._calls.values()) , ) , wait = force )
+			if not self._pending:
+				for slot in self._calls:
+					if slot[0] in ('line','set_data'):
+						self._created.add(slot[1])
+						self._fmt.pop(slot[1],None)
+				self._calls = {}
+		return not self._pending
+
+	def pending(self):
+		return self._pending
+
+
+########################################################################################################
+
+
+def _plotserver_main(q,max_rate,parent_pid):
+	# main loop of the plot server process
+
+	if not misc.plotting_setup():
+		misc.warnmessage ('[PLOTSERVER] No display system available, plot server is not running.')
+		return
+
+	import matplotlib.pyplot as plt
+
+	plt.ion()
+	figs = {}
+	dt = 1.0/max_rate if max_rate else 0.0
+
+	while True:
+
+		try:
+			msg = q.get(timeout = 0.05)
+		except queue.Empty:
+			if not os.getppid() == parent_pid:
+				break # parent process is gone
+			for fig,panels in figs.values():
+				fig.canvas.flush_events()
+			continue
+
+		# process all messages in the queue, then update the plots:
+		t0 = time.monotonic()
+		dirty = set()
+		while msg is not None:
+			try:
+				if msg[0] == 'figure':
+					fid,title,num_panels,fig_w,fig_h = msg[1:]
+					fig = plt.figure(figsize=(fig_w,fig_h))
+					fig.canvas.manager.set_window_title(title)
+					panels = [ bufferplot( plt.subplot(num_panels,1,k+1) , max_rate = 0 ) for k in range(num_panels) ]
+					fig.show()
+					figs[fid] = ( fig , panels )
+
+				elif msg[0] == 'frame':
+					fid,k,calls = msg[1:]
+					p = figs[fid][1][k]
+					for name,args,kwargs in calls:
+						if name in _PANEL_CALLS:
+							getattr(p,name)(*args,**kwargs)
+					dirty.add( (fid,k) )
+
+			except:
+				misc.warnmessage ('[PLOTSERVER] Error during plotting (' + str(sys.exc_info()[0]) + ').')
+
+			try:
+				msg = q.get_nowait()
+			except queue.Empty:
+				break
+
+		for fid,k in dirty:
+			try:
+				figs[fid][1][k].draw(force=True)
+			except:
+				misc.warnmessage ('[PLOTSERVER] Error during plotting (' + str(sys.exc_info()[0]) + ').')
+
+		if msg is None:
+			break # plot server was closed
+
+		# keep the windows responsive until the next update is due:
+		while time.monotonic() - t0 < dt:
+			for fig,panels in figs.values():
+				fig.canvas.flush_events()
+			time.sleep(0.01)
+
+	plt.close('all')
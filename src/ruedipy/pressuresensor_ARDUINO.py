@@ -15,7 +15,6 @@ try:
 	import serial
 	import time
 	import struct
-	import numpy
 	import os
 except ImportError as e:
 	print (e)
@@ -26,6 +25,9 @@ if ( sys.version_info[0] < 3 ):
 	warnings.warn("ruediPy / pressuresensor_ARDUINO class is running on Python version < 3. Version 3.0 or newer is recommended!")
 
 from .misc	import misc
+from .bufferplot	import bufferplot
+from .sensorbuffer	import sensorbuffer
+from .serial_lock	import serial_lock
 
 
 class pressuresensor_ARDUINO:
@@ -37,9 +39,9 @@ class pressuresensor_ARDUINO:
 	########################################################################################################
 	
 	
-	def __init__( self , serialport , baudrate = 115200, label = 'PRESSURESENSOR' , plot_title = None , max_buffer_points = 500 , fig_w = 6.5 , fig_h = 5 , has_plot_window = True , has_external_plot_window = None, P_unit = 'bar'):
+	def __init__( self , serialport , baudrate = 115200, label = 'PRESSURESENSOR' , plot_title = None , max_buffer_points = 500 , fig_w = 6.5 , fig_h = 5 , has_plot_window = True , has_external_plot_window = None, P_unit = 'bar' , plot_server = None ):
 		'''
-		pressuresensor_ARDUINO.__init__( serialport , label = 'PRESSURESENSOR' , plot_title = None , max_buffer_points = 500 , fig_w = 6.5 , fig_h = 5 , has_plot_window = True , has_external_plot_window = None, P_unit = 'bar' )
+		pressuresensor_ARDUINO.__init__( serialport , label = 'PRESSURESENSOR' , plot_title = None , max_buffer_points = 500 , fig_w = 6.5 , fig_h = 5 , has_plot_window = True , has_external_plot_window = None, P_unit = 'bar' , plot_server = None )
 		
 		Initialize PRESSURESENSOR object (ARDUINO), configure serial port connection
 		
@@ -51,6 +53,7 @@ class pressuresensor_ARDUINO:
 		max_buffer_points (optional): max. number of data points in the PEAKS buffer. Once this limit is reached, old data points will be removed from the buffer. Default value: max_buffer_points = 500
 		fig_w, fig_h (optional): width and height of figure window used to plot data (inches)
 		has_external_plot_window (optional): flag to indicate if there is a GUI system that handles the plotting of the data buffer on its own. This flag can be set explicitly to True of False, or can use None to ask for automatic 'on the fly' check if the has_external_plot_window = True or False should be used. Default: has_external_plot_window = None
+		plot_server (optional): plotserver object used to plot the data buffer in a separate process (see plotserver class). Default: plot_server = None (plot in the current process)
 		P_unit: unit of P data (default: P_unit = 'bar')
 		
 		OUTPUT:
@@ -81,14 +84,14 @@ class pressuresensor_ARDUINO:
 			self._plot_title = plot_title
 
 		# data buffer for PEAK values:
-		self._pressbuffer_t = numpy.array([])
-		self._pressbuffer_p = numpy.array([])
-		self._pressbuffer_unit = ['x'] * 0 # empty list
-		self._pressbuffer_max_len = max_buffer_points
-		self._pressbuffer_lastupdate_timestamp = -1
+		self._pressbuffer = sensorbuffer(max_buffer_points)
 		
 		# set up plotting environment
-		if has_external_plot_window:
+		if plot_server is not None:
+			# plotting is done by the plot server process
+			self._has_external_display = False
+			self._has_display = True
+		elif has_external_plot_window:
 			# no need to set up plotting
 			self._has_external_display = True
 			self._has_display = False
@@ -129,37 +132,56 @@ class pressuresensor_ARDUINO:
 			ser.flushInput()    # make sure input is empty
 			
 			self.ser = ser
-			self._ser_locked = False
+			# lock for exclusive access to the serial port (lock the device node against other processes as well if the port could not be opened in exclusive mode):
+			if parse_version(serial.__version__) >= parse_version('3.3') :
+				self._ser_lock = serial_lock(label)
+			else:
+				self._ser_lock = serial_lock(label,device=serialport)
 			
 			if self._has_display: # prepare plotting environment and figure
 
-				import matplotlib.pyplot as plt
-				# set up plot figure:
-				self._fig = plt.figure(figsize=(fig_w,fig_h))
 				t = 'ARDUINO_PSENS'
 				if self._plot_title:
 					t = t + ' (' + self._plot_title + ')'
-				self._fig.canvas.manager.set_window_title(t)
 
-                # set up panel for pressure history plot:
-				self._pressbuffer_ax = plt.subplot(1,1,1)
+				if plot_server is not None:
+					# set up figure in the plot server process (the plot server takes care of showing the window):
+					self._pressbuffer_plot = plot_server.figure( t , 1 , fig_w , fig_h )[0]
+					self._figwindow_is_shown = True
+
+				else:
+					import matplotlib.pyplot as plt
+
+					# set up plot figure:
+					self._fig = plt.figure(figsize=(fig_w,fig_h))
+					self._fig.canvas.manager.set_window_title(t)
+
+					# set up panel for fast plot updates:
+					self._pressbuffer_ax = plt.subplot(1,1,1)
+					self._pressbuffer_plot = bufferplot(self._pressbuffer_ax)
+
+					# enable interactive mode:
+					plt.ion()
+
+					self._figwindow_is_shown = False
+
+				# set up panel for pressure history plot:
 				t = 'PRESSBUFFER'
 				if self._plot_title:
 					t = t + ' (' + self._plot_title + ')'
-				self._pressbuffer_ax.set_title(t,loc="center")
-				self._pressbuffer_ax.set_xlabel('Time (s)')
-				self._pressbuffer_ax.set_ylabel('Pressure')
+				self._pressbuffer_plot.set_title(t)
+				self._pressbuffer_plot.set_xlabel('Time (s)')
+				self._pressbuffer_plot.set_ylabel('Pressure')
 
 				# add (empty) line to plot (will be updated with data later):
-				self._pressbuffer_ax.plot( [], [] , 'ko-' , markersize = 10 )
+				self._pressbuffer_plot.line( 'P' , 'ko-' , markersize = 10 )
 
 				# get some space in between panels to avoid overlapping labels / titles
-				self._fig.tight_layout()
-			
-				# enable interactive mode:
-				plt.ion()
+				self._pressbuffer_plot.tight_layout()
 
-				self._figwindow_is_shown = False
+				if plot_server is not None:
+					# send the plot setup to the plot server process:
+					self._pressbuffer_plot.draw(force=True)
 
 			print ('Successfully configured ARDUINO pressure sensor on ' + serialport )
 
@@ -186,12 +208,8 @@ class pressuresensor_ARDUINO:
 		(none)
 		'''
 
-		# wait until the serial port is unlocked:
-		while self._ser_locked == True:
-			time.sleep(0.01)
-			
-		# lock the port:
-		self._ser_locked = True
+		# wait until the serial port is unlocked, then lock the port:
+		self._ser_lock.acquire()
 		
 
 	
@@ -213,7 +231,26 @@ class pressuresensor_ARDUINO:
 		'''
 
 		# release the lock:
-		self._ser_locked = False
+		self._ser_lock.release()
+
+
+	########################################################################################################
+
+
+	def get_serial_lock_stats(self):
+		'''
+		s = pressuresensor_ARDUINO.get_serial_lock_stats()
+
+		Return contention statistics of the serial port lock (useful to find out if other threads are blocking the port for too long).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		s: lock statistics (dictionary, see serial_lock.stats())
+		'''
+
+		return self._ser_lock.stats()
 
 
 
@@ -380,18 +417,7 @@ class pressuresensor_ARDUINO:
 		(none)
 		"""
 				
-		self._pressbuffer_t = numpy.append( self._pressbuffer_t , t )
-		self._pressbuffer_p = numpy.append( self._pressbuffer_p , p )
-		self._pressbuffer_unit.append( unit )
-
-		N = self._pressbuffer_max_len
-		
-		if self._pressbuffer_t.shape[0] > N:
-			self._pressbuffer_t    = self._pressbuffer_t[-N:]
-			self._pressbuffer_p    = self._pressbuffer_p[-N:]
-			self._pressbuffer_unit = self._pressbuffer_unit[-N:]
-
-		self._pressbuffer_lastupdate_timestamp = misc.now_UNIX()
+		self._pressbuffer.add( t , p , unit )
 
 
 	########################################################################################################
@@ -410,21 +436,63 @@ class pressuresensor_ARDUINO:
 		timestamp: UNIX time of last update
 		"""
 
-		return self._pressbuffer_lastupdate_timestamp
+		return self._pressbuffer.get_timestamp()
 
 
 	########################################################################################################
 
 
-	def plot_pressbuffer(self):
+	def get_pressbuffer(self):
+		"""
+		buf = pressuresensor_ARDUINO.get_pressbuffer()
+
+		Return pressure data buffer (for use with external modules, e.g. to get statistics of the recent readings).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		buf: sensorbuffer object (see sensorbuffer class)
+		"""
+
+		return self._pressbuffer
+
+
+	########################################################################################################
+
+
+	def pressbuffer_history(self,window,max_points=None):
+		"""
+		dt,t,mean,min,max,count = pressuresensor_ARDUINO.pressbuffer_history(window,max_points=None)
+
+		Return the long-term history of pressure readings within a time window that ends with the most recent reading. The data are returned at the finest resolution that covers the window: raw data for short windows, otherwise rollups of e.g. 10 s, 1 min or 1 h bins (see historybuffer class). The history is kept if the pressure data buffer is cleared.
+
+		INPUT:
+		window: length of the time window (seconds)
+		max_points (optional): max. number of data points (a coarser resolution is used if necessary). Default: max_points = None (no limit)
+
+		OUTPUT:
+		dt: bin width of the rollups (seconds), or 0 for raw data
+		t: epoch times (raw data) or start times of the bins (numpy array of floats)
+		mean, min, max: mean, min. and max. of pressure values in each bin (numpy arrays of floats)
+		count: number of readings in each bin (numpy array)
+		"""
+
+		return self._pressbuffer.history().get(window,max_points)
+
+
+	########################################################################################################
+
+
+	def plot_pressbuffer(self,window=None):
 		'''
-		pressuresensor_ARDUINO.plot_pressbuffer()
+		pressuresensor_ARDUINO.plot_pressbuffer(window=None)
 
 		Plot trend (or update plot) of values in pressure data buffer (e.g. after adding data)
 		NOTE: plotting may be slow, and it may therefore be a good idea to keep the update interval low to avoid affecting the duty cycle.
 
 		INPUT:
-		(none)
+		window (optional): length of the time window to be plotted (seconds). If a window is given, the long-term history of the pressure readings is plotted at the resolution that fits the window (mean values of the rollup bins for long windows, see pressuresensor_ARDUINO.pressbuffer_history()). Default: window = None (plot the data in the pressure data buffer)
 
 		OUTPUT:
 		(none)
@@ -444,25 +512,28 @@ class pressuresensor_ARDUINO:
 
 				# Set plot data:
 				t0 = misc.now_UNIX()
-				self._pressbuffer_ax.lines[0].set_data( self._pressbuffer_t - t0 , self._pressbuffer_p )
+				if window is None:
+					t,p = self._pressbuffer.data()
+				else:
+					dt,t,p = self.pressbuffer_history(window,max_points=2000)[0:3]
+					t = t + dt/2.0 # plot rollup means at the center of the bins
+				self._pressbuffer_plot.set_data( 'P' , t - t0 , p , stamp = ( self._pressbuffer.get_timestamp() , window ) )
 
 				# Scale axes:
-				self._pressbuffer_ax.relim()
-				self._pressbuffer_ax.autoscale_view()
+				self._pressbuffer_plot.autoscale( hysteresis = 0.1 )
 
 				# set title and axis labels:
 				t0 = time.strftime("%b %d %Y %H:%M:%S", time.localtime(t0))
 				t = 'PRESSBUFFER'
 				if self._plot_title:
 					t = t + ' (' + self._plot_title + ')'
-				self._pressbuffer_ax.set_title(t + ' at ' + t0)
+				self._pressbuffer_plot.set_title(t + ' at ' + t0)
 
 				# Get pressure units right:
-				self._pressbuffer_ax.set_ylabel('Pressure (' + str(self._pressbuffer_unit[0]) + ')' )
+				self._pressbuffer_plot.set_ylabel('Pressure (' + self._pressbuffer.unit() + ')' )
 
 				# Update the plot:
-				# self._fig.canvas.draw()
-				self._fig.canvas.flush_events()
+				self._pressbuffer_plot.draw()
 
 			except:
 				self.warning( 'Error during plotting of pressbuffer trend (' + str(sys.exc_info()[0]) + ').' )
@@ -488,10 +559,7 @@ class pressuresensor_ARDUINO:
 		if not(hasattr(self,'ser')):
 			self.warning( 'sensor is not initialised, could not clear data buffer.' )
 		else:
-			self._pressbuffer_t = self._pressbuffer_t[[]]
-			self._pressbuffer_p = self._pressbuffer_p[[]]
-			self._pressbuffer_unit = ['x'] * 0 # empty list
-			self._pressbuffer_lastupdate_timestamp = misc.now_UNIX()
+			self._pressbuffer.clear()
 
 
 	########################################################################################################
@@ -18,8 +18,12 @@ try:
 	import math
 	import numpy
 	import os
+	import threading
 	from scipy.interpolate import interp1d
 	from .misc	import misc
+	from .serial_lock	import serial_lock
+	from .peakbuffer	import peakbuffer
+	from .bufferplot	import bufferplot
 except ImportError as e:
 	print (e)
 	raise
@@ -28,6 +32,9 @@ except ImportError as e:
 if ( sys.version_info[0] < 3 ):
 	warnings.warn("ruediPy / rgams_SRS class is running on Python version < 3. Version 3.0 or newer is recommended!")
 
+# 4-byte little-endian integer values returned by the RGA (MR, SC commands):
+_INT32 = struct.Struct('<i')
+
 
 
 
@@ -44,10 +51,10 @@ class rgams_SRS:
 	########################################################################################################
 
 
-	def __init__( self , serialport , label='MS' , cem_hv = 1400 , tune_default_RI = [] , tune_default_RS = [] , max_buffer_points = 500 , fig_w = 10 , fig_h = 8 , peakbuffer_plot_min=0.5 , peakbuffer_plot_max = 2 , peakbuffer_plot_yscale = 'linear' , scan_plot_yscale = 'linear' , has_plot_window = True , has_external_plot_window = None):
+	def __init__( self , serialport , label='MS' , cem_hv = 1400 , tune_default_RI = [] , tune_default_RS = [] , max_buffer_points = 500 , fig_w = 10 , fig_h = 8 , peakbuffer_plot_min=0.5 , peakbuffer_plot_max = 2 , peakbuffer_plot_yscale = 'linear' , scan_plot_yscale = 'linear' , has_plot_window = True , has_external_plot_window = None , state_cache_ttl = 10 , conservative_timing = False , plot_server = None ):
 
 		'''
-		rgams_SRS.__init__( serialport , label='MS' , cem_hv = 1400 , tune_default_RI = [] , tune_default_RS = [] , max_buffer_points = 500 , fig_w = 10 , fig_h = 8 , peakbuffer_plot_min=0.5 , peakbuffer_plot_max = 2 , peakbuffer_plot_yscale = 'linear' , scan_plot_yscale = 'linear' , has_plot_window = True , has_external_plot_window = None)
+		rgams_SRS.__init__( serialport , label='MS' , cem_hv = 1400 , tune_default_RI = [] , tune_default_RS = [] , max_buffer_points = 500 , fig_w = 10 , fig_h = 8 , peakbuffer_plot_min=0.5 , peakbuffer_plot_max = 2 , peakbuffer_plot_yscale = 'linear' , scan_plot_yscale = 'linear' , has_plot_window = True , has_external_plot_window = None , state_cache_ttl = 10 , conservative_timing = False , plot_server = None )
 		
 		Initialize mass spectrometer (SRS RGA), configure serial port connection.
 		
@@ -64,6 +71,9 @@ class rgams_SRS:
 		scan_plot_yscale (optional) = y-axis scaling for scan plot (default: 'linear', use 'log' for log scaling)
 		has_plot_window (optional): flag to choose if a plot window should be opened for the rgams_SRS object (default: has_plot_window = True)
 		has_external_plot_window (optional): flag to indicate if there is a GUI system that handles the plotting of the data buffer on its own. This flag can be set explicitly to True of False, or can use None to ask for automatic 'on the fly' check if the has_external_plot_window = True or False should be used. Default: has_external_plot_window = None
+		state_cache_ttl (optional): max. age (seconds) of RGA parameter values (HV, NF, EE, MI, MF, SA, RI, RS, DI, DS; the emission current FL is always read from the RGA head) kept in memory before they are read again from the RGA head (see rgams_SRS.state_cache_clear()). Use state_cache_ttl = 0 to always read the values from the RGA head, or state_cache_ttl = None to never expire the cached values. Default: state_cache_ttl = 10
+		conservative_timing (optional): flag to choose if the serial communication in PEAK and ZERO readings uses the conservative timing of earlier ruediPy versions (wait 20 ms after each reading to make sure the serial buffers are up to date). Default: conservative_timing = False (no waiting; the next MR command is sent as soon as the previous reading has arrived)
+		plot_server (optional): plotserver object used to plot the data buffers in a separate process (see plotserver class). Default: plot_server = None (plot in the current process)
 
 		OUTPUT:
 		(none)
@@ -110,7 +120,21 @@ class rgams_SRS:
 			ser.flushInput()	# make sure input is empty
 		
 			self.ser = ser
-			self._ser_locked = False
+
+			# cache of RGA parameter values (write-through, see rgams_SRS._state_get() and rgams_SRS._state_set()):
+			self._state = {}
+			self._state_ttl = state_cache_ttl
+
+			# MR commands (bytes, by m/z value) and read buffer for PEAK and ZERO readings (see rgams_SRS._read_MR()):
+			self._MR_cmd = {}
+			self._MR_buf = bytearray(4)
+			self._conservative_timing = conservative_timing
+
+			# lock for exclusive access to the serial port (lock the device node against other processes as well if the port could not be opened in exclusive mode):
+			if parse_version(serial.__version__) >= parse_version('3.3') :
+				self._ser_lock = serial_lock(label)
+			else:
+				self._ser_lock = serial_lock(label,device=serialport)
 			
 			# get ID / serial number of SRS RGA:
 			sn = self.param_IO('ID?',1)
@@ -125,13 +149,7 @@ class rgams_SRS:
 			self._tune_default_RS = tune_default_RS
 
 			# data buffer for PEAK values:
-			self._peakbuffer_t = numpy.array([])
-			self._peakbuffer_mz = numpy.array([])
-			self._peakbuffer_intens = numpy.array([])
-			self._peakbuffer_det = ['x'] * 0 # empty list
-			self._peakbuffer_unit = ['x'] * 0 # empty list
-			self._peakbuffer_max_len = max_buffer_points
-			self._peakbuffer_lastupdate_timestamp = -1
+			self._peakbuffer = peakbuffer(max_buffer_points)
 
 			# y-axis range:
 			self._peakbuffer_plot_min_y = peakbuffer_plot_min
@@ -147,7 +165,11 @@ class rgams_SRS:
 			self._peakbufferplot_colors = [ (2,'darkgray') , (4,'c') , (13,'darkgray') , (14,'dimgray') , (15,'green') , (16,'lightcoral') , (28,'k') , (32,'r') , (40,'y') , (44,'b') , (84,'m') ] # default colors for the more common mz values
 
 			# set up plotting environment
-			if has_external_plot_window:
+			if plot_server is not None:
+				# plotting is done by the plot server process
+				self._has_external_display = False
+				self._has_display = True
+			elif has_external_plot_window:
 				# no need to set up plotting
 				self._has_external_display = True
 				self._has_display = False
@@ -158,36 +180,50 @@ class rgams_SRS:
 			if self._has_display:
 				# set up plotting environment
 				
-				import matplotlib.pyplot as plt
-
-				self._fig = plt.figure(figsize=(fig_w,fig_h))
 				t = 'SRS RGA'
 				if self._label:
 					t = t + ' (' + self._label + ')'
-				self._fig.canvas.set_window_title(t)
 
-				# set up upper panel for peak history plot:
-				self._peakbuffer_ax = plt.subplot(2,1,1)
-				self._peakbuffer_ax.set_title('PEAKBUFFER (' + self.label() + ')',loc="center")
-				plt.xlabel('Time')
-				plt.ylabel('Intensity')
+				if plot_server is not None:
+					# set up figure in the plot server process (the plot server takes care of showing the window):
+					self._peakbuffer_plot , self._scan_plot = plot_server.figure( t , 2 , fig_w , fig_h )
+					self._figwindow_is_shown = True
+
+				else:
+					import matplotlib.pyplot as plt
 
-				# add (empty) line to plot (will be updated with data later):
-				self._peakbuffer_ax.plot( [], [] )
+					self._fig = plt.figure(figsize=(fig_w,fig_h))
+					self._fig.canvas.set_window_title(t)
+
+					# set up panels for fast plot updates (lines will be added with data later):
+					self._peakbuffer_ax = plt.subplot(2,1,1)
+					self._peakbuffer_plot = bufferplot(self._peakbuffer_ax)
+					self._scan_ax = plt.subplot(2,1,2)
+					self._scan_plot = bufferplot(self._scan_ax)
+
+					self._figwindow_is_shown = False
+					plt.ion()		
+
+				# set up upper panel for peak history plot:
+				self._peakbuffer_plot.set_title('PEAKBUFFER (' + self.label() + ')')
+				self._peakbuffer_plot.set_xlabel('Time')
+				self._peakbuffer_plot.set_ylabel('Intensity')
+				self._peakbuffer_plot.legend( loc='best' , prop={'size':9} )
 				self.set_peakbuffer_scale(self._peakbufferplot_yscale)
 
 				# set up lower panel for scans:
-				self._scan_ax = plt.subplot(2,1,2)
-				self._scan_ax.set_title('SCAN (' + self.label() + ')',loc="center")
-				plt.xlabel('mz')
-				plt.ylabel('Intensity')
+				self._scan_plot.set_title('SCAN (' + self.label() + ')')
+				self._scan_plot.set_xlabel('mz')
+				self._scan_plot.set_ylabel('Intensity')
 				self.set_scan_scale(self._scan_yscale)
 				
 				# get some space in between panels to avoid overlapping labels / titles
-				self._fig.tight_layout(pad=4.0)
+				self._scan_plot.tight_layout(pad=4.0)
 
-				self._figwindow_is_shown = False
-				plt.ion()		
+				if plot_server is not None:
+					# send the plot setup to the plot server process:
+					self._peakbuffer_plot.draw(force=True)
+					self._scan_plot.draw(force=True)
 			
 			print( 'Successfully configured SRS RGA MS with serial number ' + self.get_serial_number() + ' on ' + serialport )
 
@@ -296,15 +332,15 @@ class rgams_SRS:
 		(none)
 		
 		OUTPUT:
-		x: peakbuffer data, struct with the following fields:
+		x: peakbuffer data (copy, in chronological order), struct with the following fields:
 			x.t: time values (float)
 			x.intens: PEAK intensities (float)
-			x.mz: m/z ratio (int)
-			x.unit: unit of the PEAK values (string)
-			x.det: detector used for PEAK rading (string)
+			x.mz: m/z ratio (float)
+			x.unit: unit of the PEAK values (numpy array of strings)
+			x.det: detector used for PEAK rading (numpy array of strings)
 		'''
 
-		class peakbuffer:
+		class peakbuffer_data:
 			def __init__(self,t,intens,mz,unit,det):
 				self.t      = t
 				self.intens = intens
@@ -312,7 +348,8 @@ class rgams_SRS:
 				self.unit   = unit
 				self.det    = det
 		
-		x = peakbuffer(self._peakbuffer_t, self._peakbuffer_intens, self._peakbuffer_mz, self._peakbuffer_unit, self._peakbuffer_det)
+		t,mz,intens,det,unit = self._peakbuffer.get()
+		x = peakbuffer_data(t, intens, mz, unit, det)
 		return(x)
 
 
@@ -365,11 +402,8 @@ class rgams_SRS:
 
 		if self._has_display:
 			# if plot is not handled by external GUI:
-			self._peakbuffer_ax.set_yscale(self._peakbufferplot_yscale)
-
-			from matplotlib.ticker import FuncFormatter
-			yformatter = FuncFormatter(lambda y, _: '{:.1%}'.format(y))
-			self._peakbuffer_ax.yaxis.set_major_formatter(yformatter)
+			self._peakbuffer_plot.set_yscale(self._peakbufferplot_yscale)
+			self._peakbuffer_plot.set_yformat('{:.1%}')
 
 	
 	########################################################################################################
@@ -421,7 +455,7 @@ class rgams_SRS:
 
 		if self._has_display:
 			# if plot is not handled by external GUI:
-			self._scan_ax.set_yscale(self._scan_yscale)
+			self._scan_plot.set_yscale(self._scan_yscale)
 
 	
 	########################################################################################################
@@ -440,12 +474,8 @@ class rgams_SRS:
 		(none)
 		'''
 
-		# wait until the serial port is unlocked:
-		while self._ser_locked == True:
-			time.sleep(0.01)
-			
-		# lock the port:
-		self._ser_locked = True
+		# wait until the serial port is unlocked, then lock the port:
+		self._ser_lock.acquire()
 		
 
 	
@@ -466,7 +496,26 @@ class rgams_SRS:
 		'''
 
 		# release the lock:
-		self._ser_locked = False
+		self._ser_lock.release()
+
+
+	########################################################################################################
+
+
+	def get_serial_lock_stats(self):
+		'''
+		s = rgams_SRS.get_serial_lock_stats()
+
+		Return contention statistics of the serial port lock (useful to find out if other threads are blocking the port for too long).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		s: lock statistics (dictionary, see serial_lock.stats())
+		'''
+
+		return self._ser_lock.stats()
 
 
 	
@@ -474,7 +523,56 @@ class rgams_SRS:
 
 	
 
-	def param_IO(self,cmd,ansreq,timeout=10,wait_between_bytes=0.02):
+	def read_response(self,timeout=10,terminator=b'\n\r'):
+		'''
+		ans = rgams_SRS.read_response(timeout=10,terminator=b'\\n\\r')
+
+		Read a response line from the RGA serial port. The bytes are read in blocks as they arrive, and the function returns as soon as the terminator sequence has been received or the timeout has expired. The serial port must be locked by the caller.
+
+		INPUT:
+		timeout (optional): max. wait time for the complete response (seconds), default: timeout = 10 seconds
+		terminator (optional): byte sequence marking the end of the response, default: terminator = b'\\n\\r' (as used by the SRS RGA)
+
+		OUTPUT:
+		ans: response bytes received before the timeout expired, including the terminator (bytes). The terminator is missing if the response was incomplete (or empty, if there was no response at all).
+		'''
+
+		ser = self.ser
+		buf = bytearray()
+		deadline = time.monotonic() + timeout
+		port_timeout = ser.timeout
+
+		while True:
+			# read whatever is in the input buffer (at least one byte, wait for it if necessary):
+			n = ser.in_waiting
+			if n > 0:
+				buf += ser.read(n)
+			else:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					break # give up waiting
+				if ( port_timeout is not None ) and ( remaining < port_timeout ):
+					# don't block beyond the deadline:
+					ser.timeout = remaining
+					try:
+						buf += ser.read(1)
+					finally:
+						ser.timeout = port_timeout
+				else:
+					buf += ser.read(1) # returns as soon as the byte arrives (or after the port timeout)
+
+			if buf.endswith(terminator):
+				break
+
+		return bytes(buf)
+
+
+
+	########################################################################################################
+
+	
+
+	def param_IO(self,cmd,ansreq,timeout=10,wait_between_bytes=0.0):
 		'''
 		ans = rgams_SRS.param_IO(cmd,ansreq)
 		
@@ -486,7 +584,7 @@ class rgams_SRS:
 			ansreq = 1: answer expected, check for answer
 			ansreq = 0: no answer expected, don't check for answer
 		timeout (optional): max. wait time for answer from RGA (seconds), default: timeout = 10 seconds
-		wait_between_bytes (optional): wait time between reads of single response bytes (seconds), default = 0.02 seconds. If reading answer from RGA, it may be required to wait a short time between reading each single byte. If the data is coming too slowly, the data reading might empty the input buffer before all the data is transferred for the RGA to the buffer, and the code would then assume it is done with reading all the data. Adding a small wait time in between the single reads of each byte helps to avoid this problem.
+		wait_between_bytes (optional): not used anymore (the answer is read until the end-of-line terminator sent by the RGA has been received, see rgams_SRS.read_response()). This argument is only kept for compatibility with existing code.
 
 		OUTPUT:
 		ans: answer / result returned from RGA
@@ -495,6 +593,9 @@ class rgams_SRS:
 		# lock the serial port
 		self.get_serial_lock()
 	
+		# set commands may change the parameter value in the RGA head:
+		self._state_invalidate(cmd)
+
 		# check if serial buffer (input) is empty (just in case, will be useful to catch errors):
 		if self.ser.inWaiting() > 0:
 			self.warning('DEBUGGING INFO: serial buffer not empty before executing command = ' + cmd + '.')
@@ -504,32 +605,17 @@ class rgams_SRS:
 		
 		if ansreq:
 
-			# wait for response
-			t = 0
-			dt = 0.1
-			doWait = 1
-			while doWait:
-				if self.ser.inWaiting() == 0: # nothing in the buffer yet, wait
-					time.sleep(dt)
-					t = t + dt
-					if t > timeout: # give up waiting
-						doWait = 0
-						self.warning('could not determine parameter value or status (no response from RGA, command: ' + cmd + ')')
-						ans = -1
-				else:
-					doWait = 0
-					ans = ''
-		
-			# read back result:
-			if ans == -1:
+			# read response (wait until the full line has arrived):
+			u = self.read_response(timeout)
+
+			if len(u) == 0: # give up waiting
+				self.warning('could not determine parameter value or status (no response from RGA, command: ' + cmd + ')')
 				self.warning('Execution of ' + cmd + ' did not produce a result (or took too long)!')
+				ans = -1
 			else:
-				while self.ser.inWaiting() > 0: # while there's something in the buffer...
-					ans = ans + self.ser.read().decode('utf-8') # read each byte
-					if wait_between_bytes > 0.0:
-						time.sleep(wait_between_bytes) # allow some time before quering for the next byte
-
-				ans = ans.rstrip('\r\n') # remove newline characters at end
+				if not u.endswith(b'\n\r'):
+					self.warning('Incomplete response from RGA (command: ' + cmd + ', response: ' + repr(u) + ')')
+				ans = u.decode('utf-8').rstrip('\r\n') # remove newline characters at end
 					
 		else: # check if serial buffer is empty (will be useful to catch errors):
 			ans = None
@@ -548,6 +634,278 @@ class rgams_SRS:
 	########################################################################################################
 
 
+
+	def _state_get(self,par,refresh=False):
+		'''
+		ans = rgams_SRS._state_get(par,refresh=False)
+
+		Return value of an RGA parameter from the state cache. The value is read from the RGA head (and the cache is updated) if it is not in the cache, if the cached value is older than the cache TTL, or if refresh = True.
+
+		INPUT:
+		par: parameter name (string, two-letter RGA command, e.g. par = 'HV')
+		refresh (optional): flag to force reading the value from the RGA head (default: refresh = False)
+
+		OUTPUT:
+		ans: parameter value as returned by the RGA (string), or -1 if the RGA did not respond
+		'''
+
+		x = self._state.get(par)
+		if ( x is not None ) and ( not refresh ):
+			if ( self._state_ttl is None ) or ( time.monotonic() - x[1] < self._state_ttl ):
+				return x[0]
+
+		ans = self.param_IO(par + '?',1)
+		if ans == -1:
+			self._state.pop(par,None) # don't cache failed queries
+		else:
+			self._state[par] = ( ans , time.monotonic() )
+		return ans
+
+
+
+	########################################################################################################
+
+
+
+	def _state_set(self,par,val,ansreq,skip_unchanged=True):
+		'''
+		ans = rgams_SRS._state_set(par,val,ansreq,skip_unchanged=True)
+
+		Set an RGA parameter and update the state cache (write-through). The new value is cached only after it was sent to the RGA successfully (if the RGA does not respond or the serial communication fails, the parameter is removed from the cache, so that it is read from the RGA head the next time it is used). If skip_unchanged = True and the (valid) cached value is equal to the new value, the command is not sent to the RGA.
+
+		INPUT:
+		par: parameter name (string, two-letter RGA command, e.g. par = 'HV')
+		val: new parameter value (string, as sent to the RGA)
+		ansreq: flag indicating if answer from RGA is expected (see rgams_SRS.param_IO())
+		skip_unchanged (optional): flag to skip sending the command if the value is unchanged (default: skip_unchanged = True)
+
+		OUTPUT:
+		ans: answer returned from RGA (None if the command was skipped or if no answer was expected)
+		'''
+
+		x = self._state.get(par)
+		if skip_unchanged and ( x is not None ):
+			if ( self._state_ttl is None ) or ( time.monotonic() - x[1] < self._state_ttl ):
+				try:
+					same = float(x[0]) == float(val)
+				except ValueError:
+					same = x[0] == val
+				if same:
+					return None
+
+		ans = self.param_IO(par + val,ansreq) # removes par from the cache (see rgams_SRS._state_invalidate())
+		if ans != -1:
+			self._state[par] = ( val , time.monotonic() ) # only cache the new value if the RGA responded, read it from the RGA head next time otherwise
+
+		return ans
+
+
+
+	########################################################################################################
+
+
+
+	def _state_invalidate(self,cmd):
+		'''
+		rgams_SRS._state_invalidate(cmd)
+
+		Remove the parameter changed by an RGA command from the state cache, so that it is read from the RGA head the next time it is used. Query commands (ending with '?') do not change the cache.
+
+		INPUT:
+		cmd: command string that is sent to the RGA (e.g. cmd = 'FL0.5')
+
+		OUTPUT:
+		(none)
+		'''
+
+		if cmd.endswith('?'):
+			return
+
+		par = cmd[:2]
+		self._state.pop(par,None)
+
+		if par in ( 'MI' , 'MF' , 'SA' ):
+			# number of scan points depends on MI, MF, SA:
+			self._state.pop('AP',None)
+			self._state.pop('HP',None)
+
+
+
+	########################################################################################################
+
+
+
+	def state_cache_clear(self,par=None):
+		'''
+		rgams_SRS.state_cache_clear(par=None)
+
+		Clear the cache of RGA parameter values, so that the values are read again from the RGA head the next time they are used (useful if the RGA settings may have been changed by other means, e.g. after an RGA error or power cycle).
+
+		INPUT:
+		par (optional): name of the parameter to be cleared (string, e.g. par = 'FL'). Default: par = None (clear all parameters)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if par is None:
+			self._state.clear()
+		else:
+			self._state.pop(par,None)
+
+
+
+	########################################################################################################
+
+
+
+	def set_state_cache_ttl(self,ttl):
+		'''
+		rgams_SRS.set_state_cache_ttl(ttl)
+
+		Set max. age of RGA parameter values in the state cache (see rgams_SRS.__init__()).
+
+		INPUT:
+		ttl: max. age (seconds), or None to never expire the cached values
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._state_ttl = ttl
+
+
+
+	########################################################################################################
+
+
+
+	def set_conservative_timing(self,flag):
+		'''
+		rgams_SRS.set_conservative_timing(flag)
+
+		Choose the timing of the serial communication in PEAK and ZERO readings (see rgams_SRS.__init__()).
+
+		INPUT:
+		flag: if True, wait 20 ms after each reading to make sure the serial buffers are up to date (conservative timing of earlier ruediPy versions). If False, send the next MR command as soon as the previous reading has arrived.
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._conservative_timing = bool(flag)
+
+
+
+	########################################################################################################
+
+
+
+	def _gate_cycles(self,gate):
+		'''
+		N,gt = rgams_SRS._gate_cycles(gate)
+
+		Deal with gate times longer than the max. gate time supported by the RGA (2.4 seconds): determine the number of readings and the gate time of each reading needed to achieve the requested gate time.
+
+		INPUT:
+		gate: requested gate time (seconds)
+
+		OUTPUT:
+		N: number of readings (integer)
+		gt: gate time of each reading (seconds)
+		'''
+
+		gmax = max(self.supported_gate_times())
+		if gate > gmax:
+			return int(round(gate/gmax)),gmax
+		return 1,gate
+
+
+
+	########################################################################################################
+
+
+
+	def _MR_command(self,mz):
+		'''
+		cmd = rgams_SRS._MR_command(mz)
+
+		Return the MR command for reading the signal at the given m/z value (bytes, built only once for each m/z value).
+
+		INPUT:
+		mz: m/z value (integer)
+
+		OUTPUT:
+		cmd: command bytes
+		'''
+
+		try:
+			return self._MR_cmd[mz]
+		except KeyError:
+			cmd = ('MR' + str(mz) + '\r\n').encode('ascii')
+			self._MR_cmd[mz] = cmd
+			return cmd
+
+
+
+	########################################################################################################
+
+
+
+	def _read_MR(self,mz,N,typ='PEAK'):
+		'''
+		v = rgams_SRS._read_MR(mz,N,typ='PEAK')
+
+		Send N MR commands for the given m/z value and return the sum of the readings (raw integer values as returned by the RGA, in units of 1E-16 A). The serial port must be locked by the caller.
+
+		INPUT:
+		mz: m/z value (integer)
+		N: number of readings
+		typ (optional): type of reading ('PEAK' or 'ZERO', used for warning messages and timing)
+
+		OUTPUT:
+		v: sum of readings (integer), or None if the RGA did not return a reading
+		'''
+
+		cmd = self._MR_command(mz)
+		ser = self.ser
+		buf = self._MR_buf
+		v = 0
+
+		if self._conservative_timing:
+			for k in range(N):
+				ser.write(cmd) # send command to RGA
+				if typ == 'ZERO':
+					time.sleep(0.02) # wait a bit to make sure that serial command is sent
+				if ser.readinto(buf) < 4: # this will wait until all 4 bytes are received
+					self.warning('RGA did not return ' + typ + ' reading for mz = ' + str(mz) + '!')
+					return None
+				time.sleep(0.02) # wait a bit to make sure that serial buffers are up to date
+				while ser.inWaiting() > 0:
+					self.warning('DEBUGGING INFO: serial input buffer not empty after ' + typ + ' reading!')
+					ser.flushInput()
+					time.sleep(0.02)
+				v = v + _INT32.unpack(buf)[0] # unpack 4-byte data value
+
+		else:
+			unpack = _INT32.unpack
+			for k in range(N):
+				ser.write(cmd) # send command to RGA
+				if ser.readinto(buf) < 4: # this will wait until all 4 bytes are received
+					self.warning('RGA did not return ' + typ + ' reading for mz = ' + str(mz) + '!')
+					return None
+				if ser.in_waiting > 0: # there should be no more than the 4 data bytes, which were all read out above
+					self.warning('DEBUGGING INFO: serial input buffer not empty after ' + typ + ' reading!')
+					ser.flushInput()
+				v = v + unpack(buf)[0] # unpack 4-byte data value
+
+		return v
+
+
+
+	########################################################################################################
+
+
 	
 	def electron_energy_min(self):
 		'''
@@ -616,7 +974,7 @@ class rgams_SRS:
 			val = minval
 
 		# send command to serial port:
-		self.param_IO('EE' + str(val),1)
+		self._state_set('EE',str(val),1)
 
 	
 	########################################################################################################
@@ -680,7 +1038,7 @@ class rgams_SRS:
 		'''
 		
 		# send command to serial port:
-		ans = float(self.param_IO('EE?',1))
+		ans = float(self._state_get('EE'))
 		return ans
 
 
@@ -703,7 +1061,7 @@ class rgams_SRS:
 		# check if CEM option is installed:
 		if self.has_multiplier():
 			# send command to serial port:
-			self.param_IO(cmd='HV' + str(val),ansreq=1) # note that setting the HV value seems to be slow, and the RGA response to the serial buffer may be slow. Therefore wait_between_bytes > 0.0
+			self._state_set('HV',str(val),1) # don't send the command if the HV is already set to val
 
 		else:
 			self.warning ('Cannot set multiplier (CEM) high voltage, because CEM option is not installed.')
@@ -728,7 +1086,7 @@ class rgams_SRS:
 		# check if CEM option is installed:
 		if self.has_multiplier():
 			# send command to serial port:
-			ans = float(self.param_IO('HV?',1))
+			ans = float(self._state_get('HV'))
 		else:
 			self.warning ('Cannot get multiplier (CEM) high voltage, because CEM option is not installed.')
 			ans = None
@@ -791,8 +1149,8 @@ class rgams_SRS:
 		(none)
 		'''
 			
-		# send command to serial port:
-		self.param_IO('FL' + str(val),1)
+		# send command to serial port (always, in case the filament went off):
+		self._state_set('FL',str(val),1,skip_unchanged=False)
 
 	
 	########################################################################################################
@@ -811,8 +1169,8 @@ class rgams_SRS:
 		val: electron emission current in mA (float)
 		'''
 				
-		# send command to serial port:
-		ans = float(self.param_IO('FL?',1))
+		# send command to serial port (always, the filament may go off at any time, e.g. after a pressure burst):
+		ans = float(self._state_get('FL',refresh=True))
 		return ans
 
 	
@@ -859,6 +1217,7 @@ class rgams_SRS:
 				
 		# send command to serial port:
 		self.param_IO('FL*',1)
+		self.state_cache_clear('FL') # emission current value is not known
 
 	
 	########################################################################################################
@@ -955,10 +1314,11 @@ class rgams_SRS:
 		'''
 
 		if hasattr(self, '_mzmax') == 0: # never asked for mz_max before
-			x = self.param_IO('MF?',1) # get current MF value
+			x = self._state_get('MF') # get current MF value
 			self.param_IO('MF*',0) # set MF to default value, which equals M_MAX
 			self._mzmax = int ( self.param_IO('MF?',1) ) # read back M_MAX value
 			self.param_IO('MF' + x,0) # set back to previous MF value
+			self._state['MF'] = ( x , time.monotonic() )
 		return self._mzmax
 
 
@@ -1003,7 +1363,7 @@ class rgams_SRS:
 		
 		# send command to serial port:
 		if det == 'F':
-			self.param_IO('HV0',1)
+			self._state_set('HV','0',1) # don't send the command if the HV is already off
 
 		elif det == 'M':
 			if self.has_multiplier():
@@ -1037,7 +1397,7 @@ class rgams_SRS:
 		if not self.has_multiplier(): # there is no Multiplier installed
 			det = 'F'
 		else:
-			hv = self.param_IO('HV?',1) # send command to serial port
+			hv = self._state_get('HV') # use cached value or send command to serial port
 			try:
 				hv = float(hv)
 				if hv == 0:
@@ -1046,7 +1406,7 @@ class rgams_SRS:
 					det = 'M'
 			except ValueError:
 				det = '?'
-				self.warning ('Could not determine electron multiplier high voltage (could not convert string to float). RGA-MS returned HV = ' + hv )
+				self.warning ('Could not determine electron multiplier high voltage (could not convert string to float). RGA-MS returned HV = ' + str(hv) )
 			except:
 				self.warning ('Unexpected error. Could not determine electron multiplier HV.' )
 		return det
@@ -1068,10 +1428,7 @@ class rgams_SRS:
 		val: NF noise floor parameter value, 0...7 (integer)
 		'''
 
-		if hasattr(self, '_noisefloor') == 0: # never asked for noisefloor before
-			self._noisefloor = float( self.param_IO('NF?',1) ) # get current NF value
-			
-		return self._noisefloor
+		return float( self._state_get('NF') ) # get current NF value (from cache if possible)
 
 	
 	########################################################################################################
@@ -1099,9 +1456,7 @@ class rgams_SRS:
 			self.warning ('NF parameter must not be less than 0. Using NF = 0...')
 			NF = 0
 		
-		if NF != self.get_noise_floor(): # only change NF setting if necessary
-			self.param_IO('NF' + str(NF),0)
-			self._noisefloor = NF # remember new NF value
+		self._state_set('NF',str(NF),0) # only change NF setting if necessary
 
 	
 	########################################################################################################
@@ -1160,39 +1515,76 @@ class rgams_SRS:
 	########################################################################################################
 	
 
-	def peakbuffer_add(self,t,mz,intens,det,unit):
+	def peakbuffer_add(self,t,mz,intens,det,unit,history=True):
 		"""
-		rgams_SRS.peakbuffer_add(t,mz,intens,unit)
+		rgams_SRS.peakbuffer_add(t,mz,intens,det,unit,history=True)
 		
-		Add data to PEAKS data buffer
+		Add data to PEAKS data buffer (see peakbuffer.add()). Several data points can be added in one go by using arrays for mz and intens (t, det and unit may then be single values applying to all data points, or arrays / lists of the same length as mz).
 				
 		INPUT:
 		t: epoch time
-		mz: mz values
-		intens: intensity value
+		mz: mz value(s)
+		intens: intensity value(s)
 		det: detector (char/string)
 		unit: unit of intensity value (char/string)
+		history (optional): flag to indicate if the data are also added to the long-term history of the PEAKS data buffer (see peakbuffer.add()). Default: history = True
 		
 		OUTPUT:
 		(none)
 		"""
 
-		self._peakbuffer_t = numpy.append( self._peakbuffer_t , t )
-		self._peakbuffer_mz = numpy.append( self._peakbuffer_mz , mz )
-		self._peakbuffer_intens = numpy.append( self._peakbuffer_intens , intens )
-		self._peakbuffer_det.append( det )
-		self._peakbuffer_unit.append( unit )
+		self._peakbuffer.add(t,mz,intens,det,unit,history)
 
-		N = self._peakbuffer_max_len
-		
-		if self._peakbuffer_t.shape[0] > N:
-			self._peakbuffer_t      = self._peakbuffer_t[-N:]
-			self._peakbuffer_mz     = self._peakbuffer_mz[-N:]
-			self._peakbuffer_intens = self._peakbuffer_intens[-N:]
-			self._peakbuffer_det    = self._peakbuffer_det[-N:]
-			self._peakbuffer_unit   = self._peakbuffer_unit[-N:]
-			
-		self._peakbuffer_lastupdate_timestamp = misc.now_UNIX()
+
+	########################################################################################################
+
+
+	def peakbuffer_series(self,mz,det,t_from=None,t_to=None):
+		"""
+		t,intens = rgams_SRS.peakbuffer_series(mz,det,t_from=None,t_to=None)
+
+		Return PEAK data of one m/z value and detector from the PEAKS data buffer, optionally restricted to a time window (see peakbuffer.series()).
+
+		INPUT:
+		mz: m/z value
+		det: detector (string), e.g., det='F' for Faraday or det='M' for multiplier
+		t_from, t_to (optional): start and end of the time window (epoch time). Default: t_from = None, t_to = None (no limit)
+
+		OUTPUT:
+		t: time values (numpy array of floats, view of the buffer data)
+		intens: PEAK intensities (numpy array of floats, view of the buffer data)
+		"""
+
+		return self._peakbuffer.series(mz,det,t_from,t_to)
+
+
+	########################################################################################################
+
+
+	def peakbuffer_history(self,mz,det,window,max_points=None):
+		"""
+		dt,t,mean,min,max,count = rgams_SRS.peakbuffer_history(mz,det,window,max_points=None)
+
+		Return the long-term history of PEAK data of one m/z value and detector within a time window that ends with the most recent data. The data are returned at the finest resolution that covers the window: raw data for short windows, otherwise rollups of e.g. 10 s, 1 min or 1 h bins (see historybuffer class). The history is kept if the PEAKS data buffer is cleared.
+
+		INPUT:
+		mz: m/z value
+		det: detector (string), e.g., det='F' for Faraday or det='M' for multiplier
+		window: length of the time window (seconds)
+		max_points (optional): max. number of data points (a coarser resolution is used if necessary). Default: max_points = None (no limit)
+
+		OUTPUT:
+		dt: bin width of the rollups (seconds), or 0 for raw data
+		t: epoch times (raw data) or start times of the bins (numpy array of floats)
+		mean, min, max: mean, min. and max. of PEAK intensities in each bin (numpy arrays of floats)
+		count: number of PEAK readings in each bin (numpy array)
+		"""
+
+		h = self._peakbuffer.history(mz,det)
+		if h is None:
+			e = numpy.array([])
+			return 0,e,e,e,e,e
+		return h.get(window,max_points)
 
 
 	########################################################################################################
@@ -1211,12 +1603,7 @@ class rgams_SRS:
 		(none)
 		"""
 
-		self._peakbuffer_t      = self._peakbuffer_t[[]]
-		self._peakbuffer_mz     = self._peakbuffer_mz[[]]
-		self._peakbuffer_intens = self._peakbuffer_intens[[]]
-		self._peakbuffer_det    = ['x'] * 0 # empty list
-		self._peakbuffer_unit   = ['x'] * 0 # empty list
-		self._peakbuffer_lastupdate_timestamp = misc.now_UNIX()
+		self._peakbuffer.clear()
 
 
 	########################################################################################################
@@ -1235,7 +1622,7 @@ class rgams_SRS:
 		(none)
 		"""
 
-		self._peakbuffer_max_len = N
+		self._peakbuffer.set_length(N)
 
 
 
@@ -1256,7 +1643,7 @@ class rgams_SRS:
 		timestamp: UNIX time of last update
 		"""
 
-		return self._peakbuffer_lastupdate_timestamp
+		return self._peakbuffer.get_timestamp()
 
 
 
@@ -1298,26 +1685,14 @@ class rgams_SRS:
 		# get timestamp
 		t = misc.now_UNIX()
 		
-		if mz < self.mz_min():
-			self.warning ('mz value must be ' + str(self.mz_min()) + ' or higher! Skipping peak measurement...')
-			val = '-1'
-			unit = '(none)'
-			
-		elif mz > self.mz_max():
-			self.warning ('mz value must be ' + str(self.mz_max()) + ' or less! Skipping peak measurement...')
+		if not self._check_peak_mz(mz):
 			val = '-1'
 			unit = '(none)'
 			
 		else: # proceed with measurement
 
 			# deal with gate times longer than 2.4 seconds (max. allowed with SRS-RGA):
-			v = 0.0;
-			if gate > max(self.supported_gate_times()):
-				N = int(round(gate/max(self.supported_gate_times())))
-				gt = max(self.supported_gate_times())
-			else:
-				N = 1
-				gt = gate
+			N,gt = self._gate_cycles(gate)
 			
 			# configure RGA (gate time):
 			self.set_gate_time(gt)
@@ -1327,32 +1702,20 @@ class rgams_SRS:
 			self.ser.flushOutput()
 			self.ser.flushInput()
 
-			for k in range(N):
-				
-				# send command to RGA:
-				self.ser.write(('MR' + str(mz) + '\r\n').encode('utf-8'))
-				
-				# read back data:
-				u = self.ser.read(4) # this will wait until all 4 bytes are received
-				
-				# make sure the serial in buffer is empty:
-				time.sleep(0.02) # wait a bit to make sure that serial buffers are up to date (although there should be no more than 4 data bytes in the input buffer, which are all read out by the command above
-				while self.ser.inWaiting() > 0:
-					self.warning('DEBUGGING INFO: serial input buffer not empty after PEAK reading!')
-					self.ser.flushInput()
-					time.sleep(0.02)
-	
-				# parse result:
-				u = struct.unpack('<i',u)[0] # unpack 4-byte data value
-				
-				v = v + u
-			
-			# release lock on serial port:
-			self.release_serial_lock()
+			# read data:
+			try:
+				v = self._read_MR(mz,N,'PEAK')
+			finally:
+				# release lock on serial port:
+				self.release_serial_lock()
 
-			v = v/N
-			val = v * 1E-16 # multiply by 1E-16 to convert to Amperes
-			unit = 'A'
+			if v is None:
+				val = '-1'
+				unit = '(none)'
+			else:
+				v = v/N
+				val = v * 1E-16 # multiply by 1E-16 to convert to Amperes
+				unit = 'A'
 					
 		det = self.get_detector()
 		
@@ -1369,6 +1732,73 @@ class rgams_SRS:
 	########################################################################################################
 	
 
+	def peak_set(self,mz_list,gate,f,add_to_peakbuffer=True,peaktype=None):
+		'''
+		val,t,unit = rgams_SRS.peak_set(mz_list,gate,f,add_to_peakbuffer=True,peaktype=None)
+
+		Read out detector signal at a set of masses (m/z values) in one go. This gives the same results as calling rgams_SRS.peak() for each m/z value, but the serial port is locked only once for the whole set, and the MR commands are sent back-to-back (unless conservative timing is used, see rgams_SRS.set_conservative_timing()). This minimizes the dead time between the readings, e.g. in peak-hopping cycles.
+
+		INPUT:
+		mz_list: m/z values (list or array of integers)
+		gate: gate time (seconds) used for each m/z value. NOTE: gate time can be longer than the max. gate time supported by the hardware (2.4 seconds). If so, the multiple peak readings will be averaged to achieve the requested gate time.
+		f: file object for writing data (see datafile.py). If f = 'nofile', data is not written to any data file.
+		add_to_peakbuffer (optional): flag to choose if peak values are added to peakbuffer (default: add_to_peakbuffer=True)
+		peaktype (optional): string to indicate the "type" of the PEAK readings (default: type=None), see rgams_SRS.peak()
+
+		OUTPUT:
+		val: signal intensities (numpy array of floats, NaN for m/z values that were out of range or could not be read)
+		t: timestamps of the readings (numpy array of floats, UNIX time at the start of each reading)
+		unit: unit (string)
+		'''
+
+		mz = [ int(m) for m in mz_list ]
+		n = len(mz)
+		val = numpy.full(n,numpy.nan)
+		t = numpy.full(n,numpy.nan)
+		unit = 'A'
+
+		# check for range of input values:
+		ok = self._check_peak_mz_list(mz)
+
+		# deal with gate times longer than 2.4 seconds (max. allowed with SRS-RGA):
+		N,gt = self._gate_cycles(gate)
+
+		# configure RGA (gate time):
+		self.set_gate_time(gt)
+
+		# lock serial port, make sure serial port buffers are empty:
+		with self._ser_lock:
+			self.ser.flushOutput()
+			self.ser.flushInput()
+
+			for i in range(n):
+				t[i] = misc.now_UNIX()
+				if not ok[i]:
+					continue
+				v = self._read_MR(mz[i],N,'PEAK')
+				if v is not None:
+					val[i] = v / N * 1E-16 # multiply by 1E-16 to convert to Amperes
+
+		det = self.get_detector()
+
+		# m/z values that were out of range or could not be read are recorded as -1 without unit (same as rgams_SRS.peak()):
+		bad = numpy.isnan(val)
+		units = [ '(none)' if bad[i] else unit for i in range(n) ]
+
+		if not ( f == 'nofile' ):
+			# write all PEAK records in one go:
+			f.write_records( [ ( 'PEAK' , 'RGA_SRS' , self.label() , mz[i] , '-1' if bad[i] else val[i] , units[i] , det , gate , t[i] , peaktype ) for i in range(n) ] )
+
+		# add data to peakbuffer
+		if add_to_peakbuffer and n > 0:
+			self.peakbuffer_add(t,numpy.array(mz),numpy.where(bad,-1.0,val),det,units)
+
+		return val,t,unit
+		
+		
+	########################################################################################################
+	
+
 	def zero(self,mz,mz_offset,gate,f,zerotype=None):
 		'''
 		val,unit = rgams_SRS.zero(mz,mz_offset,gate,f,zerotype=None)
@@ -1405,26 +1835,14 @@ class rgams_SRS:
 		# get timestamp
 		t = misc.now_UNIX()
 		
-		if mz+mz_offset < 1:
-			self.warning ('mz+mz_offset must be positive! Skipping zero measurement...')
-			val = '-1'
-			unit = '(none)'
-			
-		elif mz+mz_offset > self.mz_max():
-			self.warning ('mz+mz_offset value must be ' + self.mz_max() + ' or less! Skipping zero measurement...')
+		if not self._check_zero_mz(mz,mz_offset):
 			val = '-1'
 			unit = '(none)'
 			
 		else: # proceed with measurement
 		
 			# deal with gate times longer than 2.4 seconds (max. allowed with SRS-RGA):
-			v = 0.0;
-			if gate > max(self.supported_gate_times()):
-				N = int(round(gate/max(self.supported_gate_times())))
-				gt = max(self.supported_gate_times())
-			else:
-				N = 1
-				gt = gate
+			N,gt = self._gate_cycles(gate)
 			# configure RGA (gate time):
 			self.set_gate_time(gt)
 
@@ -1433,73 +1851,115 @@ class rgams_SRS:
 			self.ser.flushOutput()
 			self.ser.flushInput()
 
-			for k in range(N):
+			# read data:
+			try:
+				v = self._read_MR(mz+mz_offset,N,'ZERO')
+			finally:
+				# release lock on serial port:
+				self.release_serial_lock()
 
-				# send command to RGA:
-				self.ser.write(('MR' + str(mz+mz_offset) + '\r\n').encode('utf-8'))
+			if v is None:
+				val = '-1'
+				unit = '(none)'
+			else:
+				v = v/N
+				val = v * 1E-16 # multiply by 1E-16 to convert to Amperes
+				unit = 'A'
 
-				# wait a bit to make sure that serial command is sent
-				time.sleep(0.02)
+		if not ( f == 'nofile' ):
+			f.write_zero('RGA_SRS',self.label(),mz,mz_offset,val,unit,self.get_detector(),gate,t,zerotype)
 
-				# read back data:
-				u = self.ser.read(4)
+		return val,unit
 
-				# wait a bit to make sure that serial buffers are up to date
-				time.sleep(0.02)
 
-				# make sure the serial in buffer is empty:
-				while self.ser.inWaiting() > 0:
-					self.warning('DEBUGGING INFO: serial input buffer not empty after ZERO reading!')
-					self.ser.flushInput()
-					time.sleep(0.02)
+	########################################################################################################
 
-				# parse result:
-				u = struct.unpack('<i',u)[0] # unpack 4-byte data value
-				
-				v = v + u
 
-			# release lock on serial port:
-			self.release_serial_lock()
-			
-			v = v/N
-			val = v * 1E-16 # multiply by 1E-16 to convert to Amperes
-			unit = 'A'
+	def _check_peak_mz(self,mz,where=''):
+		'''
+		ok = rgams_SRS._check_peak_mz(mz,where='')
 
-		if not ( f == 'nofile' ):
-			f.write_zero('RGA_SRS',self.label(),mz,mz_offset,val,unit,self.get_detector(),gate,t,zerotype)
+		Check if the m/z value of a PEAK reading is in the range supported by the RGA (issue a warning if it is not).
 
-		return val,unit
+		INPUT:
+		mz: m/z value (integer)
+		where (optional): string added to the warning message (e.g. where = ' at mz = 28')
+
+		OUTPUT:
+		ok: True if the m/z value is in range, False otherwise
+		'''
+
+		if mz < self.mz_min():
+			self.warning ('mz value must be ' + str(self.mz_min()) + ' or higher! Skipping peak measurement' + where + '...')
+			return False
+		if mz > self.mz_max():
+			self.warning ('mz value must be ' + str(self.mz_max()) + ' or less! Skipping peak measurement' + where + '...')
+			return False
+		return True
 
 
 	########################################################################################################
 
 
-	def scan(self,low,high,step,gate,f):
+	def _check_peak_mz_list(self,mz):
 		'''
-		M,Y,unit = rgams_SRS.scan(low,high,step,gate,f)
+		ok = rgams_SRS._check_peak_mz_list(mz)
 
-		Analog scan
+		Check the m/z values of a set of PEAK readings (see rgams_SRS._check_peak_mz()).
 
 		INPUT:
-		low: low m/z value (integer or decimal)
-		high: high m/z value (integer or decimal)
-		step: scan resolution (number of mass increment steps per amu)
-		   step = integer number (10...25) --> use given number (high number equals small mass increments between steps)
-		   step = '*' use default value (step = 10)
-		gate: gate time (seconds)
-		f: file object or 'nofile':
-			if f is a DATAFILE object, the scan data is written to the current data file
-			if f = 'nofile' (string), the scan data is not written to a datafile
+		mz: m/z values (list of integers)
 
 		OUTPUT:
-		M: mass values (mz, in amu)
-		Y: signal intensity values (float)
-		unit: unit of Y (string)
+		ok: list of flags, True for m/z values that are in range
+		'''
+
+		return [ self._check_peak_mz(m,' at mz = ' + str(m)) for m in mz ]
+
+
+	########################################################################################################
+
+
+	def _check_zero_mz(self,mz,mz_offset):
+		'''
+		ok = rgams_SRS._check_zero_mz(mz,mz_offset)
+
+		Check if the m/z value of a ZERO reading (mz+mz_offset) is in the range supported by the RGA (issue a warning if it is not).
+
+		INPUT:
+		mz: m/z value (integer)
+		mz_offset: offset relative m/z value (integer)
+
+		OUTPUT:
+		ok: True if the m/z value is in range, False otherwise
+		'''
+
+		if mz+mz_offset < 1:
+			self.warning ('mz+mz_offset must be positive! Skipping zero measurement...')
+			return False
+		if mz+mz_offset > self.mz_max():
+			self.warning ('mz+mz_offset value must be ' + str(self.mz_max()) + ' or less! Skipping zero measurement...')
+			return False
+		return True
+
+
+	########################################################################################################
+
+
+	def _check_scan_range(self,low,high,step):
+		'''
+		low,high,step = rgams_SRS._check_scan_range(low,high,step)
+
+		Check the range of the analog-scan parameters (issue warnings and use the closest valid values if they are out of range).
+
+		INPUT:
+		low, high, step: see rgams_SRS.scan()
+
+		OUTPUT:
+		low, high: low and high m/z values (integers)
+		step: scan resolution (integer)
 		'''
 
-		# check for range of input values:
-		llow  = low
-		hhigh = high
 		low   = math.floor(low)
 		high  = math.ceil(high)
 		step  = int(step)
@@ -1513,74 +1973,364 @@ class rgams_SRS:
 			self.warning ('Scan must start at m/z=0 or higher! Starting at m/z=0...')
 			low = 0
 		if high > self.mz_max():
-			self.warning ('Scan must end at m/z=' + self.mz_max() + ' or lower! Ending at m/z= ' + self.mz_max() + '...')
-			low = self.mz_max()
+			self.warning ('Scan must end at m/z=' + str(self.mz_max()) + ' or lower! Ending at m/z= ' + str(self.mz_max()) + '...')
+			high = self.mz_max()
 		if low >= high:
 			self.warning ('Scan m/z value at start must be lower than at end. Swapping values...')
 			x = low;
 			low = high;
 			high = x;
 
+		return low,high,step
+
+
+	########################################################################################################
+
+
+	def _check_histogram_range(self,low,high):
+		'''
+		low,high = rgams_SRS._check_histogram_range(low,high)
+
+		Check the m/z range of a histogram scan (issue warnings and use the closest valid values if they are out of range).
+
+		INPUT:
+		low, high: see rgams_SRS.histogram_scan()
+
+		OUTPUT:
+		low, high: low and high m/z values (integers)
+		'''
+
+		low  = int(round(low))
+		high = int(round(high))
+		if low < 1:
+			self.warning ('Histogram scan must start at m/z=1 or higher! Starting at m/z=1...')
+			low = 1
+		if high > self.mz_max():
+			self.warning ('Histogram scan must end at m/z=' + str(self.mz_max()) + ' or lower! Ending at m/z= ' + str(self.mz_max()) + '...')
+			high = self.mz_max()
+		if low > high:
+			self.warning ('Histogram scan m/z value at start must be lower than at end. Swapping values...')
+			x = low;
+			low = high;
+			high = x;
+
+		return low,high
+
+
+	########################################################################################################
+
+
+	def _scan_config(self,low,high,step,gate):
+		'''
+		low,high,N = rgams_SRS._scan_config(low,high,step,gate)
+
+		Check the range of the analog-scan parameters and configure the RGA for the scan (see rgams_SRS.scan()).
+
+		INPUT:
+		low, high, step, gate: see rgams_SRS.scan()
+
+		OUTPUT:
+		low, high: low and high m/z values used for the scan (integers)
+		N: number of data points in the scan (integer, not including the total-pressure reading)
+		'''
+
+		# check for range of input values:
+		low,high,step = self._check_scan_range(low,high,step)
+
 		# configure RGA (gate time):
 		self.set_gate_time(gate)
 
 		# configure scan:
-		L = int(self.param_IO('MI?',1))
-		H = int(self.param_IO('MF?',1))
+		self._set_scan_range(low,high)
+		self._state_set('SA',str(step),0) # number of steps per amu
+
+		N = int(self._state_get('AP')) # number of data points in the scan
+
+		return low,high,N
+
+
+	########################################################################################################
+
+
+	def _set_scan_range(self,low,high):
+		'''
+		rgams_SRS._set_scan_range(low,high)
+
+		Set the m/z range for analog and histogram scans (MI and MF parameters).
+
+		INPUT:
+		low, high: low and high m/z values (integers)
+
+		OUTPUT:
+		(none)
+		'''
+
+		L = int(self._state_get('MI'))
 		if high >= L:	# setting MF lower than current MI may fail
-			self.param_IO('MF' + str(high),0) # high end mz value
-			self.param_IO('MI' + str(low),0) # low end mz value
+			self._state_set('MF',str(high),0) # high end mz value
+			self._state_set('MI',str(low),0) # low end mz value
 		else: # set MI first 
-			self.param_IO('MI' + str(low),0) # low end mz value
-			self.param_IO('MF' + str(high),0) # high end mz value
-		self.param_IO('SA' + str(step),0) # number of steps per amu
+			self._state_set('MI',str(low),0) # low end mz value
+			self._state_set('MF',str(high),0) # high end mz value
+
+
+	########################################################################################################
+
+
+	def _histogram_config(self,low,high,gate):
+		'''
+		low,high,N = rgams_SRS._histogram_config(low,high,gate)
+
+		Check the range of the histogram-scan parameters and configure the RGA for the scan (see rgams_SRS.histogram_scan()).
+
+		INPUT:
+		low, high, gate: see rgams_SRS.histogram_scan()
+
+		OUTPUT:
+		low, high: low and high m/z values used for the scan (integers)
+		N: number of data points in the scan (integer, not including the total-pressure reading)
+		'''
+
+		# check for range of input values:
+		low,high = self._check_histogram_range(low,high)
+
+		# configure RGA (gate time):
+		self.set_gate_time(gate)
+
+		# configure scan:
+		self._set_scan_range(low,high)
+		N = int(self._state_get('HP')) # number of data points in the histogram scan
 
-		N = int(self.param_IO('AP?',1)) # number of data points in the scan
+		return low,high,N
+
+
+	########################################################################################################
+
+
+	def scan_iter(self,low,high,step,gate):
+		'''
+		for M,Y in rgams_SRS.scan_iter(low,high,step,gate):
+			...
+
+		Analog scan, returning the scan data in chunks as they arrive from the RGA (generator). This allows processing or plotting the data while the scan is still running (see rgams_SRS.plot_scan() and datafile.write_scan()). The serial port is locked until the iteration is finished (the RGA sends the scan data as one continuous stream, so the port cannot be used for other commands while the scan is running). If the iteration is stopped before the end of the scan, the remaining scan data are read and discarded, so the serial port is ready for the next command.
+
+		IMPORTANT: the serial port lock is held by the thread that started the iteration, so the iterator must be exhausted or closed (e.g. it.close()) by that same thread. Don't hand the iterator over to another thread, and don't rely on garbage collection to stop an unfinished iteration: the lock cannot be released by another thread, so the serial port would remain locked.
+
+		INPUT:
+		low, high, step, gate: see rgams_SRS.scan()
+
+		OUTPUT (for each chunk of data):
+		M: mass values (mz, in amu, numpy array)
+		Y: signal intensity values (numpy array of floats, in A, NaN for data points that were not received from the RGA)
+
+		The total-pressure reading taken by the RGA after the scan is the return value of the generator (StopIteration.value, NaN if not received from the RGA).
+		'''
+
+		llow  = low
+		hhigh = high
+
+		# configure RGA:
+		low,high,N = self._scan_config(low,high,step,gate)
+		dm = (float(high)-float(low))/N # mz increment between scan points
+
+		# buffer for the raw scan data. Note: after scanning, the RGA also measures the total pressure and returns this as an extra data point, giving N+1 data points in total. All N+1 data points need to be read in order to empty the data buffer.
+		nbytes = (N+1)*4
+		buf = bytearray(nbytes)
+		mv = memoryview(buf)
+		n = 0 # number of bytes received
+		i = 0 # number of data points returned
+		P = numpy.nan
 
 		# wait until serial port is available, then lock it for access
 		self.get_serial_lock()
+		owner = threading.get_ident() # thread holding the lock
+
+		try:
+			# start the scan:
+			self.ser.write('SC1\r\n'.encode('utf-8'))
+
+			# read back result from RGA (in chunks, as the data arrive):
+			while n < nbytes:
+				k = min( max(self.ser.in_waiting,4) , nbytes-n ) # read all data available, or wait for the next data point
+				k = self.ser.readinto(mv[n:n+k]) # this will wait until the data are received (or the serial port times out)
+				if k == 0:
+					self.warning('RGA did not produce scan result (or took too long)!')
+					self.ser.flushInput()
+					break
+				n = n + k
+
+				# parse new data (4-byte data values, multiply by 1E-16 to convert to Amperes):
+				j = min(n//4,N)
+				if j > i:
+					Y = numpy.frombuffer(buf,dtype='<i4',count=j-i,offset=4*i) * 1E-16
+					M = low + numpy.arange(i,j) * dm
+					i = j
+					ii = (M >= llow) & (M <= hhigh) # discard data that are out of the desired mz range
+					if ii.any():
+						yield M[ii],Y[ii]
+
+			if n == nbytes:
+				P = _INT32.unpack_from(buf,4*N)[0] * 1E-16 # total pressure
+
+			elif i < N:
+				# data points that were not received:
+				M = low + numpy.arange(i,N) * dm
+				i = N
+				ii = (M >= llow) & (M <= hhigh)
+				if ii.any():
+					yield M[ii],numpy.full(ii.sum(),numpy.nan)
+
+		except GeneratorExit:
+			# iteration stopped before the end of the scan: read and discard the remaining scan data
+			while n < nbytes:
+				k = len(self.ser.read( min(max(self.ser.in_waiting,4),nbytes-n) ))
+				if k == 0:
+					self.ser.flushInput()
+					break
+				n = n + k
+			raise
+
+		finally:
+			# release lock on serial port
+			mv.release()
+			if not threading.get_ident() == owner:
+				self.warning('scan_iter was closed by a different thread than the one that started the scan, cannot release the lock on the serial port!')
+			self.release_serial_lock()
+
+		return P
+
+
+	########################################################################################################
+
+
+	def scan(self,low,high,step,gate,f,return_totalpressure=False):
+		'''
+		M,Y,unit = rgams_SRS.scan(low,high,step,gate,f,return_totalpressure=False)
+		M,Y,unit,P = rgams_SRS.scan(low,high,step,gate,f,return_totalpressure=True)
+
+		Analog scan
+
+		INPUT:
+		low: low m/z value (integer or decimal)
+		high: high m/z value (integer or decimal)
+		step: scan resolution (number of mass increment steps per amu)
+		   step = integer number (10...25) --> use given number (high number equals small mass increments between steps)
+		   step = '*' use default value (step = 10)
+		gate: gate time (seconds)
+		f: file object or 'nofile':
+			if f is a DATAFILE object, the scan data is written to the current data file
+			if f = 'nofile' (string), the scan data is not written to a datafile
+		return_totalpressure (optional): flag to choose if the total-pressure reading taken by the RGA after the scan is returned as an extra value (default: return_totalpressure = False)
+
+		OUTPUT:
+		M: mass values (mz, in amu, numpy array)
+		Y: signal intensity values (numpy array of floats, NaN for data points that were not received from the RGA)
+		unit: unit of Y (string)
+		P: total-pressure reading taken after the scan (float, same unit as Y, NaN if not received from the RGA). Only returned if return_totalpressure = True.
 
-		# start the scan:
-		self.ser.write('SC1\r\n'.encode('utf-8'))
+		See also rgams_SRS.scan_iter() to process the scan data while the scan is running.
+		'''
 
 		# get time stamp before scan
 		t1 = misc.now_UNIX()
 
-		# read back result from RGA:
-		Y = [] # init empty list
-
-		k = 0
-		while ( k < N+1 ): # read data points. Note: after scanning, the RGA also measures the total pressure and returns this as an extra data point, giving N+1 data points in total. All N+1 data points need to be read in order to empty the data buffer.
-
-			# wait for data in buffer:
-			t = 0
-			dt = 0.1
-			doWait = 1
-			while doWait > 0:
-				if self.ser.inWaiting() == 0: # wait
-					time.sleep(dt)
-					t = t + dt
-					if t > 10: # give up waiting
-						doWait = -1
-				else:
-					doWait = 0
+		# run the scan and collect the data:
+		MM = []
+		YY = []
+		it = self.scan_iter(low,high,step,gate)
+		try:
+			while True:
+				try:
+					M,Y = next(it)
+				except StopIteration as e:
+					P = e.value
+					break
+				MM.append(M)
+				YY.append(Y)
+		finally:
+			it.close() # release the serial port right away if the scan is interrupted (see rgams_SRS.scan_iter())
 
-			# read back result:
-			if doWait == -1:
-				self.warning('RGA did not produce scan result (or took too long)!')
-			else:
-				u = self.ser.read(4)
+		# get time stamp after scan
+		t2 = misc.now_UNIX()
 
-				if k < N: # if this was not the final data point (total pressure)
-					u = struct.unpack('<i',u)[0] # unpack 4-byte data value
-					u = u * 1E-16 # divide by 1E-16 to convert to Amperes
-					Y.append(u) # append value to list 'ans'
+		# determine "mean" timestamp
+		t = (t1 + t2) / 2.0
 
-				# prepare for next value:
-				k = k + 1
+		if MM:
+			M = numpy.concatenate(MM)
+			Y = numpy.concatenate(YY)
+		else:
+			M = numpy.array([])
+			Y = numpy.array([])
+		unit = 'A'
 
-		# release lock on serial port
-		self.release_serial_lock()
+		# write to data file:
+		if not ( f == 'nofile' ):
+			det = self.get_detector()
+			f.write_scan('RGA_SRS',self.label(),M,Y,unit,det,gate,t)
+
+		if return_totalpressure:
+			return M,Y,unit,P
+		return M,Y,unit
+
+
+	########################################################################################################
+
+
+	def histogram_scan(self,low,high,gate,f,add_to_peakbuffer=False):
+		'''
+		M,Y,unit = rgams_SRS.histogram_scan(low,high,gate,f,add_to_peakbuffer=False)
+
+		Histogram scan: read out detector signal at all integer m/z values from low to high with a single command (see the SRS RGA manual). This is much faster than reading the masses one by one with rgams_SRS.peak(), or running an analog scan over the same m/z range.
+
+		INPUT:
+		low: low m/z value (integer)
+		high: high m/z value (integer)
+		gate: gate time (seconds) used for each m/z value
+		f: file object or 'nofile':
+			if f is a DATAFILE object, the scan data is written to the current data file (see datafile.write_histogram_scan())
+			if f = 'nofile' (string), the scan data is not written to a datafile
+		add_to_peakbuffer (optional): flag to choose if the values are added to the peakbuffer (default: add_to_peakbuffer=False)
+
+		OUTPUT:
+		M: mass values (mz, in amu, numpy array of integers)
+		Y: signal intensity values (numpy array of floats, NaN for data points that were not received from the RGA)
+		unit: unit of Y (string)
+		'''
+
+		# check for range of input values and configure RGA:
+		low,high,N = self._histogram_config(low,high,gate)
+
+		# buffer for the raw scan data. Note: after scanning, the RGA also measures the total pressure and returns this as an extra data point, giving N+1 data points in total. All N+1 data points need to be read in order to empty the data buffer.
+		nbytes = (N+1)*4
+		buf = bytearray(nbytes)
+		mv = memoryview(buf)
+		n = 0
+
+		# wait until serial port is available, then lock it for access
+		self.get_serial_lock()
+
+		try:
+			# start the scan:
+			self.ser.write('HS1\r\n'.encode('utf-8'))
+
+			# get time stamp before scan
+			t1 = misc.now_UNIX()
+
+			# read back result from RGA (in chunks, as the data arrive):
+			while n < nbytes:
+				k = min( max(self.ser.in_waiting,4) , nbytes-n ) # read all data available, or wait for the next data point
+				k = self.ser.readinto(mv[n:n+k]) # this will wait until the data are received (or the serial port times out)
+				if k == 0:
+					self.warning('RGA did not produce histogram scan result (or took too long)!')
+					self.ser.flushInput()
+					break
+				n = n + k
+
+		finally:
+			# release lock on serial port
+			mv.release()
+			self.release_serial_lock()
 
 		# get time stamp after scan
 		t2 = misc.now_UNIX()
@@ -1588,20 +2338,22 @@ class rgams_SRS:
 		# determine "mean" timestamp
 		t = (t1 + t2) / 2.0
 
-		# determine scan mz values:
-		low = float(low)
-		high = float(high)
-		M = [low + x*(high-low)/N for x in range(N)]
+		# parse result (4-byte data values, multiply by 1E-16 to convert to Amperes):
+		u = numpy.frombuffer(buf,dtype='<i4',count=min(n//4,N)) * 1E-16
+		Y = numpy.full(N,numpy.nan)
+		Y[:len(u)] = u
+		M = numpy.arange(low,low+N)
 		unit = 'A'
 
-		# discard data that are out of the desired mz range:
-		Y = [ Y[i] for i in range(len(M)) if (M[i] >= llow) & (M[i] <= hhigh) ]
-		M = [ m for m in M if (m >= llow) & (m <= hhigh) ]
+		det = self.get_detector()
 
 		# write to data file:
 		if not ( f == 'nofile' ):
-			det = self.get_detector()
-			f.write_scan('RGA_SRS',self.label(),M,Y,unit,det,gate,t)
+			f.write_histogram_scan('RGA_SRS',self.label(),low,high,Y,unit,det,gate,t)
+
+		# add data to peakbuffer
+		if add_to_peakbuffer:
+			self.peakbuffer_add(t,M,Y,det,unit,history=False) # no long-term history for every m/z value of the scan
 
 		return M,Y,unit
 
@@ -1933,7 +2685,7 @@ class rgams_SRS:
 		else:
 			x = '{:.4f}'.format(x)
 
-		self.param_IO('RI' + x,0)
+		self._state_set('RI',x,0)
 		self.log('Set RI voltage to ' + x + 'V')
 
 
@@ -1967,7 +2719,7 @@ class rgams_SRS:
 
 		x = '{:.4f}'.format(x)
 
-		self.param_IO('RS' + x,0)
+		self._state_set('RS',x,0)
 		self.log('Set RS voltage to ' + x + 'V' )
 
 
@@ -1992,7 +2744,7 @@ class rgams_SRS:
 		See also the SRS RGA manual, chapter 7, section "Peak Tuning Procedure"
 		'''
 
-		x = float(self.param_IO('RI?',1))
+		x = float(self._state_get('RI'))
 		
 		if ( x < -86.0 ) or ( x > 86.0 ) :
 			self.warning ('Could not determine current RI setting, or RI value returned was out of bounds (-86V...+86V)')
@@ -2021,7 +2773,7 @@ class rgams_SRS:
 		See also the SRS RGA manual, chapter 7, section "Peak Tuning Procedure"
 		'''
 
-		x = float(self.param_IO('RS?',1))
+		x = float(self._state_get('RS'))
 
 		if ( x < 600.0 ) or ( x > 1600.0 ) :
 			self.warning ('Could not determine current RS setting, or RS value returned was out of bounds (600V...1600V)')
@@ -2050,7 +2802,7 @@ class rgams_SRS:
 		See also the SRS RGA manual, chapter 7, section "Peak Tuning Procedure"
 		'''
 
-		x = float(self.param_IO('DI?',1))
+		x = float(self._state_get('DI'))
 
 		if ( x < 0 ) or ( x > 255 ) :
 			self.warning ('Could not determine current DI setting, or DI value returned was out of bounds (0...255)')
@@ -2079,7 +2831,7 @@ class rgams_SRS:
 		See also the SRS RGA manual, chapter 7, section "Peak Tuning Procedure"
 		'''
 
-		x = float(self.param_IO('DS?',1))
+		x = float(self._state_get('DS'))
 
 		if ( x < -2.55 ) or ( x > 2.55 ) :
 			self.warning ('Could not determine current DS setting, or DS value returned was out of bounds (-2.55...2.55)')
@@ -2116,7 +2868,7 @@ class rgams_SRS:
 
 		x = '{:.4f}'.format(x)
 
-		self.param_IO('DI' + x,0)
+		self._state_set('DI',x,0)
 		self.log('Set DI value to ' + x + ' bit units' )
 
 
@@ -2150,7 +2902,7 @@ class rgams_SRS:
 
 		x = '{:.4f}'.format(x)
 
-		self.param_IO('DS' + x,0)
+		self._state_set('DS',x,0)
 		self.log('Set DS value to ' + x + ' bit/amu' )
 
 
@@ -2159,15 +2911,15 @@ class rgams_SRS:
 
 
 
-	def plot_peakbuffer(self):
+	def plot_peakbuffer(self,window=None):
 		'''
-		rgams_SRS.plot_peakbuffer()
+		rgams_SRS.plot_peakbuffer(window=None)
 
 		Plot trend (or update plot) of values in PEAKs data buffer (e.g. after adding data)
 		NOTE: plotting may be slow, and it may therefore be a good idea to keep the update interval low to avoid affecting the duty cycle.
 
 		INPUT:
-		(none)
+		window (optional): length of the time window to be plotted (seconds). If a window is given, the long-term history of the PEAK data is plotted at the resolution that fits the window (mean values of the rollup bins for long windows, see rgams_SRS.peakbuffer_history()). Default: window = None (plot the data in the PEAKs data buffer)
 
 		OUTPUT:
 		(none)
@@ -2186,15 +2938,11 @@ class rgams_SRS:
 					self._fig.show()
 					self._figwindow_is_shown = True
 				
-				# remove all the lines that are currently in the plot:
-				self._peakbuffer_ax.cla()
-
-				# redo the plot by plotting line by line (mz by mz and detector by detector):
+				# update the plot line by line (mz by mz and detector by detector):
 				colors = ('b', 'g', 'r', 'c', 'm', 'y', 'k') # some colors for use with all 'other' mz values
 				n = 0
-				leg = []
+				keys = []
 				t0 = misc.now_UNIX()			
-				N = len(self._peakbuffer_mz)
 
 				X_MIN = None
 				X_MAX = None
@@ -2207,12 +2955,24 @@ class rgams_SRS:
 					Y_MIN = 1
 					Y_MAX = 1
 
-				for mz in numpy.unique(self._peakbuffer_mz): # loop through all mz values in the peak buffer
-					for det in [ 'F' , 'M' ]: # loop through all detectors (Faraday and Multiplier)
-						k = [ i for i in range(N) if ((self._peakbuffer_mz[i] == mz) & (self._peakbuffer_det[i] == det)) ] # index to data with current mz / detector pair
-						if len(k) > 0: # if k is not empty
+				if window is None:
+					pb_keys = self._peakbuffer.series_keys() # all mz / detector pairs in the peak buffer
+				else:
+					pb_keys = self._peakbuffer.history_keys() # all mz / detector pairs in the long-term history
+
+				for mz,det in pb_keys: # loop through all mz / detector pairs
+					if det in [ 'F' , 'M' ]: # Faraday and Multiplier data
+						if window is None:
+							pb_t,pb_intens = self._peakbuffer.series(mz,det) # data with current mz / detector pair
+						else:
+							dt,pb_t,pb_intens = self.peakbuffer_history(mz,det,window,max_points=2000)[0:3]
+							pb_t = pb_t + dt/2.0 # plot rollup means at the center of the bins
+							k = ~numpy.isnan(pb_intens)
+							pb_t = pb_t[k]
+							pb_intens = pb_intens[k]
+						if len(pb_t) > 0:
 							# col = colors[n%7]
-							intens0 = self._peakbuffer_intens[k[0]]
+							intens0 = pb_intens[0]
 							col = [c for c in self._peakbufferplot_colors if c[0] == mz]
 							if col:
 								col = col[0][1]
@@ -2225,16 +2985,18 @@ class rgams_SRS:
 							else:
 								style = 'x'
 							
-							yy = self._peakbuffer_intens[k]/intens0
-							tt = self._peakbuffer_t[k] - t0
-
-							self._peakbuffer_ax.plot( tt , yy , color=col, marker=style , linestyle='-' , linewidth=1 , markersize=10) 
+							yy = pb_intens/intens0
+							tt = pb_t - t0
 
-							val_min = self._peakbuffer_intens[k].min()
-							val_max = self._peakbuffer_intens[k].max()
+							val_min = pb_intens.min()
+							val_max = pb_intens.max()
 							min = "{:.2e}".format(val_min)
 							max = "{:.2e}".format(val_max)
-							leg.append( 'mz=' + str(int(mz)) + ' det=' + det + ': ' + min + ' ... ' + max + ' ' + self._peakbuffer_unit[k[0]] )
+							leg = 'mz=' + str(int(mz)) + ' det=' + det + ': ' + min + ' ... ' + max + ' ' + ( self._peakbuffer.series_unit(mz,det) or '' )
+
+							# update line (the line is created once, and then only its data are replaced):
+							self._peakbuffer_plot.set_data( (mz,det) , tt , yy , leg , color=col , marker=style , linestyle='-' , linewidth=1 , markersize=10 , stamp=(len(pb_t),pb_t[-1]) )
+							keys.append( (mz,det) )
 							
 							if X_MIN == None:
 								X_MIN = tt.min()
@@ -2252,42 +3014,37 @@ class rgams_SRS:
 							
 							n = n+1
 			
-				if len(self._peakbuffer_ax.lines) > 0: # if the plot is not empty
-					
-					# set legend location:
-					self._peakbuffer_ax.legend( leg , loc='best' , prop={'size':9} )
+				# remove lines of mz / detector pairs that are no longer in the peak buffer:
+				self._peakbuffer_plot.keep_only(keys)
 
+				if len(keys) > 0: # if the plot is not empty
+					
 					# set title and axis labels:
 					t0 = time.strftime("%b %d %Y %H:%M:%S", time.localtime(t0))
-					self._peakbuffer_ax.set_title('PEAKBUFFER (' + self.label() + ') at ' + t0)
-					self._peakbuffer_ax.set_xlabel('Time (s)')
-					self._peakbuffer_ax.set_ylabel('Intensity (rel.)')
+					self._peakbuffer_plot.set_title('PEAKBUFFER (' + self.label() + ') at ' + t0)
+					self._peakbuffer_plot.set_xlabel('Time (s)')
+					self._peakbuffer_plot.set_ylabel('Intensity (rel.)')
 
 					# Set x-axis scaling:
-					DX = 0.05*(X_MAX-X_MIN);
-					if DX == 0:
-						DX = 5
-					self._peakbuffer_ax.set_xlim( [ X_MIN-DX , X_MAX+DX ] )
+					if X_MAX == X_MIN:
+						X_MIN = X_MIN-5
+						X_MAX = X_MAX+5
 
 					# Set y-axis scaling:
 					if Y_MIN < self._peakbuffer_plot_min_y:
 						Y_MIN = self._peakbuffer_plot_min_y
 					if Y_MAX > self._peakbuffer_plot_max_y:
 						Y_MAX = self._peakbuffer_plot_max_y
+					if ( self._peakbufferplot_yscale == 'linear' ) and not ( Y_MIN < Y_MAX ):
+						Y_MIN = Y_MIN-0.001
+						Y_MAX = Y_MAX+0.001
 
-					if self._peakbufferplot_yscale == 'log':
-						self._peakbuffer_ax.set_ylim( [ Y_MIN , Y_MAX ] )
-
-					else:		
-						if Y_MIN < Y_MAX:
-							DY = 0.05*(Y_MAX-Y_MIN)
-						else:
-							DY = 0.001
-						self._peakbuffer_ax.set_ylim( [ Y_MIN-DY , Y_MAX+DY ] )
-
+					# change the axis limits only if the data don't fit anymore (avoids redrawing the axes with every update):
+					self._peakbuffer_plot.set_limits( xlim = [ X_MIN , X_MAX ] , hysteresis = 0.25 )
+					self._peakbuffer_plot.set_limits( ylim = [ Y_MIN , Y_MAX ] , hysteresis = 0.05 )
 
 				# Update the plot:
-				self._fig.canvas.flush_events()
+				self._peakbuffer_plot.draw()
 				
 
 			except:
@@ -2373,22 +3130,26 @@ class rgams_SRS:
 	########################################################################################################
 
 
-	def plot_scan(self,mz,intens,unit,cumsum_mz=[],cumsum_val=[]):
+	def plot_scan(self,mz,intens=None,unit='A',cumsum_mz=[],cumsum_val=[]):
 		'''
 		rgams_SRS.plot_scan(mz,intens,unit,cumsum_mz=[],cumsum_val=[])
+		M,Y = rgams_SRS.plot_scan(scan_data,None,unit)
 
 		Plot scan data
 
 		INPUT:
-		mz: mz values (x-axis)
-		intens: intensity values (y-axis)
+		mz: mz values (x-axis), or iterable of scan data chunks (e.g. mz = rgams_SRS.scan_iter(...)) if intens = None. In the latter case, the plot is updated with every chunk of data.
+		intens: intensity values (y-axis), or None if mz is an iterable of scan data chunks
 		unit: intensity unit (string)
 		cumsum_mz,cumsum_val (optional): cumulative sum of peak data (mz and sum values), as used for peak centering
 
 		OUTPUT:
-		(none)
+		M,Y: mz and intensity values collected from the scan data chunks (numpy arrays, only if intens = None)
 		'''
 
+		if intens is None:
+			return self._plot_scan_iter(mz,unit)
+
 		if not self._has_display:
 			self.warning('Plotting of scan data not possible (no display system available).')
 
@@ -2401,31 +3162,105 @@ class rgams_SRS:
 					self._fig.show()
 					self._figwindow_is_shown = True
 
-				# remove all the lines that are currently in the plot:
-				self._scan_ax.cla()
-
-				self._scan_ax.plot( mz , intens , 'k.-' )
-				if cumsum_mz:
+				# replace the data of the scan line:
+				self._scan_plot.set_data( 'scan' , mz , intens , None , 'k.-' )
+				if len(cumsum_mz) > 0:
 					# normalize cumulative sum values to intens (to match plot scales):
-					cumsum_val = cumsum_val / max(cumsum_val) * max(intens)
+					cumsum_val = numpy.asarray(cumsum_val) / max(cumsum_val) * max(intens)
 					# add cumulative sum data to plot:
-					self._scan_ax.plot( cumsum_mz , cumsum_val , 'r.-' )
+					self._scan_plot.set_data( 'cumsum' , cumsum_mz , cumsum_val , None , 'r.-' )
+				else:
+					self._scan_plot.keep_only( ['scan'] )
 
-				self._scan_ax.set_xlabel('mz')
-				self._scan_ax.set_ylabel('Intensity (' + unit +')')
+				self._scan_plot.set_xlabel('mz')
+				self._scan_plot.set_ylabel('Intensity (' + unit +')')
 				t0 = time.strftime("%b %d %Y %H:%M:%S", time.localtime(misc.now_UNIX()))
-				self._scan_ax.set_title('SCAN (' + self.label() + ')' + ' at ' + t0)
-				self._fig.tight_layout(pad=1.5)
+				self._scan_plot.set_title('SCAN (' + self.label() + ')' + ' at ' + t0)
 
 				# Set axis scaling (automatic):
-				self._scan_ax.relim()
-				self._scan_ax.autoscale_view()
+				self._scan_plot.autoscale()
 
 				# update the plot:
-				self._fig.canvas.flush_events()
+				self._scan_plot.draw(force=True)
+
+			except:
+				self.warning( 'Error during plotting of scan data (' + str(sys.exc_info()[0]) + ').' )
+
+			
+	########################################################################################################
+
+
+	def _plot_scan_iter(self,scan_data,unit):
+		'''
+		M,Y = rgams_SRS._plot_scan_iter(scan_data,unit)
+
+		Plot scan data while they arrive (see rgams_SRS.plot_scan()).
+
+		INPUT:
+		scan_data: iterable of scan data chunks (M,Y), e.g. scan_data = rgams_SRS.scan_iter(...)
+		unit: intensity unit (string)
+
+		OUTPUT:
+		M,Y: mz and intensity values collected from the scan data chunks (numpy arrays)
+		'''
+
+		# collect the data in arrays that are made bigger as needed (the size is doubled, so that the data are copied only a few times, and the data received so far are always available without concatenating all chunks):
+		MM = numpy.empty(0)
+		YY = numpy.empty(0)
+		n = 0
+		plot = None
+
+		if not self._has_display:
+			self.warning('Plotting of scan data not possible (no display system available).')
+
+		else:
+			try: # make sure data acquisition does not fail due to a silly plotting issue
+				if not self._figwindow_is_shown:
+					# show the window on screen
+					self._fig.show()
+					self._figwindow_is_shown = True
+
+				# remove all lines except the scan line, clear the scan line:
+				plot = self._scan_plot
+				plot.keep_only( ['scan'] )
+				plot.set_data( 'scan' , [] , [] , None , 'k.-' )
+				plot.set_xlabel('mz')
+				plot.set_ylabel('Intensity (' + unit +')')
+				t0 = time.strftime("%b %d %Y %H:%M:%S", time.localtime(misc.now_UNIX()))
+				plot.set_title('SCAN (' + self.label() + ')' + ' at ' + t0)
 
 			except:
 				self.warning( 'Error during plotting of scan data (' + str(sys.exc_info()[0]) + ').' )
+				plot = None
+
+		for M,Y in scan_data:
+			k = len(M)
+			if n + k > len(MM):
+				N = max( 2*len(MM) , n+k , 1024 )
+				MM = numpy.concatenate( ( MM[:n] , numpy.empty(N-n) ) )
+				YY = numpy.concatenate( ( YY[:n] , numpy.empty(N-n) ) )
+			MM[n:n+k] = M
+			YY[n:n+k] = Y
+			n = n + k
+			if plot is not None:
+				try:
+					# update the line with the data received so far (the plot is redrawn at most at the max. refresh rate of the plot, and the axis limits are only changed if the data don't fit anymore):
+					plot.set_data( 'scan' , MM[:n] , YY[:n] )
+					plot.autoscale( hysteresis = 0.25 )
+					plot.draw()
+				except:
+					self.warning( 'Error during plotting of scan data (' + str(sys.exc_info()[0]) + ').' )
+					plot = None
+
+		if plot is not None:
+			try:
+				# final update with tight axis limits:
+				plot.autoscale()
+				plot.draw(force=True)
+			except:
+				self.warning( 'Error during plotting of scan data (' + str(sys.exc_info()[0]) + ').' )
+
+		return MM[:n].copy(),YY[:n].copy()
 
 			
 	########################################################################################################
@@ -2444,6 +3279,9 @@ class rgams_SRS:
 		status: string containing status information
 		'''
 
+		# make sure the status is read from the RGA head, not from the state cache:
+		self.state_cache_clear()
+
 		status  = 'SRS RGA status:\n'
 		status += '   MS max m/z range: ' + str(self.mz_max()) + '\n'
 		status += '   Ionizer electron energy: ' + str(self.get_electron_energy()) + ' eV\n'
@@ -2601,11 +3439,18 @@ class rgams_SRS:
 	'''
 
 
-		def pz_cycle (m,g,f,typ,add_to_peakbuffer=True):
+		def pz_readings (m,g,f,typ,add_to_peakbuffer):
 			for i in range(len(m)):
 				self.peak(m[i][0],g,f,add_to_peakbuffer,peaktype=typ) # read PEAK value
 				if not m[i][1] == 0:
 					self.zero(m[i][0],m[i][1],g,f,zerotype=typ) # read ZERO value
+
+		def pz_cycle (m,g,f,typ,add_to_peakbuffer=True):
+			if f == 'nofile':
+				pz_readings (m,g,f,typ,add_to_peakbuffer)
+			else:
+				with f.batch() as b: # collect the PEAK and ZERO records of the cycle, and write them in one go (the records collected so far are also written if a reading fails)
+					pz_readings (m,g,b,typ,add_to_peakbuffer)
 			if add_to_peakbuffer:
 				self.plot_peakbuffer()
 
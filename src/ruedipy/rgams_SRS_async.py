@@ -0,0 +1,765 @@
+# Code for the asyncio front-end of the SRS RGA mass spec class
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import asyncio
+	import contextlib
+	import functools
+	import numpy
+	from .misc	import misc
+	from .rgams_SRS	import _INT32
+except ImportError as e:
+	print (e)
+	raise
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / rgams_SRS_async class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+def _set_done(fut):
+	# callback for loop.add_reader(): wake up the coroutine waiting for data
+	if not fut.done():
+		fut.set_result(None)
+
+
+class rgams_SRS_async:
+	"""
+	ruediPy class for SRS RGA-MS control from an asyncio event loop.
+
+	The rgams_SRS_async object wraps an rgams_SRS object. The data acquisition methods (peak, peak_set, zero, scan, scan_iter, histogram_scan, param_IO) are coroutines that wait for the RGA data without blocking the event loop, so that other tasks (e.g. pressure sensors or valves) can run while the RGA is busy. Validation of the input values, RGA configuration (via the state cache of the rgams_SRS object), peakbuffer and datafile output work the same as with the rgams_SRS methods.
+
+	The RGA configuration (gate time, scan range, detector status) uses the (blocking) methods of the rgams_SRS object, which are run in a worker thread (loop.run_in_executor) so that they don't block the event loop.
+
+	All other methods and attributes are those of the wrapped rgams_SRS object (e.g. rgams_SRS_async.set_detector('M') or rgams_SRS_async.plot_peakbuffer()). These are blocking calls, so don't use them while a coroutine of the same RGA is waiting for data.
+
+	Example:
+		MS  = rgams_SRS_async( rgams_SRS(serialport='/dev/ttyUSB0') )
+		val,unit = await MS.peak(28,1.2,DATAFILE)
+	"""
+
+
+	########################################################################################################
+
+
+	def __init__( self , rgams , poll_interval = 0.005 ):
+		'''
+		rgams_SRS_async.__init__( rgams , poll_interval = 0.005 )
+
+		Initialize asyncio front-end for an SRS RGA
+
+		INPUT:
+		rgams: rgams_SRS object
+		poll_interval (optional): polling interval (seconds) used to check for data from the serial port on platforms or ports that do not support waiting for data in the event loop (loop.add_reader), and to check if the serial port is locked by another thread. Default: poll_interval = 0.005
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._rgams = rgams
+		self._poll_interval = poll_interval
+		self._aio_lock = asyncio.Lock()
+
+		# file descriptor of the serial port for waiting for data in the event loop (None if not available):
+		try:
+			self._fd = rgams.ser.fileno()
+		except Exception:
+			self._fd = None
+
+
+	########################################################################################################
+
+
+	def __getattr__(self,name):
+		# use (public) methods and attributes of the rgams_SRS object for everything else:
+		if name.startswith('_'):
+			raise AttributeError(name)
+		return getattr(self._rgams,name)
+
+
+	########################################################################################################
+
+
+	def rgams(self):
+		'''
+		ms = rgams_SRS_async.rgams()
+
+		Return the rgams_SRS object used by the rgams_SRS_async object.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		ms: rgams_SRS object
+		'''
+
+		return self._rgams
+
+
+	########################################################################################################
+
+
+	@contextlib.asynccontextmanager
+	async def _serial_access(self):
+		'''
+		async with rgams_SRS_async._serial_access():
+			...
+
+		Lock the serial port for access by the calling coroutine. Coroutines using the same RGA wait for each other (asyncio lock), and the serial lock of the rgams_SRS object is polled without blocking the event loop (the port may be in use by another thread).
+		'''
+
+		async with self._aio_lock:
+			async with self._serial_lock():
+				yield
+
+
+	########################################################################################################
+
+
+	@contextlib.asynccontextmanager
+	async def _serial_lock(self):
+		'''
+		async with rgams_SRS_async._serial_lock():
+			...
+
+		Lock the serial lock of the rgams_SRS object (polled without blocking the event loop, the port may be in use by another thread). The caller must hold the asyncio lock (see rgams_SRS_async._serial_access()).
+		'''
+
+		lock = self._rgams._ser_lock
+		while not lock.acquire(blocking=False):
+			await asyncio.sleep(self._poll_interval)
+		try:
+			yield
+		finally:
+			lock.release()
+
+
+	########################################################################################################
+
+
+	async def _blocking(self,func,*args):
+		'''
+		x = await rgams_SRS_async._blocking(func,*args)
+
+		Run a blocking method of the rgams_SRS object (e.g. RGA configuration via rgams_SRS.param_IO()) in a worker thread, without blocking the event loop. The serial port must NOT be locked by the caller (the worker thread locks the port itself, see rgams_SRS.param_IO()).
+
+		INPUT:
+		func: function / method to be called
+		args: arguments of func
+
+		OUTPUT:
+		x: return value of func
+		'''
+
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(None,functools.partial(func,*args))
+
+
+	########################################################################################################
+
+
+	async def _wait_readable(self,timeout):
+		'''
+		await rgams_SRS_async._wait_readable(timeout)
+
+		Wait until data are available from the serial port (or the timeout expires).
+
+		INPUT:
+		timeout: max. wait time (seconds)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if self._fd is not None:
+			loop = asyncio.get_running_loop()
+			fut = loop.create_future()
+			try:
+				loop.add_reader(self._fd,_set_done,fut)
+			except (NotImplementedError,ValueError,OSError):
+				self._fd = None # event loop can't wait for this port, use polling instead
+			else:
+				try:
+					await asyncio.wait_for(fut,timeout)
+				except asyncio.TimeoutError:
+					pass
+				finally:
+					loop.remove_reader(self._fd)
+				return
+
+		await asyncio.sleep(min(timeout,self._poll_interval))
+
+
+	########################################################################################################
+
+
+	async def _read_some(self,mv,timeout=10):
+		'''
+		n = await rgams_SRS_async._read_some(mv,timeout=10)
+
+		Read the data available from the serial port into the buffer mv (at most len(mv) bytes). If no data are available, wait until data arrive (or the timeout expires). The serial port must be locked by the caller.
+
+		INPUT:
+		mv: buffer (writable bytes-like object, e.g. memoryview of a bytearray)
+		timeout (optional): max. wait time for data (seconds), default: timeout = 10 seconds
+
+		OUTPUT:
+		n: number of bytes read (0 if the timeout expired)
+		'''
+
+		mv = memoryview(mv)
+		ser = self._rgams.ser
+		loop = asyncio.get_running_loop()
+		deadline = loop.time() + timeout
+
+		while True:
+			k = ser.in_waiting
+			if k > 0:
+				return ser.readinto(mv[:min(k,len(mv))]) # data are available, this does not block
+			remaining = deadline - loop.time()
+			if remaining <= 0:
+				return 0
+			await self._wait_readable(remaining)
+
+
+	########################################################################################################
+
+
+	async def _read_exact(self,mv,timeout=10):
+		'''
+		n = await rgams_SRS_async._read_exact(mv,timeout=10)
+
+		Fill the buffer mv with data from the serial port. The serial port must be locked by the caller.
+
+		INPUT:
+		mv: buffer (writable bytes-like object, e.g. memoryview of a bytearray)
+		timeout (optional): max. wait time for the next data (seconds), default: timeout = 10 seconds
+
+		OUTPUT:
+		n: number of bytes read (less than len(mv) if the timeout expired)
+		'''
+
+		mv = memoryview(mv)
+		n = 0
+		while n < len(mv):
+			k = await self._read_some(mv[n:],timeout)
+			if k == 0:
+				break
+			n = n + k
+		return n
+
+
+	########################################################################################################
+
+
+	async def param_IO(self,cmd,ansreq,timeout=10):
+		'''
+		ans = await rgams_SRS_async.param_IO(cmd,ansreq,timeout=10)
+
+		Set / read parameter value of the SRS RGA (see rgams_SRS.param_IO()).
+
+		INPUT:
+		cmd: command string that is sent to RGA (see RGA manual for commands and syntax)
+		ansreq: flag indicating if answer from RGA is expected:
+			ansreq = 1: answer expected, check for answer
+			ansreq = 0: no answer expected, don't check for answer
+		timeout (optional): max. wait time for answer from RGA (seconds), default: timeout = 10 seconds
+
+		OUTPUT:
+		ans: answer / result returned from RGA
+		'''
+
+		ser = self._rgams.ser
+		ans = None
+
+		async with self._serial_access():
+
+			# set commands may change the parameter value in the RGA head:
+			self._rgams._state_invalidate(cmd)
+
+			# check if serial buffer (input) is empty (just in case, will be useful to catch errors):
+			if ser.in_waiting > 0:
+				self.warning('DEBUGGING INFO: serial buffer not empty before executing command = ' + cmd + '.')
+
+			# send command to serial port:
+			ser.write((cmd + '\r\n').encode('utf-8'))
+
+			if ansreq:
+
+				# read response (wait until the full line has arrived):
+				loop = asyncio.get_running_loop()
+				deadline = loop.time() + timeout
+				u = bytearray()
+				b = bytearray(64)
+				while not u.endswith(b'\n\r'):
+					k = await self._read_some(b,deadline-loop.time())
+					if k == 0:
+						break # give up waiting
+					u += b[:k]
+
+				if len(u) == 0:
+					self.warning('could not determine parameter value or status (no response from RGA, command: ' + cmd + ')')
+					self.warning('Execution of ' + cmd + ' did not produce a result (or took too long)!')
+					ans = -1
+				else:
+					if not u.endswith(b'\n\r'):
+						self.warning('Incomplete response from RGA (command: ' + cmd + ', response: ' + repr(bytes(u)) + ')')
+					ans = u.decode('utf-8').rstrip('\r\n') # remove newline characters at end
+
+			else: # check if serial buffer is empty (will be useful to catch errors):
+				if ser.in_waiting > 0:
+					self.warning('DEBUGGING INFO: serial buffer not empty after executing command = ' + cmd +'. First byte in buffer: ' + ser.read().decode('utf-8') )
+
+		return ans
+
+
+	########################################################################################################
+
+
+	async def _read_MR(self,mz,N,typ='PEAK'):
+		'''
+		v = await rgams_SRS_async._read_MR(mz,N,typ='PEAK')
+
+		Send N MR commands for the given m/z value and return the sum of the readings (see rgams_SRS._read_MR()). The serial port must be locked by the caller.
+
+		INPUT:
+		mz: m/z value (integer)
+		N: number of readings
+		typ (optional): type of reading ('PEAK' or 'ZERO', used for warning messages)
+
+		OUTPUT:
+		v: sum of readings (integer), or None if the RGA did not return a reading
+		'''
+
+		ms  = self._rgams
+		ser = ms.ser
+		cmd = ms._MR_command(mz)
+		buf = bytearray(4)
+		v = 0
+
+		for k in range(N):
+			ser.write(cmd) # send command to RGA
+			if await self._read_exact(buf) < 4: # wait until all 4 bytes are received
+				self.warning('RGA did not return ' + typ + ' reading for mz = ' + str(mz) + '!')
+				return None
+			if ms._conservative_timing:
+				await asyncio.sleep(0.02) # wait a bit to make sure that serial buffers are up to date
+			if ser.in_waiting > 0: # there should be no more than the 4 data bytes, which were all read out above
+				self.warning('DEBUGGING INFO: serial input buffer not empty after ' + typ + ' reading!')
+				ser.flushInput()
+			v = v + _INT32.unpack(buf)[0] # unpack 4-byte data value
+
+		return v
+
+
+	########################################################################################################
+
+
+	async def peak(self,mz,gate,f,add_to_peakbuffer=True,peaktype=None):
+		'''
+		val,unit = await rgams_SRS_async.peak(mz,gate,f,add_to_peakbuffer=True,peaktype=None)
+
+		Read out detector signal at single mass (m/z value), see rgams_SRS.peak().
+
+		INPUT:
+		mz, gate, f, add_to_peakbuffer, peaktype: see rgams_SRS.peak()
+
+		OUTPUT:
+		val: signal intensity (float)
+		unit: unit (string)
+		'''
+
+		ms = self._rgams
+
+		# check for range of input values:
+		mz = int(mz)
+
+		# get timestamp
+		t = misc.now_UNIX()
+
+		if not await self._blocking(ms._check_peak_mz,mz):
+			val = '-1'
+			unit = '(none)'
+
+		else: # proceed with measurement
+			async with self._aio_lock:
+
+				# configure RGA (gate time):
+				N,gt = ms._gate_cycles(gate)
+				await self._blocking(ms.set_gate_time,gt)
+
+				async with self._serial_lock():
+
+					# make sure serial port buffers are empty:
+					ms.ser.flushOutput()
+					ms.ser.flushInput()
+
+					# read data:
+					v = await self._read_MR(mz,N,'PEAK')
+
+			if v is None:
+				val = '-1'
+				unit = '(none)'
+			else:
+				val = v/N * 1E-16 # multiply by 1E-16 to convert to Amperes
+				unit = 'A'
+
+		det = await self._blocking(ms.get_detector)
+
+		if not ( f == 'nofile' ):
+			f.write_peak('RGA_SRS',self.label(),mz,val,unit,det,gate,t,peaktype)
+
+		# add data to peakbuffer
+		if add_to_peakbuffer:
+			ms.peakbuffer_add(t,mz,val,det,unit)
+
+		return val,unit
+
+
+	########################################################################################################
+
+
+	async def peak_set(self,mz_list,gate,f,add_to_peakbuffer=True,peaktype=None):
+		'''
+		val,t,unit = await rgams_SRS_async.peak_set(mz_list,gate,f,add_to_peakbuffer=True,peaktype=None)
+
+		Read out detector signal at a set of masses (m/z values) in one go, see rgams_SRS.peak_set().
+
+		INPUT:
+		mz_list, gate, f, add_to_peakbuffer, peaktype: see rgams_SRS.peak_set()
+
+		OUTPUT:
+		val: signal intensities (numpy array of floats, NaN for m/z values that were out of range or could not be read)
+		t: timestamps of the readings (numpy array of floats)
+		unit: unit (string)
+		'''
+
+		ms = self._rgams
+		mz = [ int(m) for m in mz_list ]
+		n = len(mz)
+		val = numpy.full(n,numpy.nan)
+		t = numpy.full(n,numpy.nan)
+		unit = 'A'
+
+		# check for range of input values:
+		ok = await self._blocking(ms._check_peak_mz_list,mz)
+
+		async with self._aio_lock:
+
+			# configure RGA (gate time):
+			N,gt = ms._gate_cycles(gate)
+			await self._blocking(ms.set_gate_time,gt)
+
+			async with self._serial_lock():
+
+				# make sure serial port buffers are empty:
+				ms.ser.flushOutput()
+				ms.ser.flushInput()
+
+				for i in range(n):
+					t[i] = misc.now_UNIX()
+					if not ok[i]:
+						continue
+					v = await self._read_MR(mz[i],N,'PEAK')
+					if v is not None:
+						val[i] = v / N * 1E-16 # multiply by 1E-16 to convert to Amperes
+
+		det = await self._blocking(ms.get_detector)
+
+		# m/z values that were out of range or could not be read are recorded as -1 without unit (same as rgams_SRS.peak()):
+		bad = numpy.isnan(val)
+		units = [ '(none)' if bad[i] else unit for i in range(n) ]
+
+		if not ( f == 'nofile' ):
+			# write all PEAK records in one go:
+			f.write_records( [ ( 'PEAK' , 'RGA_SRS' , self.label() , mz[i] , '-1' if bad[i] else val[i] , units[i] , det , gate , t[i] , peaktype ) for i in range(n) ] )
+
+		# add data to peakbuffer
+		if add_to_peakbuffer and n > 0:
+			ms.peakbuffer_add(t,numpy.array(mz),numpy.where(bad,-1.0,val),det,units)
+
+		return val,t,unit
+
+
+	########################################################################################################
+
+
+	async def zero(self,mz,mz_offset,gate,f,zerotype=None):
+		'''
+		val,unit = await rgams_SRS_async.zero(mz,mz_offset,gate,f,zerotype=None)
+
+		Read out detector signal at single mass with relative offset to given m/z value, see rgams_SRS.zero().
+
+		INPUT:
+		mz, mz_offset, gate, f, zerotype: see rgams_SRS.zero()
+
+		OUTPUT:
+		val: signal intensity (float)
+		unit: unit (string)
+		'''
+
+		ms = self._rgams
+
+		# check for range of input values:
+		mz = int(mz)
+		mz_offset = int (mz_offset)
+
+		# get timestamp
+		t = misc.now_UNIX()
+
+		if not await self._blocking(ms._check_zero_mz,mz,mz_offset):
+			val = '-1'
+			unit = '(none)'
+
+		else: # proceed with measurement
+			async with self._aio_lock:
+
+				# configure RGA (gate time):
+				N,gt = ms._gate_cycles(gate)
+				await self._blocking(ms.set_gate_time,gt)
+
+				async with self._serial_lock():
+
+					# make sure serial port buffers are empty:
+					ms.ser.flushOutput()
+					ms.ser.flushInput()
+
+					# read data:
+					v = await self._read_MR(mz+mz_offset,N,'ZERO')
+
+			if v is None:
+				val = '-1'
+				unit = '(none)'
+			else:
+				val = v/N * 1E-16 # multiply by 1E-16 to convert to Amperes
+				unit = 'A'
+
+		if not ( f == 'nofile' ):
+			det = await self._blocking(ms.get_detector)
+			f.write_zero('RGA_SRS',self.label(),mz,mz_offset,val,unit,det,gate,t,zerotype)
+
+		return val,unit
+
+
+	########################################################################################################
+
+
+	async def scan_iter(self,low,high,step,gate,P=None):
+		'''
+		async for M,Y in rgams_SRS_async.scan_iter(low,high,step,gate,P=None):
+			...
+
+		Analog scan, returning the scan data in chunks as they arrive from the RGA (asynchronous generator, see rgams_SRS.scan_iter()). The serial port is locked until the iteration is finished. If the iteration may be stopped before the end of the scan (e.g. by a break in the async for loop), use contextlib.aclosing() or call aclose() on the generator, so that the remaining scan data are discarded and the serial port is released right away (and not only when the generator is garbage collected):
+			async with contextlib.aclosing(rgams_SRS_async.scan_iter(low,high,step,gate)) as it:
+				async for M,Y in it:
+					...
+
+		INPUT:
+		low, high, step, gate: see rgams_SRS.scan()
+		P (optional): list for the total-pressure reading taken by the RGA after the scan. The value (NaN if not received from the RGA) is appended to the list at the end of the scan (asynchronous generators can't return a value like rgams_SRS.scan_iter() does).
+
+		OUTPUT (for each chunk of data):
+		M: mass values (mz, in amu, numpy array)
+		Y: signal intensity values (numpy array of floats, in A, NaN for data points that were not received from the RGA)
+		'''
+
+		ms = self._rgams
+		llow  = low
+		hhigh = high
+		p = numpy.nan
+
+		async with self._aio_lock:
+
+			# configure RGA:
+			low,high,N = await self._blocking(ms._scan_config,low,high,step,gate)
+			dm = (float(high)-float(low))/N # mz increment between scan points
+
+			async with self._serial_lock():
+
+				# buffer for the raw scan data (N data points plus total pressure, see rgams_SRS.scan_iter()):
+				nbytes = (N+1)*4
+				buf = bytearray(nbytes)
+				mv = memoryview(buf)
+				n = 0 # number of bytes received
+				i = 0 # number of data points returned
+
+				try:
+					# start the scan:
+					ms.ser.write('SC1\r\n'.encode('utf-8'))
+
+					# read back result from RGA (in chunks, as the data arrive):
+					while n < nbytes:
+						k = await self._read_some(mv[n:]) # this will wait until data are received (or the timeout expires)
+						if k == 0:
+							self.warning('RGA did not produce scan result (or took too long)!')
+							ms.ser.flushInput()
+							break
+						n = n + k
+
+						# parse new data (4-byte data values, multiply by 1E-16 to convert to Amperes):
+						j = min(n//4,N)
+						if j > i:
+							Y = numpy.frombuffer(buf,dtype='<i4',count=j-i,offset=4*i) * 1E-16
+							M = low + numpy.arange(i,j) * dm
+							i = j
+							ii = (M >= llow) & (M <= hhigh) # discard data that are out of the desired mz range
+							if ii.any():
+								yield M[ii],Y[ii]
+
+					if n == nbytes:
+						p = _INT32.unpack_from(buf,4*N)[0] * 1E-16 # total pressure
+
+					elif i < N:
+						# data points that were not received:
+						M = low + numpy.arange(i,N) * dm
+						i = N
+						ii = (M >= llow) & (M <= hhigh)
+						if ii.any():
+							yield M[ii],numpy.full(ii.sum(),numpy.nan)
+
+				except GeneratorExit:
+					# iteration stopped before the end of the scan: read and discard the remaining scan data
+					while n < nbytes:
+						k = await self._read_some(mv[n:])
+						if k == 0:
+							ms.ser.flushInput()
+							break
+						n = n + k
+					raise
+
+				finally:
+					mv.release()
+
+		if P is not None:
+			P.append(p)
+
+
+	########################################################################################################
+
+
+	async def scan(self,low,high,step,gate,f,return_totalpressure=False):
+		'''
+		M,Y,unit = await rgams_SRS_async.scan(low,high,step,gate,f,return_totalpressure=False)
+		M,Y,unit,P = await rgams_SRS_async.scan(low,high,step,gate,f,return_totalpressure=True)
+
+		Analog scan, see rgams_SRS.scan().
+
+		INPUT:
+		low, high, step, gate, f, return_totalpressure: see rgams_SRS.scan()
+
+		OUTPUT:
+		M, Y, unit, P: see rgams_SRS.scan()
+		'''
+
+		# get time stamp before scan
+		t1 = misc.now_UNIX()
+
+		# run the scan and collect the data:
+		MM = []
+		YY = []
+		PP = []
+		it = self.scan_iter(low,high,step,gate,PP)
+		try:
+			async for M,Y in it:
+				MM.append(M)
+				YY.append(Y)
+		finally:
+			await it.aclose() # release the serial port right away if the scan was interrupted (e.g. task cancelled)
+		P = PP[0] if PP else numpy.nan
+
+		# get time stamp after scan
+		t2 = misc.now_UNIX()
+
+		# determine "mean" timestamp
+		t = (t1 + t2) / 2.0
+
+		if MM:
+			M = numpy.concatenate(MM)
+			Y = numpy.concatenate(YY)
+		else:
+			M = numpy.array([])
+			Y = numpy.array([])
+		unit = 'A'
+
+		# write to data file:
+		if not ( f == 'nofile' ):
+			det = await self._blocking(self._rgams.get_detector)
+			f.write_scan('RGA_SRS',self.label(),M,Y,unit,det,gate,t)
+
+		if return_totalpressure:
+			return M,Y,unit,P
+		return M,Y,unit
+
+
+	########################################################################################################
+
+
+	async def histogram_scan(self,low,high,gate,f,add_to_peakbuffer=False):
+		'''
+		M,Y,unit = await rgams_SRS_async.histogram_scan(low,high,gate,f,add_to_peakbuffer=False)
+
+		Histogram scan, see rgams_SRS.histogram_scan().
+
+		INPUT:
+		low, high, gate, f, add_to_peakbuffer: see rgams_SRS.histogram_scan()
+
+		OUTPUT:
+		M, Y, unit: see rgams_SRS.histogram_scan()
+		'''
+
+		ms = self._rgams
+
+		async with self._aio_lock:
+
+			# check for range of input values and configure RGA:
+			low,high,N = await self._blocking(ms._histogram_config,low,high,gate)
+
+			async with self._serial_lock():
+
+				# start the scan:
+				ms.ser.write('HS1\r\n'.encode('utf-8'))
+
+				# get time stamp before scan
+				t1 = misc.now_UNIX()
+
+				# read back result from RGA (N data points plus total pressure):
+				buf = bytearray((N+1)*4)
+				n = await self._read_exact(buf)
+				if n < len(buf):
+					self.warning('RGA did not produce histogram scan result (or took too long)!')
+					ms.ser.flushInput()
+
+		# get time stamp after scan
+		t2 = misc.now_UNIX()
+
+		# determine "mean" timestamp
+		t = (t1 + t2) / 2.0
+
+		# parse result (4-byte data values, multiply by 1E-16 to convert to Amperes):
+		u = numpy.frombuffer(buf,dtype='<i4',count=min(n//4,N)) * 1E-16
+		Y = numpy.full(N,numpy.nan)
+		Y[:len(u)] = u
+		M = numpy.arange(low,low+N)
+		unit = 'A'
+
+		det = await self._blocking(ms.get_detector)
+
+		# write to data file:
+		if not ( f == 'nofile' ):
+			f.write_histogram_scan('RGA_SRS',self.label(),low,high,Y,unit,det,gate,t)
+
+		# add data to peakbuffer
+		if add_to_peakbuffer:
+			ms.peakbuffer_add(t,M,Y,det,unit,history=False) # no long-term history for every m/z value of the scan
+
+		return M,Y,unit
@@ -18,6 +18,8 @@ try:
 	import random
 	from .misc	import misc
 	from .rgams_SRS	import rgams_SRS
+	from .peakbuffer	import peakbuffer
+	from .bufferplot	import bufferplot
 except ImportError as e:
 	print (e)
 	raise
@@ -91,19 +93,15 @@ class rgams_SRS_virtual(rgams_SRS):
 		self._hasmulti = True
 		self._mzmax = 200
 		self._noisefloor = 3
+		self._state = {} # state cache of the real RGA (not used with the virtual RGA)
+		self._state_ttl = None
 		
 		# init MS settings:
 		self.set_detector('F')
 		self.filament_off()
 		
 		# peakbuffer:
-		self._peakbuffer_t = numpy.array([])
-		self._peakbuffer_mz = numpy.array([])
-		self._peakbuffer_intens = numpy.array([])
-		self._peakbuffer_det = ['x'] * 0 # empty list
-		self._peakbuffer_unit = ['x'] * 0 # empty list
-		self._peakbuffer_max_len = max_buffer_points
-		self._peakbuffer_lastupdate_timestamp = -1
+		self._peakbuffer = peakbuffer(max_buffer_points)
 
 		# y-axis range:
 		self._peakbuffer_plot_min_y = peakbuffer_plot_min
@@ -136,27 +134,28 @@ class rgams_SRS_virtual(rgams_SRS):
 			t = 'SRS RGA'
 			if self._label:
 				t = t + ' (' + self._label + ')'
-			self._fig.canvas.set_window_title(t)
+			self._fig.canvas.manager.set_window_title(t)
 
-			# set up upper panel for peak history plot:
+			# set up panels for fast plot updates (lines will be added with data later):
 			self._peakbuffer_ax = plt.subplot(2,1,1)
-			self._peakbuffer_ax.set_title('PEAKBUFFER (' + self.label() + ')',loc="center")
-			plt.xlabel('Time')
-			plt.ylabel('Intensity')
+			self._peakbuffer_plot = bufferplot(self._peakbuffer_ax)
+			self._scan_ax = plt.subplot(2,1,2)
+			self._scan_plot = bufferplot(self._scan_ax)
 
-			# add (empty) line to plot (will be updated with data later):
-			self._peakbuffer_ax.plot( [], [] )
+			# set up upper panel for peak history plot:
+			self._peakbuffer_plot.set_title('PEAKBUFFER (' + self.label() + ')')
+			self._peakbuffer_plot.set_xlabel('Time')
+			self._peakbuffer_plot.set_ylabel('Intensity')
 			self.set_peakbuffer_scale(self._peakbufferplot_yscale)
 
 			# set up lower panel for scans:
-			self._scan_ax = plt.subplot(2,1,2)
-			self._scan_ax.set_title('SCAN (' + self.label() + ')',loc="center")
-			plt.xlabel('mz')
-			plt.ylabel('Intensity')
+			self._scan_plot.set_title('SCAN (' + self.label() + ')')
+			self._scan_plot.set_xlabel('mz')
+			self._scan_plot.set_ylabel('Intensity')
 			self.set_scan_scale(self._scan_yscale)
 			
 			# get some space in between panels to avoid overlapping labels / titles
-			self._fig.tight_layout(pad=4.0)
+			self._scan_plot.tight_layout(pad=4.0)
 
 			self._figwindow_is_shown = False
 			plt.ion()		
@@ -672,7 +671,7 @@ class rgams_SRS_virtual(rgams_SRS):
 			unit = 'A'
 
 		det = self.get_detector()
-		if det == 'M':
+		if det == 'M' and unit == 'A': # no multiplier gain for skipped readings (val = '-1')
 			val = 1E4 * val
 			if val > 1.3E-7:
 				val = 1.3E-7
@@ -690,6 +689,41 @@ class rgams_SRS_virtual(rgams_SRS):
 	########################################################################################################
 	
 
+	def peak_set(self,mz_list,gate,f,add_to_peakbuffer=True,peaktype=None):
+		'''
+		val,t,unit = rgams_SRS_virtual.peak_set(mz_list,gate,f,add_to_peakbuffer=True,peaktype=None)
+
+		Read out detector signal at a set of masses (m/z values), see rgams_SRS.peak_set().
+
+		INPUT:
+		mz_list: m/z values (list or array of integers)
+		gate: gate time (seconds) used for each m/z value
+		f: file object for writing data (see datafile.py). If f = 'nofile', data is not written to any data file.
+		add_to_peakbuffer (optional): flag to choose if peak values are added to peakbuffer (default: add_to_peakbuffer=True)
+		peaktype (optional): string to indicate the "type" of the PEAK readings (default: type=None), see rgams_SRS.peak()
+
+		OUTPUT:
+		val: signal intensities (numpy array of floats, NaN for m/z values that were out of range)
+		t: timestamps of the readings (numpy array of floats)
+		unit: unit (string)
+		'''
+
+		n = len(mz_list)
+		val = numpy.full(n,numpy.nan)
+		t = numpy.full(n,numpy.nan)
+		unit = 'A'
+		for i in range(n):
+			t[i] = misc.now_UNIX()
+			v,u = self.peak(mz_list[i],gate,f,add_to_peakbuffer,peaktype)
+			if u == 'A':
+				val[i] = v
+
+		return val,t,unit
+		
+		
+	########################################################################################################
+	
+
 	def zero(self,mz,mz_offset,gate,f,zerotype=None):
 		'''
 		val,unit = rgams_SRS_virtual.zero(mz,mz_offset,gate,f,zerotype=None)
@@ -756,9 +790,10 @@ class rgams_SRS_virtual(rgams_SRS):
 	########################################################################################################
 
 
-	def scan(self,low,high,step,gate,f):
+	def scan(self,low,high,step,gate,f,return_totalpressure=False):
 		'''
-		M,Y,unit = rgams_SRS_virtual.scan(low,high,step,gate,f)
+		M,Y,unit = rgams_SRS_virtual.scan(low,high,step,gate,f,return_totalpressure=False)
+		M,Y,unit,P = rgams_SRS_virtual.scan(low,high,step,gate,f,return_totalpressure=True)
 
 		Analog scan
 
@@ -772,11 +807,13 @@ class rgams_SRS_virtual(rgams_SRS):
 		f: file object or 'nofile':
 			if f is a DATAFILE object, the scan data is written to the current data file
 			if f = 'nofile' (string), the scan data is not written to a datafile
+		return_totalpressure (optional): flag to choose if the total-pressure reading is returned as an extra value (default: return_totalpressure = False)
 
 		OUTPUT:
-		M: mass values (mz, in amu)
-		Y: signal intensity values (float)
+		M: mass values (mz, in amu, numpy array)
+		Y: signal intensity values (numpy array of floats)
 		unit: unit of Y (string)
+		P: total-pressure reading (float, same unit as Y, sum of the peak readings at all integer mz values in the scan range). Only returned if return_totalpressure = True.
 		'''
 
 		# check for range of input values:
@@ -815,7 +852,7 @@ class rgams_SRS_virtual(rgams_SRS):
 		# determine scan data:
 		low = float(low)
 		high = float(high)
-		M = [low + x*(high-low)/N for x in range(N)]
+		M = numpy.linspace(low,high,N,endpoint=False)
 		Y = []
 		for mz in M:
 			y  = self.peak(round(mz),gate/N,'nofile',add_to_peakbuffer=False)[0]
@@ -833,15 +870,99 @@ class rgams_SRS_virtual(rgams_SRS):
 		# set unit:	
 		unit = 'A'
 
+		# total pressure (only if needed, this takes an extra peak reading at each integer mz value):
+		if return_totalpressure:
+			P = sum( [ self.peak(m,gate/N,'nofile',add_to_peakbuffer=False)[0] for m in range(max(int(low),1),int(high)+1) ] )
+
 		# discard data that are out of the desired mz range:
-		Y = [ Y[i] for i in range(len(M)) if (M[i] >= llow) & (M[i] <= hhigh) ]
-		M = [ m for m in M if (m >= llow) & (m <= hhigh) ]
+		Y = numpy.array(Y)
+		k = (M >= llow) & (M <= hhigh)
+		M = M[k]
+		Y = Y[k]
 
 		# write to data file:
 		if not ( f == 'nofile' ):
 			det = self.get_detector()
 			f.write_scan('RGA_SRS',self.label(),M,Y,unit,det,gate,t)
 
+		if return_totalpressure:
+			return M,Y,unit,P
+		return M,Y,unit
+
+
+	########################################################################################################
+
+
+	def scan_iter(self,low,high,step,gate):
+		'''
+		for M,Y in rgams_SRS_virtual.scan_iter(low,high,step,gate):
+			...
+
+		Analog scan, returning the scan data in chunks (generator, see rgams_SRS.scan_iter()). The virtual RGA returns the data in chunks of one amu.
+
+		INPUT:
+		low, high, step, gate: see rgams_SRS_virtual.scan()
+
+		OUTPUT (for each chunk of data):
+		M: mass values (mz, in amu, numpy array)
+		Y: signal intensity values (numpy array of floats)
+
+		The total-pressure reading is the return value of the generator (StopIteration.value).
+		'''
+
+		M,Y,unit,P = self.scan(low,high,step,gate,'nofile',return_totalpressure=True)
+		for m in numpy.unique(numpy.floor(M)):
+			k = numpy.floor(M) == m
+			yield M[k],Y[k]
+
+		return P
+
+
+	########################################################################################################
+
+
+	def histogram_scan(self,low,high,gate,f,add_to_peakbuffer=False):
+		'''
+		M,Y,unit = rgams_SRS_virtual.histogram_scan(low,high,gate,f,add_to_peakbuffer=False)
+
+		Histogram scan: read out detector signal at all integer m/z values from low to high (see rgams_SRS.histogram_scan()).
+
+		INPUT:
+		low: low m/z value (integer)
+		high: high m/z value (integer)
+		gate: gate time (seconds) used for each m/z value
+		f: file object or 'nofile':
+			if f is a DATAFILE object, the scan data is written to the current data file (see datafile.write_histogram_scan())
+			if f = 'nofile' (string), the scan data is not written to a datafile
+		add_to_peakbuffer (optional): flag to choose if the values are added to the peakbuffer (default: add_to_peakbuffer=False)
+
+		OUTPUT:
+		M: mass values (mz, in amu, numpy array of integers)
+		Y: signal intensity values (numpy array of floats)
+		unit: unit of Y (string)
+		'''
+
+		# check for range of input values:
+		low,high = self._check_histogram_range(low,high)
+
+		# get time stamp:
+		t = misc.now_UNIX()
+
+		# determine scan data:
+		M = numpy.arange(low,high+1)
+		Y = numpy.array( [ self.peak(mz,gate,'nofile',add_to_peakbuffer=False)[0] for mz in M ] , dtype=float )
+		unit = 'A'
+
+		det = self.get_detector()
+
+		# write to data file:
+		if not ( f == 'nofile' ):
+			f.write_histogram_scan('RGA_SRS',self.label(),low,high,Y,unit,det,gate,t)
+
+		# add data to peakbuffer
+		if add_to_peakbuffer:
+			self.peakbuffer_add(t,M,Y,det,unit,history=False) # no long-term history for every m/z value of the scan
+
 		return M,Y,unit
 
 
@@ -1162,6 +1283,13 @@ class rgams_SRS_virtual(rgams_SRS):
 	
 		self.warning ('Built-in plotting of scan data not implemented...')
 
+		if len(args) == 1 or ( len(args) > 1 and args[1] is None ):
+			# consume the scan data chunks (see rgams_SRS.plot_scan()):
+			MM = [ (M,Y) for M,Y in args[0] ]
+			if MM:
+				return numpy.concatenate([ x[0] for x in MM ]),numpy.concatenate([ x[1] for x in MM ])
+			return numpy.array([]),numpy.array([])
+
 
 
 ########################################################################################################
@@ -16,6 +16,7 @@ try:
 	import time
 	from pathlib import Path
 	from .misc	import misc
+	from .serial_lock	import serial_lock
 except ImportError as e:
 	print (e)
 	raise
@@ -85,7 +86,11 @@ class selectorvalve_VICI:
 			ser.flushInput()
 
 			self.ser = ser;
-			self._ser_locked = False
+			# lock for exclusive access to the serial port (lock the device node against other processes as well if the port could not be opened in exclusive mode):
+			if parse_version(serial.__version__) >= parse_version('3.3') :
+				self._ser_lock = serial_lock(label)
+			else:
+				self._ser_lock = serial_lock(label,device=serialport)
 
 			# determine number of valve positions:
 			self.get_serial_lock()
@@ -170,12 +175,8 @@ class selectorvalve_VICI:
 		(none)
 		'''
 
-		# wait until the serial port is unlocked:
-		while self._ser_locked == True:
-			time.sleep(0.01)
-			
-		# lock the port:
-		self._ser_locked = True
+		# wait until the serial port is unlocked, then lock the port:
+		self._ser_lock.acquire()
 		
 
 	
@@ -197,7 +198,26 @@ class selectorvalve_VICI:
 		'''
 
 		# release the lock:
-		self._ser_locked = False
+		self._ser_lock.release()
+
+
+	########################################################################################################
+
+
+	def get_serial_lock_stats(self):
+		'''
+		s = selectorvalve_VICI.get_serial_lock_stats()
+
+		Return contention statistics of the serial port lock (useful to find out if other threads are blocking the port for too long).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		s: lock statistics (dictionary, see serial_lock.stats())
+		'''
+
+		return self._ser_lock.stats()
 
 
 
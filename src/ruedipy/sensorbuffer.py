@@ -0,0 +1,447 @@
+# Code for the sensorbuffer class (ring buffer for sensor readings)
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import numpy
+	from .misc	import misc
+	from .historybuffer	import historybuffer
+except ImportError as e:
+	print (e)
+	raise
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / sensorbuffer class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+class sensorbuffer:
+	"""
+	ruediPy class for buffering sensor readings (time, value, unit) in a fixed-size ring buffer (e.g. pressure or temperature readings). Adding a reading does not copy the data already in the buffer. Once the buffer is full, the oldest readings are overwritten.
+
+	Each reading is stored twice (at position i and i+N of arrays with length 2N), so that the readings in the buffer are always available as contiguous arrays in chronological order (views of the buffer memory, see sensorbuffer.data()).
+
+	The readings are also added to a long-term history with rollups (see sensorbuffer.history() and historybuffer class), which is kept if the buffer is cleared.
+	"""
+
+
+	########################################################################################################
+
+
+	def __init__( self , max_len = 500 , history = True ):
+		'''
+		sensorbuffer.__init__( max_len = 500 , history = True )
+
+		Initialize SENSORBUFFER object.
+
+		INPUT:
+		max_len (optional): max. number of readings in the buffer. Once this limit is reached, the oldest readings will be removed from the buffer. Default: max_len = 500
+		history (optional): flag to indicate if the readings are also added to a long-term history (see sensorbuffer.history()). Default: history = True
+
+		OUTPUT:
+		(none)
+		'''
+
+		N = max(int(max_len),1)
+		self._t    = numpy.zeros(2*N)
+		self._x    = numpy.zeros(2*N)
+		self._unit = numpy.zeros(2*N,dtype='u1')
+		self._N = N
+		self._i = 0 # index of the next entry to be written
+		self._n = 0 # number of readings in the buffer
+		self._lastupdate_timestamp = -1
+
+		# unit strings (codes used in the buffer are the index to this list):
+		self._unit_names = []
+
+		# long-term history of the readings:
+		if history:
+			self._history = historybuffer()
+		else:
+			self._history = None
+
+
+	########################################################################################################
+
+
+	def __len__(self):
+		return self._n
+
+
+	########################################################################################################
+
+
+	def max_len(self):
+		'''
+		N = sensorbuffer.max_len()
+
+		Return the max. number of readings in the buffer.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		N: max. number of readings (integer)
+		'''
+
+		return self._N
+
+
+	########################################################################################################
+
+
+	def _code(self,x):
+		# return code for unit string x (add x to the unit list if it is not there yet):
+		try:
+			return self._unit_names.index(x)
+		except ValueError:
+			if len(self._unit_names) > 255:
+				raise ValueError('too many different unit values in sensorbuffer')
+			self._unit_names.append(x)
+			return len(self._unit_names)-1
+
+
+	########################################################################################################
+
+
+	def add(self,t,x,unit):
+		'''
+		sensorbuffer.add(t,x,unit)
+
+		Add reading(s) to the buffer. Several readings can be added in one go by using arrays for t and x.
+
+		INPUT:
+		t: epoch time(s)
+		x: sensor value(s)
+		unit: unit of sensor value(s) (char/string)
+
+		OUTPUT:
+		(none)
+		'''
+
+		N = self._N
+		u = self._code(unit)
+
+		if self._history is not None:
+			self._history.add(t,x)
+
+		if numpy.ndim(x) == 0:
+			# single reading:
+			i = self._i
+			self._t[i] = self._t[i+N] = t
+			self._x[i] = self._x[i+N] = x
+			self._unit[i] = self._unit[i+N] = u
+			self._i = (i+1) % N
+			if self._n < N:
+				self._n = self._n + 1
+
+		else:
+			# several readings:
+			t = numpy.broadcast_to( numpy.asarray(t,dtype=float) , numpy.shape(x) )[-N:]
+			x = numpy.asarray(x,dtype=float)[-N:]
+			n = x.shape[0]
+			k = ( self._i + numpy.arange(n) ) % N
+			for a,v in ( ( self._t , t ) , ( self._x , x ) , ( self._unit , u ) ):
+				a[k] = v
+				a[k+N] = v
+			self._i = (self._i + n) % N
+			self._n = min(self._n + n,N)
+
+		self._lastupdate_timestamp = misc.now_UNIX()
+
+
+	########################################################################################################
+
+
+	def clear(self):
+		'''
+		sensorbuffer.clear()
+
+		Remove all readings from the buffer.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._i = 0
+		self._n = 0
+		self._lastupdate_timestamp = misc.now_UNIX()
+
+
+	########################################################################################################
+
+
+	def set_length(self,N):
+		'''
+		sensorbuffer.set_length(N)
+
+		Set max. number of readings in the buffer (the most recent readings are kept if the buffer is made smaller).
+
+		INPUT:
+		N: max. number of readings
+
+		OUTPUT:
+		(none)
+		'''
+
+		t,x,u = self._arrays()
+		t = t.copy()
+		x = x.copy()
+		u = u.copy()
+		N = max(int(N),1)
+		self._t    = numpy.zeros(2*N)
+		self._x    = numpy.zeros(2*N)
+		self._unit = numpy.zeros(2*N,dtype='u1')
+		self._N = N
+		n = min(len(x),N)
+		for a,v in ( ( self._t , t ) , ( self._x , x ) , ( self._unit , u ) ):
+			a[:n] = v[len(v)-n:]
+			a[N:N+n] = v[len(v)-n:]
+		self._n = n
+		self._i = n % N
+
+
+	########################################################################################################
+
+
+	def get_timestamp(self):
+		'''
+		timestamp = sensorbuffer.get_timestamp()
+
+		Get time stamp of last update to the buffer (-1 if the buffer was never updated).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		timestamp: UNIX time of last update
+		'''
+
+		return self._lastupdate_timestamp
+
+
+	########################################################################################################
+
+
+	def _arrays(self):
+		# return views of the time, value and unit-code arrays in chronological order:
+		j = self._i + self._N - self._n # index of the oldest reading
+		k = slice(j,j+self._n)
+		return self._t[k] , self._x[k] , self._unit[k]
+
+
+	########################################################################################################
+
+
+	def data(self):
+		'''
+		t,x = sensorbuffer.data()
+
+		Return the readings in the buffer in chronological order (oldest first). The arrays are views of the buffer memory, they are only valid until the next reading is added to the buffer (use sensorbuffer.snapshot() to get a copy).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		t: epoch times (numpy array)
+		x: sensor values (numpy array)
+		'''
+
+		t,x,u = self._arrays()
+		return t,x
+
+
+	########################################################################################################
+
+
+	def snapshot(self):
+		'''
+		t,x,unit = sensorbuffer.snapshot()
+
+		Return a copy of the readings in the buffer in chronological order (oldest first).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		t: epoch times (numpy array)
+		x: sensor values (numpy array)
+		unit: units of sensor values (numpy array of strings)
+		'''
+
+		t,x,u = self._arrays()
+		if len(self._unit_names) > 0:
+			unit = numpy.array(self._unit_names)[u]
+		else:
+			unit = numpy.array([],dtype=str)
+		return t.copy() , x.copy() , unit
+
+
+	########################################################################################################
+
+
+	def unit(self):
+		'''
+		u = sensorbuffer.unit()
+
+		Return the unit of the most recent reading in the buffer.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		u: unit (string, empty string if the buffer is empty)
+		'''
+
+		if self._n == 0:
+			return ''
+		return self._unit_names[ self._unit[self._i + self._N - 1] ]
+
+
+	########################################################################################################
+
+
+	def last(self):
+		'''
+		t,x,unit = sensorbuffer.last()
+
+		Return the most recent reading in the buffer.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		t: epoch time (None if the buffer is empty)
+		x: sensor value (None if the buffer is empty)
+		unit: unit of sensor value (string, empty string if the buffer is empty)
+		'''
+
+		if self._n == 0:
+			return None,None,''
+		k = self._i + self._N - 1
+		return self._t[k] , self._x[k] , self._unit_names[self._unit[k]]
+
+
+	########################################################################################################
+
+
+	def window(self,window=None):
+		'''
+		t,x = sensorbuffer.window(window=None)
+
+		Return the readings within a time window that ends with the most recent reading (views of the buffer memory, see sensorbuffer.data()).
+
+		INPUT:
+		window (optional): length of the time window (seconds). Default: window = None (all readings in the buffer)
+
+		OUTPUT:
+		t: epoch times (numpy array)
+		x: sensor values (numpy array)
+		'''
+
+		t,x = self.data()
+		if ( window is not None ) and ( len(t) > 0 ):
+			j = numpy.searchsorted( t , t[-1]-window , side='left' )
+			t = t[j:]
+			x = x[j:]
+		return t,x
+
+
+	########################################################################################################
+
+
+	def history(self):
+		'''
+		h = sensorbuffer.history()
+
+		Return the long-term history of the readings (raw data of the recent readings and rollups of older readings). The history is not affected by sensorbuffer.clear() and sensorbuffer.set_length().
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		h: historybuffer object (see historybuffer class), or None if the history is disabled
+		'''
+
+		return self._history
+
+
+	########################################################################################################
+
+
+	def _stat(self,f,window):
+		# apply statistics function f to the (non-NaN) sensor values in the time window:
+		t,x = self.window(window)
+		x = x[~numpy.isnan(x)]
+		if len(x) == 0:
+			return numpy.nan
+		return f(x)
+
+
+	########################################################################################################
+
+
+	def mean(self,window=None):
+		'''
+		m = sensorbuffer.mean(window=None)
+
+		Return the mean of the sensor values within a time window (see sensorbuffer.window()). NaN values are ignored.
+
+		INPUT:
+		window (optional): length of the time window (seconds). Default: window = None (all readings in the buffer)
+
+		OUTPUT:
+		m: mean value (NaN if there are no readings)
+		'''
+
+		return self._stat(numpy.mean,window)
+
+
+	########################################################################################################
+
+
+	def min(self,window=None):
+		'''
+		m = sensorbuffer.min(window=None)
+
+		Return the min. sensor value within a time window (see sensorbuffer.window()). NaN values are ignored.
+
+		INPUT:
+		window (optional): length of the time window (seconds). Default: window = None (all readings in the buffer)
+
+		OUTPUT:
+		m: min. value (NaN if there are no readings)
+		'''
+
+		return self._stat(numpy.min,window)
+
+
+	########################################################################################################
+
+
+	def max(self,window=None):
+		'''
+		m = sensorbuffer.max(window=None)
+
+		Return the max. sensor value within a time window (see sensorbuffer.window()). NaN values are ignored.
+
+		INPUT:
+		window (optional): length of the time window (seconds). Default: window = None (all readings in the buffer)
+
+		OUTPUT:
+		m: max. value (NaN if there are no readings)
+		'''
+
+		return self._stat(numpy.max,window)
@@ -0,0 +1,318 @@
+# Code for the serial_lock class, used for exclusive access to serial ports and similar devices
+#
+# DISCLAIMER:
+# This file is part of ruediPy, a toolbox for operation of RUEDI mass spectrometer systems.
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Copyright 2026, Matthias Brennwald (brennmat@gmail.com)
+
+try:
+	import sys
+	import warnings
+	import os
+	import time
+	import threading
+	from .misc	import misc
+except ImportError as e:
+	print (e)
+	raise
+
+try:
+	import fcntl # not available on all platforms (e.g., Windows)
+except ImportError:
+	fcntl = None
+
+# check Python version and print warning if we're running version < 3:
+if ( sys.version_info[0] < 3 ):
+	warnings.warn("ruediPy / serial_lock class is running on Python version < 3. Version 3.0 or newer is recommended!")
+
+
+class serial_lock:
+	"""
+	ruediPy class for locking of serial ports (or other devices) for exclusive access by one thread (and optionally one process) at a time. The lock is re-entrant, can be used as a context manager ("with LOCK: ..."), and keeps track of contention statistics.
+	"""
+
+
+	########################################################################################################
+
+
+	def __init__( self , label = '' , device = None ):
+		'''
+		serial_lock.__init__( label = '' , device = None )
+
+		Initialize SERIAL_LOCK object.
+
+		INPUT:
+		label (optional): label / name of the lock, e.g. the label of the object using the port (string). Default: label = ''
+		device (optional): device node of the port (e.g. device = '/dev/ttyUSB3'). If a device is given, the lock also takes an advisory lock (fcntl.flock) on the device node, so that the port is also locked against other processes using the same kind of lock. Default: device = None (lock only against other threads of the same process).
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._label  = label
+		self._lock   = threading.RLock()
+		self._owner  = None	# ident of thread holding the lock
+		self._depth  = 0	# recursion depth of the owner thread
+
+		# process-level lock on device node:
+		self._fd = None
+		if device is not None:
+			if fcntl is None:
+				self.warning('fcntl module not available, cannot lock ' + str(device) + ' against other processes.')
+			else:
+				try:
+					self._fd = os.open(device, os.O_RDONLY | os.O_NONBLOCK | getattr(os,'O_NOCTTY',0) )
+				except OSError as e:
+					self.warning('could not open ' + str(device) + ' for process-level locking: ' + str(e))
+
+		self.reset_stats()
+
+
+	########################################################################################################
+
+
+	def label(self):
+		'''
+		l = serial_lock.label()
+
+		Return label / name of the SERIAL_LOCK object.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		l: label / name (string)
+		'''
+
+		return self._label
+
+
+	########################################################################################################
+
+
+	def warning(self,msg):
+		'''
+		serial_lock.warning(msg)
+
+		Issue warning about issues related to the SERIAL_LOCK object.
+
+		INPUT:
+		msg: warning message (string)
+
+		OUTPUT:
+		(none)
+		'''
+
+		misc.warnmessage ('[' + self.label() + '] ' + msg)
+
+
+	########################################################################################################
+
+
+	def acquire(self,timeout=None,blocking=True):
+		'''
+		ok = serial_lock.acquire(timeout=None,blocking=True)
+
+		Lock the port. If the port is locked by another thread (or process), wait until it is released. The lock is re-entrant, i.e. the thread holding the lock may acquire it again (it must then release it the same number of times).
+
+		INPUT:
+		timeout (optional): max. wait time (seconds). Default: timeout = None (wait as long as it takes)
+		blocking (optional): if False, don't wait if the port is locked by another thread (or process), but return False right away (e.g. for polling the lock from an asyncio event loop). Default: blocking = True
+
+		OUTPUT:
+		ok: flag indicating if the lock was acquired (bool)
+		'''
+
+		me = threading.get_ident()
+
+		if self._owner == me:
+			# nested acquire by the thread already holding the lock
+			self._lock.acquire()
+			self._depth = self._depth + 1
+			return True
+
+		t0 = time.monotonic()
+		contended = False
+
+		# thread lock:
+		if not self._lock.acquire(blocking=False):
+			if not blocking:
+				return False
+			contended = True
+			if timeout is None:
+				self._lock.acquire()
+			elif not self._lock.acquire(timeout=timeout):
+				self._n_timeout = self._n_timeout + 1
+				return False
+
+		# process lock:
+		if self._fd is not None:
+			try:
+				fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except BlockingIOError:
+				if not blocking:
+					self._lock.release()
+					return False
+				contended = True
+				fcntl.flock(self._fd, fcntl.LOCK_EX)
+			except OSError as e:
+				self.warning('could not lock device against other processes: ' + str(e))
+
+		t1 = time.monotonic()
+
+		# update bookkeeping and statistics:
+		self._owner       = me
+		self._depth       = 1
+		self._holder      = threading.current_thread().name
+		self._t_acquired  = t1
+		w = t1-t0
+		self._n_acquire   = self._n_acquire + 1
+		self._wait_total  = self._wait_total + w
+		if contended:
+			self._n_contended = self._n_contended + 1
+		if w > self._wait_max:
+			self._wait_max = w
+
+		return True
+
+
+	########################################################################################################
+
+
+	def release(self):
+		'''
+		serial_lock.release()
+
+		Release the lock. Calling release() from a thread that does not hold the lock does nothing (for compatibility with the earlier lock flags of the ruediPy driver classes).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if not self._owner == threading.get_ident():
+			return
+
+		self._depth = self._depth - 1
+		if self._depth == 0:
+			h = time.monotonic() - self._t_acquired
+			self._hold_total = self._hold_total + h
+			if h > self._hold_max:
+				self._hold_max = h
+			self._last_holder = self._holder
+			self._holder      = None
+			self._t_acquired  = None
+			self._owner       = None
+			if self._fd is not None:
+				try:
+					fcntl.flock(self._fd, fcntl.LOCK_UN)
+				except OSError:
+					pass
+
+		self._lock.release()
+
+
+	########################################################################################################
+
+
+	def __enter__(self):
+		self.acquire()
+		return self
+
+
+	def __exit__(self,exc_type,exc_value,traceback):
+		self.release()
+		return False
+
+
+	########################################################################################################
+
+
+	def is_locked(self):
+		'''
+		x = serial_lock.is_locked()
+
+		Check if the lock is currently held (by any thread of this process).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		x: flag (bool)
+		'''
+
+		return self._owner is not None
+
+
+	########################################################################################################
+
+
+	def stats(self):
+		'''
+		s = serial_lock.stats()
+
+		Return lock contention statistics.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		s: dictionary with the following fields:
+			s['acquisitions']: number of times the lock was acquired
+			s['contended']: number of acquisitions that had to wait for another thread or process
+			s['timeouts']: number of acquisitions that gave up waiting
+			s['wait_total'], s['wait_max']: total and max. wait time (seconds)
+			s['hold_total'], s['hold_max']: total and max. hold time of completed lock periods (seconds)
+			s['holder']: name of the thread currently holding the lock (None if the lock is free)
+			s['holding_for']: time since the current holder acquired the lock (seconds, None if the lock is free)
+			s['last_holder']: name of the thread that held the lock last
+		'''
+
+		t = self._t_acquired
+		return {
+			'acquisitions': self._n_acquire,
+			'contended':    self._n_contended,
+			'timeouts':     self._n_timeout,
+			'wait_total':   self._wait_total,
+			'wait_max':     self._wait_max,
+			'hold_total':   self._hold_total,
+			'hold_max':     self._hold_max,
+			'holder':       self._holder,
+			'holding_for':  None if t is None else time.monotonic() - t,
+			'last_holder':  self._last_holder
+		}
+
+
+	########################################################################################################
+
+
+	def reset_stats(self):
+		'''
+		serial_lock.reset_stats()
+
+		Reset the lock contention statistics.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._n_acquire   = 0
+		self._n_contended = 0
+		self._n_timeout   = 0
+		self._wait_total  = 0.0
+		self._wait_max    = 0.0
+		self._hold_total  = 0.0
+		self._hold_max    = 0.0
+		if self._owner is None:
+			self._holder     = None
+			self._t_acquired = None
+		self._last_holder = None
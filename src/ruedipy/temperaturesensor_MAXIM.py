@@ -13,10 +13,12 @@
 try:
 	import sys
 	import warnings
-	import numpy
 	import os
 	import time
 	from .misc    import misc
+	from .bufferplot import bufferplot
+	from .sensorbuffer import sensorbuffer
+	from .serial_lock import serial_lock
 	from digitemp.master import UART_Adapter
 	from digitemp.device import AddressableDevice
 	from digitemp.device import DS18B20
@@ -38,9 +40,9 @@ class temperaturesensor_MAXIM:
 	########################################################################################################
 	
 	
-	def __init__( self , serialport , romcode = '', label = 'TEMPERATURESENSOR' , plot_title = None , max_buffer_points = 500 , fig_w = 6.5 , fig_h = 5 , has_plot_window = True , has_external_plot_window = None, T_unit = 'deg.C'):
+	def __init__( self , serialport , romcode = '', label = 'TEMPERATURESENSOR' , plot_title = None , max_buffer_points = 500 , fig_w = 6.5 , fig_h = 5 , has_plot_window = True , has_external_plot_window = None, T_unit = 'deg.C' , plot_server = None ):
 		'''
-		temperaturesensor_MAXIM.__init__( serialport , romcode, label = 'TEMPERATURESENSOR' , plot_title = None , max_buffer_points = 500 , fig_w = 6.5 , fig_h = 5 , has_plot_window = True , has_external_plot_window = None )
+		temperaturesensor_MAXIM.__init__( serialport , romcode, label = 'TEMPERATURESENSOR' , plot_title = None , max_buffer_points = 500 , fig_w = 6.5 , fig_h = 5 , has_plot_window = True , has_external_plot_window = None , plot_server = None )
 		
 		Initialize TEMPERATURESENSOR object (MAXIM), configure serial port / 1-wire bus for connection to DS18B20 temperature sensor chip
 		
@@ -52,6 +54,7 @@ class temperaturesensor_MAXIM:
 		max_buffer_points (optional): max. number of data points in the PEAKS buffer. Once this limit is reached, old data points will be removed from the buffer. Default value: max_buffer_points = 500
 		fig_w, fig_h (optional): width and height of figure window used to plot data (inches)
 		has_external_plot_window (optional): flag to indicate if there is a GUI system that handles the plotting of the data buffer on its own. This flag can be set explicitly to True of False, or can use None to ask for automatic 'on the fly' check if the has_external_plot_window = True or False should be used. Default: has_external_plot_window = None
+		plot_server (optional): plotserver object used to plot the data buffer in a separate process (see plotserver class). Default: plot_server = None (plot in the current process)
 		T_unit: unit of T data (default: T_unit = 'deg.C')
 		
 		OUTPUT:
@@ -78,14 +81,14 @@ class temperaturesensor_MAXIM:
 			self._plot_title = plot_title
 
 		# data buffer for temperature values:
-		self._tempbuffer_t = numpy.array([])
-		self._tempbuffer_T = numpy.array([])
-		self._tempbuffer_unit = ['x'] * 0 # empty list
-		self._tempbuffer_max_len = max_buffer_points
-		self._tempbuffer_lastupdate_timestamp = -1
+		self._tempbuffer = sensorbuffer(max_buffer_points)
 		
 		# set up plotting environment
-		if has_external_plot_window:
+		if plot_server is not None:
+			# plotting is done by the plot server process
+			self._has_external_display = False
+			self._has_display = True
+		elif has_external_plot_window:
 			# no need to set up plotting
 			self._has_external_display = True
 			self._has_display = False
@@ -115,38 +118,53 @@ class temperaturesensor_MAXIM:
 					self._sensor = DS18B20(bus, rom=romcode)
 					self._ROMcode = romcode
 				
-				self._UART_locked = False
+				# lock for exclusive access to the UART / 1-wire bus:
+				self._UART_lock = serial_lock(label)
 		
 			if self._has_display: # prepare plotting environment and figure
 
-				import matplotlib.pyplot as plt
-
-				# set up plotting environment
-				self._fig = plt.figure(figsize=(fig_w,fig_h))
 				t = 'MAXIM DS1820'
 				if self._plot_title:
 					t = t + ' (' + self._plot_title + ')'
-				self._fig.canvas.set_window_title(t)
+
+				if plot_server is not None:
+					# set up figure in the plot server process (the plot server takes care of showing the window):
+					self._tempbuffer_plot = plot_server.figure( t , 1 , fig_w , fig_h )[0]
+					self._figwindow_is_shown = True
+
+				else:
+					import matplotlib.pyplot as plt
+
+					# set up plot figure:
+					self._fig = plt.figure(figsize=(fig_w,fig_h))
+					self._fig.canvas.set_window_title(t)
+
+					# set up panel for fast plot updates:
+					self._tempbuffer_ax = plt.subplot(1,1,1)
+					self._tempbuffer_plot = bufferplot(self._tempbuffer_ax)
+
+					# enable interactive mode:
+					plt.ion()
+
+					self._figwindow_is_shown = False
 
 				# set up panel for temperature history plot:
-				self._tempbuffer_ax = plt.subplot(1,1,1)
 				t = 'TEMPBUFFER'
 				if self._plot_title:
 					t = t + ' (' + self._plot_title + ')'
-				self._tempbuffer_ax.set_title(t,loc="center")
-				self._tempbuffer_ax.set_xlabel('Time (s)')
-				self._tempbuffer_ax.set_ylabel('Temperature')
-			
+				self._tempbuffer_plot.set_title(t)
+				self._tempbuffer_plot.set_xlabel('Time (s)')
+				self._tempbuffer_plot.set_ylabel('Temperature')
+
 				# add (empty) line to plot (will be updated with data later):
-				self._tempbuffer_ax.plot( [], [] , 'ko-' , markersize = 10 )
+				self._tempbuffer_plot.line( 'T' , 'ko-' , markersize = 10 )
 
 				# get some space in between panels to avoid overlapping labels / titles
-				self._fig.tight_layout()
-			
-				# enable interactive mode:
-				plt.ion()
+				self._tempbuffer_plot.tight_layout()
 
-				self._figwindow_is_shown = False
+				if plot_server is not None:
+					# send the plot setup to the plot server process:
+					self._tempbuffer_plot.draw(force=True)
 
 
 			if hasattr(self,'_sensor'):
@@ -176,12 +194,8 @@ class temperaturesensor_MAXIM:
 		(none)
 		'''
 
-		# wait until the serial port is unlocked:
-		while self._UART_locked == True:
-			time.sleep(0.01)
-			
-		# lock the port:
-		self._UART_locked = True
+		# wait until the serial port is unlocked, then lock the port:
+		self._UART_lock.acquire()
 
 
 	########################################################################################################
@@ -201,7 +215,26 @@ class temperaturesensor_MAXIM:
 		'''
 
 		# release the lock:
-		self._UART_locked = False
+		self._UART_lock.release()
+
+
+	########################################################################################################
+
+
+	def get_UART_lock_stats(self):
+		'''
+		s = temperaturesensor_MAXIM.get_UART_lock_stats()
+
+		Return contention statistics of the UART port lock (useful to find out if other threads are blocking the port for too long).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		s: lock statistics (dictionary, see serial_lock.stats())
+		'''
+
+		return self._UART_lock.stats()
 
 	
 	########################################################################################################
@@ -315,18 +348,7 @@ class temperaturesensor_MAXIM:
 		(none)
 		"""
 				
-		self._tempbuffer_t = numpy.append( self._tempbuffer_t , t )
-		self._tempbuffer_T = numpy.append( self._tempbuffer_T , T )
-		self._tempbuffer_unit.append( unit )
-
-		N = self._tempbuffer_max_len
-		
-		if self._tempbuffer_t.shape[0] > N:
-			self._tempbuffer_t    = self._tempbuffer_t[-N:]
-			self._tempbuffer_T    = self._tempbuffer_T[-N:]
-			self._tempbuffer_unit = self._tempbuffer_unit[-N:]
-
-		self._tempbuffer_lastupdate_timestamp = misc.now_UNIX()
+		self._tempbuffer.add( t , T , unit )
 
 
 	########################################################################################################
@@ -345,21 +367,63 @@ class temperaturesensor_MAXIM:
 		timestamp: UNIX time of last update
 		"""
 
-		return self._tempbuffer_lastupdate_timestamp
+		return self._tempbuffer.get_timestamp()
 
 
 	########################################################################################################
 
 
-	def plot_tempbuffer(self):
+	def get_tempbuffer(self):
+		"""
+		buf = temperaturesensor_MAXIM.get_tempbuffer()
+
+		Return temperature data buffer (for use with external modules, e.g. to get statistics of the recent readings).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		buf: sensorbuffer object (see sensorbuffer class)
+		"""
+
+		return self._tempbuffer
+
+
+	########################################################################################################
+
+
+	def tempbuffer_history(self,window,max_points=None):
+		"""
+		dt,t,mean,min,max,count = temperaturesensor_MAXIM.tempbuffer_history(window,max_points=None)
+
+		Return the long-term history of temperature readings within a time window that ends with the most recent reading. The data are returned at the finest resolution that covers the window: raw data for short windows, otherwise rollups of e.g. 10 s, 1 min or 1 h bins (see historybuffer class). The history is kept if the temperature data buffer is cleared.
+
+		INPUT:
+		window: length of the time window (seconds)
+		max_points (optional): max. number of data points (a coarser resolution is used if necessary). Default: max_points = None (no limit)
+
+		OUTPUT:
+		dt: bin width of the rollups (seconds), or 0 for raw data
+		t: epoch times (raw data) or start times of the bins (numpy array of floats)
+		mean, min, max: mean, min. and max. of temperature values in each bin (numpy arrays of floats)
+		count: number of readings in each bin (numpy array)
+		"""
+
+		return self._tempbuffer.history().get(window,max_points)
+
+
+	########################################################################################################
+
+
+	def plot_tempbuffer(self,window=None):
 		'''
-		temperaturesensor_MAXIM.plot_tempbuffer()
+		temperaturesensor_MAXIM.plot_tempbuffer(window=None)
 
 		Plot trend (or update plot) of values in temperature data buffer (e.g. after adding data)
 		NOTE: plotting may be slow, and it may therefore be a good idea to keep the update interval low to avoid affecting the duty cycle.
 
 		INPUT:
-		(none)
+		window (optional): length of the time window to be plotted (seconds). If a window is given, the long-term history of the temperature readings is plotted at the resolution that fits the window (mean values of the rollup bins for long windows, see temperaturesensor_MAXIM.tempbuffer_history()). Default: window = None (plot the data in the temperature data buffer)
 
 		OUTPUT:
 		(none)
@@ -379,25 +443,28 @@ class temperaturesensor_MAXIM:
 
 				# Set plot data:
 				t0 = misc.now_UNIX()
-				self._tempbuffer_ax.lines[0].set_data( self._tempbuffer_t - t0 , self._tempbuffer_T )
+				if window is None:
+					t,T = self._tempbuffer.data()
+				else:
+					dt,t,T = self.tempbuffer_history(window,max_points=2000)[0:3]
+					t = t + dt/2.0 # plot rollup means at the center of the bins
+				self._tempbuffer_plot.set_data( 'T' , t - t0 , T , stamp = ( self._tempbuffer.get_timestamp() , window ) )
 
 				# Scale axes:
-				self._tempbuffer_ax.relim()
-				self._tempbuffer_ax.autoscale_view()
+				self._tempbuffer_plot.autoscale( hysteresis = 0.1 )
 				
 				# set title and axis labels:
 				t0 = time.strftime("%b %d %Y %H:%M:%S", time.localtime(t0))
 				t = 'TEMPBUFFER'
 				if self._plot_title:
 					t = t + ' (' + self._plot_title + ')'
-				self._tempbuffer_ax.set_title(t + ' at ' + t0)
+				self._tempbuffer_plot.set_title(t + ' at ' + t0)
 
 				# Get temperature units right:
-				self._tempbuffer_ax.set_ylabel('Temperature (' + str(self._tempbuffer_unit[0]) + ')' )
+				self._tempbuffer_plot.set_ylabel('Temperature (' + self._tempbuffer.unit() + ')' )
 
 				# Update the plot:
-				# self._fig.canvas.draw()
-				self._fig.canvas.flush_events()
+				self._tempbuffer_plot.draw()
 
 			except:
 				self.warning( 'Error during plotting of tempbuffer trend (' + str(sys.exc_info()[0]) + ').' )
@@ -424,10 +491,7 @@ class temperaturesensor_MAXIM:
 		if not(hasattr(self,'_sensor')):
 			self.warning( 'sensor is not initialised, could not clear data buffer.' )
 		else:
-			self._tempbuffer_t = self._tempbuffer_t[[]]
-			self._tempbuffer_T = self._tempbuffer_T[[]]
-			self._tempbuffer_unit = ['x'] * 0 # empty list
-			self._tempbuffer_lastupdate_timestamp = misc.now_UNIX()
+			self._tempbuffer.clear()
 
 
 
@@ -0,0 +1,103 @@
+import os
+
+import numpy
+import pytest
+
+from ruedipy.datafile import datafile
+from ruedipy.datafile_index import datafile_index
+from ruedipy.datafile_reader import datafile_reader
+
+
+T0 = 1.7e9
+
+
+def write_file(path, compression=None):
+    # write a data file with sidecar index, return file name
+    f = datafile(str(path), compression=compression, index=True)
+    f.next('STANDARD', standardconc=[('N2', 0.781, 28), ('Ar-40', 0.9303, 40)])
+    f.write_comment('TEST', 'non-ASCII comment: grüezi')
+    for i in range(500):
+        t = T0 + i
+        f.write_peak('RGA_SRS', 'MS', 40, 1e-9 * i, 'A', 'F', 0.5, t)
+        f.write_peak('RGA_SRS', 'MS', 28, 2e-9 * i, 'A', 'F', 0.5, t, peaktype='deconv')
+        f.write_zero('RGA_SRS', 'MS', 40, -1, 1e-12, 'A', 'F', 0.5, t)
+        f.write_pressure('PRESSURESENSOR_WIKA', 'TOTALPRESSURE', 1000.0 + i, 'hPa', t)
+        f.write_temperature('TEMPERATURESENSOR_MAXIM', 'INLET', 20.5, 'deg C', t - 3 if i % 10 == 0 else t)  # time stamps not in order
+        if i % 100 == 0:
+            f.write_scan('RGA_SRS', 'MS', [1.0, 2.0, 3.5], [1e-9, 2e-9, 3e-9 * i], 'A', 'F', 0.5, t)
+    f.close()
+    return f.name()
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_index_equals_built_index(tmp_path, compression):
+    name = write_file(tmp_path, compression)
+    I = numpy.array(datafile_index.load(datafile_index.index_name(name)))
+
+    os.rename(datafile_index.index_name(name), name + '.bak')
+    B = datafile_reader(name).index()
+
+    assert len(I) == len(B)
+    for n in datafile_index.dtype.names:
+        assert numpy.array_equal(I[n], B[n]), n
+    assert set(I['code']) >= {datafile_index.codes[k] for k in ('PEAK', 'PEAK_xyz', 'ZERO', 'SCAN', 'PRESSURE', 'TEMPERATURE', 'STANDARD', 'COMMENT', 'ANALYSISTYPE')}
+
+
+def test_save_and_load(tmp_path):
+    name = write_file(tmp_path)
+    I = numpy.array(datafile_index.load(datafile_index.index_name(name)))
+    os.remove(datafile_index.index_name(name))
+
+    B = datafile_reader(name).index(save=True)
+    assert os.path.isfile(datafile_index.index_name(name))
+    assert numpy.array_equal(numpy.array(datafile_index.load(datafile_index.index_name(name))), I)
+    assert numpy.array_equal(B, I)
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+@pytest.mark.parametrize('window', [(T0 + 200, T0 + 300.5), (None, T0 + 10), (T0 + 495, None), (T0 + 1000, None)])
+def test_windowed_read(tmp_path, compression, window):
+    name = write_file(tmp_path, compression)
+    t_min, t_max = window
+
+    os.rename(datafile_index.index_name(name), name + '.bak')
+    full = datafile_reader(name).read()
+    os.rename(name + '.bak', datafile_index.index_name(name))
+
+    for types in (None, 'TEMPERATURE', ['PEAK', 'SCAN']):
+        D = datafile_reader(name).read(types, t_min=t_min, t_max=t_max)
+        for k in D:
+            if k == 'SCAN.values':
+                continue
+            F = full[k]
+            u = numpy.ones(len(F), dtype=bool)
+            if t_min is not None:
+                u &= F['t'] >= t_min
+            if t_max is not None:
+                u &= F['t'] <= t_max
+            F = F[u]
+            assert len(D[k]) == len(F), (k, types)
+            for n in F.dtype.names:
+                if n != 'first':
+                    assert numpy.array_equal(D[k][n], F[n], equal_nan=F[n].dtype.kind == 'f'), (k, n)
+
+        if 'SCAN' in D:
+            S = D['SCAN']
+            V = D['SCAN.values']
+            assert numpy.array_equal(S['first'], numpy.cumsum(S['n']) - S['n'])
+            for i in range(len(S)):
+                assert V['intensity'][S['first'][i] + 2] == 3e-9 * (S['t'][i] - T0)
+
+
+def test_index_tail(tmp_path):
+    # lines appended to the data file after the index was written are indexed by scanning the file
+    name = write_file(tmp_path)
+    I = numpy.array(datafile_index.load(datafile_index.index_name(name)))
+    with open(name, 'a') as fid:
+        fid.write('%.3f PRESSURESENSOR_WIKA[TOTALPRESSURE] PRESSURE: 1.5 hPa\n' % (T0 + 600))
+    R = datafile_reader(name)
+    B = R.index()
+    assert len(B) == len(I) + 1
+    assert B['code'][-1] == datafile_index.codes['PRESSURE'] and B['t'][-1] == T0 + 600
+    D = R.read('PRESSURE', t_min=T0 + 550)
+    assert numpy.array_equal(D['PRESSURE']['value'], [1.5])
@@ -0,0 +1,137 @@
+import numpy
+import pytest
+
+from ruedipy.datafile import datafile
+from ruedipy.datafile_reader import datafile_reader
+
+
+T0 = 1.7e9
+
+# intensity values that are exact with the 6-digit precision of the 'text' scan format:
+SCAN_Y = numpy.array([1.25e-10, 2.5e-10, 0.0, 3.75e-12, 5.0e-9])
+
+
+def write_file(path, compression=None, scan_format='list', **kwargs):
+    # write a data file with records of every type, return file name
+    f = datafile(str(path), scan_format=scan_format, compression=compression, **kwargs)
+    f.next('STANDARD', standardconc=[('N2', 0.781, 28), ('Ar-40', 0.9303, 40)])
+    for i in range(20):
+        t = T0 + i
+        f.write_peak('RGA_SRS', 'MS', 40, 1e-9 * i, 'A', 'F', 0.5, t)
+        f.write_peak('RGA_SRS', 'MS', 28, 2e-9 * i, 'A', 'M', 0.1, t, peaktype='deconv')
+        f.write_zero('RGA_SRS', 'MS', 40, -1, 1e-12 * i, 'A', 'F', 0.5, t)
+        f.write_zero('RGA_SRS', 'MS', 28, 1, 3e-12 * i, 'A', 'M', 0.1, t, zerotype='deconv')
+        f.write_pressure('PRESSURESENSOR_WIKA', 'TOTALPRESSURE', 1000.0 + i, 'hPa', t)
+        f.write_temperature('TEMPERATURESENSOR_MAXIM', 'INLET', 20.5 + i, 'deg C', t)
+        f.write_valve_pos('SELECTORVALVE_VICI', 'INLETSELECTOR', i % 8, t)
+    f.write_scan('RGA_SRS', 'MS', numpy.arange(10.0, 15.0), SCAN_Y, 'A', 'f', 0.5, T0 + 30)
+    f.write_scan('RGA_SRS', 'MS', [1.0, 2.0, 3.5], SCAN_Y[:3], 'A', 'm', 0.5, T0 + 31)  # not evenly spaced: SCAN record (detector is normalised to upper case)
+    f.write_ms_deconv('RGA_SRS', 'MS', 28, 'N2', 'F', 25, (('CH4', 13, 0.12), ('N2', 14, 0.13)), T0 + 32)
+    f.close()
+    return f.name()
+
+
+def check_records(D, scan_format='list'):
+    t = T0 + numpy.arange(20)
+
+    P = D['PEAK']
+    assert len(P) == 40
+    assert numpy.array_equal(P['t'][0::2], t)
+    assert numpy.array_equal(P['mz'][0::2], numpy.full(20, 40.0))
+    assert numpy.allclose(P['intensity'][0::2], 1e-9 * numpy.arange(20), rtol=1e-12, atol=0)
+    assert set(P['type'][0::2]) == {''}
+    assert set(P['type'][1::2]) == {'DECONV'}
+    assert set(P['detector'][0::2]) == {'F'}
+    assert set(P['detector'][1::2]) == {'M'}
+    assert numpy.array_equal(P['gate'][1::2], numpy.full(20, 0.1))
+    assert set(P['caller']) == {'RGA_SRS'}
+    assert set(P['label']) == {'MS'}
+    assert set(P['unit']) == {'A'}
+
+    Z = D['ZERO']
+    assert len(Z) == 40
+    assert numpy.array_equal(Z['t'][1::2], t)
+    assert numpy.array_equal(Z['mz_offset'][0::2], numpy.full(20, -1.0))
+    assert numpy.array_equal(Z['mz_offset'][1::2], numpy.full(20, 1.0))
+    assert numpy.allclose(Z['intensity'][1::2], 3e-12 * numpy.arange(20), rtol=1e-12, atol=0)
+    assert set(Z['type'][1::2]) == {'DECONV'}
+
+    assert numpy.array_equal(D['PRESSURE']['value'], 1000.0 + numpy.arange(20))
+    assert set(D['PRESSURE']['unit']) == {'hPa'}
+    assert set(D['PRESSURE']['label']) == {'TOTALPRESSURE'}
+    assert numpy.array_equal(D['TEMPERATURE']['value'], 20.5 + numpy.arange(20))
+    assert set(D['TEMPERATURE']['unit']) == {'deg C'}
+    assert numpy.array_equal(D['POSITION']['position'], numpy.arange(20) % 8)
+    assert numpy.array_equal(D['POSITION']['t'], t)
+
+    S = D['STANDARD']
+    assert list(S['species']) == ['N2', 'Ar-40']
+    assert numpy.array_equal(S['concentration'], [0.781, 0.9303])
+    assert numpy.array_equal(S['mz'], [28, 40])
+
+    X = D['DECONVOLUTION']
+    assert len(X) == 1
+    assert X['target_mz'][0] == 28 and X['target_species'][0] == 'N2' and X['MS_EE'][0] == 25
+
+    S = D['SCAN']
+    V = D['SCAN.values']
+    assert numpy.array_equal(S['t'], [T0 + 30, T0 + 31])
+    assert numpy.array_equal(S['n'], [5, 3])
+    assert list(S['detector']) == ['F', 'M']
+    v = V[S['first'][0]:S['first'][0] + S['n'][0]]
+    assert numpy.allclose(v['mz'], numpy.arange(10.0, 15.0), rtol=1e-12, atol=0)
+    rtol = 1e-7 if scan_format == 'base64' else 1e-12  # base64: float32 values
+    assert numpy.allclose(v['intensity'], SCAN_Y, rtol=rtol, atol=0)
+    v = V[S['first'][1]:S['first'][1] + S['n'][1]]
+    assert numpy.array_equal(v['mz'], [1.0, 2.0, 3.5])
+    assert numpy.allclose(v['intensity'], SCAN_Y[:3], rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip', 'lzma'])
+@pytest.mark.parametrize('scan_format', ['list', 'text', 'base64'])
+def test_round_trip(tmp_path, compression, scan_format):
+    name = write_file(tmp_path, compression, scan_format)
+    D = datafile_reader(name).read()
+    check_records(D, scan_format)
+
+    if scan_format != 'list':
+        R = datafile_reader(name)
+        raw = b''.join(c for p, c in R._raw_chunks())
+        assert b' SCAN_COMPACT: ' in raw
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip', 'lzma'])
+def test_small_chunks(tmp_path, compression):
+    name = write_file(tmp_path, compression, 'text')
+    D = datafile_reader(name).read()
+    D2 = datafile_reader(name, chunk_size=97).read()
+    assert sorted(D) == sorted(D2)
+    for k in D:
+        assert D[k].dtype == D2[k].dtype
+        for n in D[k].dtype.names:
+            assert numpy.array_equal(D[k][n], D2[k][n], equal_nan=D[k][n].dtype.kind == 'f'), (k, n)
+
+
+def test_select_types(tmp_path):
+    name = write_file(tmp_path)
+    D = datafile_reader(name).read(['PEAK', 'PRESSURE'])
+    assert sorted(D) == ['PEAK', 'PRESSURE']
+    assert len(D['PEAK']) == 40 and len(D['PRESSURE']) == 20
+
+
+def test_truncated_last_line(tmp_path):
+    name = write_file(tmp_path)
+    with open(name, 'ab') as fid:
+        fid.write(b'%.3f PRESSURESENSOR_WIKA[TOTALPRESSURE] PRESSURE: 99' % (T0 + 50))  # no line break: line is still being written
+    for chunk_size in (97, 16 * 1024 * 1024):
+        D = datafile_reader(name, chunk_size=chunk_size).read()
+        assert len(D['PRESSURE']) == 20
+        check_records(D)
+
+
+def test_chunks(tmp_path):
+    name = write_file(tmp_path)
+    n = 0
+    for D in datafile_reader(name, chunk_size=200).chunks('PRESSURE'):
+        n = n + len(D['PRESSURE'])
+    assert n == 20
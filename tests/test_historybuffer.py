@@ -0,0 +1,135 @@
+import numpy
+
+from ruedipy.historybuffer import historybuffer
+from ruedipy.peakbuffer import peakbuffer
+
+
+def bins(t, x, dt):
+    # reference rollup: bin start, mean, min, max and count of the non-NaN values
+    k = ~numpy.isnan(x)
+    t = t[k]
+    x = x[k]
+    b = t - t % dt
+    u = numpy.unique(b)
+    return (u,
+            numpy.array([x[b == v].mean() for v in u]),
+            numpy.array([x[b == v].min() for v in u]),
+            numpy.array([x[b == v].max() for v in u]),
+            numpy.array([(b == v).sum() for v in u]))
+
+
+def check_rollup(H, t, x, dt, n=None):
+    T, mean, mn, mx, c = H.rollup(dt)
+    R = bins(t, x, dt)
+    if n is not None:
+        R = [r[-n:] for r in R]
+    assert numpy.array_equal(T, R[0])
+    assert numpy.allclose(mean, R[1], rtol=1e-12, atol=0)
+    assert numpy.array_equal(mn, R[2])
+    assert numpy.array_equal(mx, R[3])
+    assert numpy.array_equal(c, R[4])
+
+
+def random_series(n, seed=0):
+    rng = numpy.random.default_rng(seed)
+    t = 1.7e9 + numpy.cumsum(rng.exponential(3.0, n))
+    x = rng.normal(size=n)
+    x[rng.random(n) < 0.05] = numpy.nan
+    return t, x
+
+
+def test_rollups_single_and_bulk():
+    t, x = random_series(3000)
+    levels = ((10, 100000), (60, 100000), (3600, 1000))
+    H1 = historybuffer(levels=levels)
+    H2 = historybuffer(levels=levels)
+    for i in range(len(t)):
+        H1.add(t[i], x[i])
+    j = 0
+    for n in (1, 7, 500, 2, 1200, 1290):
+        H2.add(t[j:j + n], x[j:j + n])
+        j = j + n
+    assert j == len(t)
+    for H in (H1, H2):
+        assert H.levels() == [10.0, 60.0, 3600.0]
+        for dt in H.levels():
+            check_rollup(H, t, x, dt)
+
+
+def test_rollup_ring_wraps():
+    # only the most recent bins are kept (ring grows on demand, then wraps around)
+    t, x = random_series(5000, seed=1)
+    H = historybuffer(levels=((10, 150), (60, 70)))
+    for k in range(0, len(t), 333):
+        H.add(t[k:k + 333], x[k:k + 333])
+    check_rollup(H, t, x, 10, 150)
+    check_rollup(H, t, x, 60, 70)
+
+    T, mean, mn, mx, c = H.rollup(60, window=600)
+    assert T[-1] - T[0] <= 600 and T[-1] == bins(t, x, 60)[0][-1]
+
+
+def test_out_of_order():
+    H = historybuffer(levels=((10, 5),))
+    for t, x in ((100.0, 1.0), (112.0, 2.0), (125.0, 3.0), (105.0, 5.0), (15.0, 7.0)):
+        H.add(t, x)
+    T, mean, mn, mx, c = H.rollup(10)
+    assert numpy.array_equal(T, [100.0, 110.0, 120.0])
+    assert numpy.array_equal(c, [2, 1, 1])  # 105 is added to the existing bin, 15 is discarded (no bin is inserted before the existing bins)
+    assert numpy.array_equal(mx, [5.0, 2.0, 3.0])
+    t, x = H.raw()
+    assert len(t) == 5  # raw data keep all points
+
+
+def test_raw_window_and_len():
+    H = historybuffer(raw_window=100, raw_len=50)
+    H.add(numpy.arange(0.0, 80.0), numpy.arange(80.0))
+    t, x = H.raw()
+    assert numpy.array_equal(t, numpy.arange(30.0, 80.0))  # raw_len
+    t, x = H.raw(10)
+    assert numpy.array_equal(t, numpy.arange(69.0, 80.0))
+    assert numpy.array_equal(x, t)
+    H.add(500.0, 1.0)
+    t, x = H.raw()
+    assert numpy.array_equal(t, [500.0])  # raw_window
+
+
+def test_resolution():
+    H = historybuffer(raw_window=600, raw_len=6000, levels=((10, 2160), (60, 4320), (3600, 2160)))
+    t = numpy.arange(0.0, 86400.0, 2.0)
+    H.add(t, numpy.ones(len(t)))
+    assert H.resolution(300) == 0
+    assert H.resolution(300, max_points=100) == 10
+    assert H.resolution(3600) == 10
+    assert H.resolution(86400) == 60
+    assert H.resolution(86400, max_points=1000) == 3600
+    dt, T, mean, mn, mx, c = H.get(60)
+    assert dt == 0 and len(T) == 31 and numpy.array_equal(c, numpy.ones(31))
+    dt, T, mean, mn, mx, c = H.get(7200)
+    assert dt == 10 and numpy.array_equal(c, numpy.full(len(T), 5.0))
+
+
+def test_ring_memory_on_demand():
+    H = historybuffer(raw_len=6000, levels=((10, 2160),))
+    H.add(1.0, 1.0)
+    assert H._raw.N < 6000 and H._levels[0].N < 2160
+    H.add(numpy.arange(2.0, 3000.0), numpy.ones(2998))
+    assert H._raw.N >= 2999
+    t, x = H.raw(10000)
+    assert numpy.array_equal(t, numpy.arange(1.0, 3000.0)[-len(t):])
+
+
+def test_peakbuffer_history():
+    B = peakbuffer(max_len=10, max_history=2)
+    for i in range(20):
+        B.add(float(i), 28.0, 1.0, 'F', 'A')
+        B.add(float(i), 40.0, 2.0, 'F', 'A')
+        B.add(float(i), 44.0, 3.0, 'F', 'A')  # third series: no history
+    B.add(30.0, numpy.arange(1.0, 100.0), numpy.ones(99), 'F', 'A', history=False)  # bulk (scan): no history
+    assert B.history_keys() == [(28.0, 'F'), (40.0, 'F')]
+    assert B.history(44, 'F') is None
+    assert B.history(28, 'F').levels() == [10.0, 60.0, 3600.0]
+    t, x = B.history(40, 'F').raw()
+    assert numpy.array_equal(t, numpy.arange(20.0)) and numpy.array_equal(x, numpy.full(20, 2.0))
+    B.clear()
+    assert len(B.history(28, 'F').raw()[0]) == 20
@@ -0,0 +1,110 @@
+import numpy
+
+from ruedipy.peakbuffer import peakbuffer
+
+
+def reference(readings, N):
+    # readings kept in a buffer of length N (most recent N readings)
+    return readings[-N:] if N > 0 else []
+
+
+def check(B, readings):
+    t, mz, intens, det, unit = B.get()
+    assert len(B) == len(readings)
+    assert numpy.array_equal(t, [r[0] for r in readings])
+    assert numpy.array_equal(mz, [r[1] for r in readings])
+    assert numpy.array_equal(intens, [r[2] for r in readings])
+    assert list(det) == [r[3] for r in readings]
+    assert list(unit) == [r[4] for r in readings]
+
+    keys = sorted(set((r[1], r[3]) for r in readings))
+    assert B.series_keys() == keys
+    for m, d in keys:
+        u = [r for r in readings if r[1] == m and r[3] == d]
+        ts, ys = B.series(m, d)
+        assert numpy.array_equal(ts, [r[0] for r in u])
+        assert numpy.array_equal(ys, [r[2] for r in u])
+        assert B.series_unit(m, d) == u[0][4]
+
+
+def test_single_readings_eviction():
+    B = peakbuffer(max_len=5, history=False)
+    readings = []
+    for i in range(23):
+        r = (float(i), float(28 + i % 3), 1e-9 * i, 'F' if i % 4 else 'M', 'A')
+        B.add(*r)
+        readings.append(r)
+        check(B, reference(readings, 5))
+    assert B.max_len() == 5
+
+
+def test_bulk_wrap():
+    B = peakbuffer(max_len=7, history=False)
+    readings = []
+    rng = numpy.random.default_rng(1)
+    t = 0.0
+    for k in range(40):
+        n = int(rng.integers(0, 12))  # sometimes more than max_len
+        mz = rng.integers(1, 5, n).astype(float)
+        y = rng.random(n)
+        tt = t + numpy.arange(n)
+        t = t + n
+        if k % 3 == 0:
+            B.add(tt, mz, y, 'M', 'A')
+            readings.extend(zip(tt.tolist(), mz.tolist(), y.tolist(), ['M'] * n, ['A'] * n))
+        else:
+            det = ['F' if x else 'M' for x in rng.random(n) > 0.5]
+            B.add(tt, mz, y, det, ['A'] * n)
+            readings.extend(zip(tt.tolist(), mz.tolist(), y.tolist(), det, ['A'] * n))
+        if k % 5 == 0:
+            B.add(t, 4.0, 0.5, 'F', 'V')  # single reading between bulk readings
+            readings.append((t, 4.0, 0.5, 'F', 'V'))
+            t = t + 1
+        check(B, reference(readings, 7))
+
+
+def test_set_length():
+    B = peakbuffer(max_len=10, history=False)
+    readings = []
+    for i in range(15):
+        r = (float(i), float(i % 2), float(i), 'F', 'A')
+        B.add(*r)
+        readings.append(r)
+    for N in (4, 12, 1, 6):
+        B.set_length(N)
+        readings = reference(readings, N)
+        assert B.max_len() == N
+        check(B, readings)
+        for i in range(3):
+            r = (100.0 + len(readings) + i, float(i % 2), float(i), 'F', 'A')
+            B.add(*r)
+            readings.append(r)
+        readings = reference(readings, N)
+        check(B, readings)
+    B.set_length(0)
+    check(B, [])
+
+
+def test_clear():
+    B = peakbuffer(max_len=4, history=False)
+    B.add(numpy.arange(6.0), numpy.full(6, 28.0), numpy.arange(6.0), 'F', 'A')
+    B.clear()
+    check(B, [])
+    B.add(10.0, 40.0, 1.0, 'M', 'A')
+    check(B, [(10.0, 40.0, 1.0, 'M', 'A')])
+
+
+def test_series_lookup():
+    B = peakbuffer(max_len=100, history=False)
+    for i in range(30):
+        B.add(float(i), 28.0 if i % 2 else 40.0, float(i), 'F', 'A')
+    t, y = B.series(28, 'F', t_from=5, t_to=11)
+    assert numpy.array_equal(t, [5.0, 7.0, 9.0, 11.0])
+    t, y = B.series(28.0, 'F', t_from=5.5)
+    assert t[0] == 7.0 and t[-1] == 29.0
+    t, y = B.series(40, 'F', t_to=-1)
+    assert len(t) == 0
+    for m, d in ((28, 'M'), (44, 'F'), (28, 'X')):
+        t, y = B.series(m, d)
+        assert len(t) == 0 and len(y) == 0
+        assert B.series_unit(m, d) is None
@@ -0,0 +1,73 @@
+import matplotlib
+import numpy
+import pytest
+
+from ruedipy.misc import misc
+from ruedipy.rgams_SRS_virtual import rgams_SRS_virtual
+
+
+@pytest.fixture
+def agg(monkeypatch):
+    # plot to the non-interactive Agg backend instead of a display window
+    matplotlib.use('Agg')
+    monkeypatch.setattr(misc, 'plotting_setup', staticmethod(lambda: True))
+    yield
+    import matplotlib.pyplot as plt
+    plt.close('all')
+    plt.ioff()
+
+
+def test_init_with_plot_window(agg):
+    MS = rgams_SRS_virtual(label='MS', peakbuffer_plot_yscale='log')
+    assert MS._has_display
+    assert MS._peakbuffer_plot._ax is MS._peakbuffer_ax
+    assert MS._peakbuffer_ax.get_yscale() == 'log'
+    assert MS._scan_ax.get_yscale() == 'linear'
+    MS.set_peakbuffer_scale('linear')
+    MS.set_scan_scale('log')
+    assert MS._peakbuffer_ax.get_yscale() == 'linear'
+    assert MS._scan_ax.get_yscale() == 'log'
+
+
+def test_init_without_plot_window():
+    MS = rgams_SRS_virtual(has_external_plot_window=True)
+    assert not MS._has_display
+    MS.set_peakbuffer_scale('log')
+    MS.set_scan_scale('log')
+
+
+def test_scan_totalpressure(monkeypatch):
+    MS = rgams_SRS_virtual(has_external_plot_window=True)
+    n = []
+    peak = MS.peak
+    monkeypatch.setattr(MS, 'peak', lambda mz, *args, **kwargs: n.append(mz) or peak(mz, *args, **kwargs))
+    M, Y, unit = MS.scan(10, 12, 10, 0.01, 'nofile')
+    assert len(M) == 20 and len(n) == 2 * 20  # no total-pressure readings
+    n.clear()
+    M, Y, unit, P = MS.scan(10, 12, 10, 0.01, 'nofile', return_totalpressure=True)
+    assert len(n) == 2 * 20 + 3 and P > 0
+
+
+def test_histogram_scan_range():
+    MS = rgams_SRS_virtual(has_external_plot_window=True)
+    M, Y, unit = MS.histogram_scan(MS.mz_max() + 0.4, MS.mz_max() - 2.6, 0.02, 'nofile')  # swapped, rounded
+    assert list(M) == [MS.mz_max() - 3, MS.mz_max() - 2, MS.mz_max() - 1, MS.mz_max()]
+    M, Y, unit = MS.histogram_scan(-5, 2, 0.02, 'nofile')
+    assert list(M) == [1, 2] and len(Y) == 2
+
+
+@pytest.mark.parametrize('det', ['F', 'M'])
+def test_peak_set_out_of_range(tmp_path, det):
+    from ruedipy.datafile import datafile
+    from ruedipy.datafile_reader import datafile_reader
+    MS = rgams_SRS_virtual(has_external_plot_window=True)
+    MS.set_detector(det)
+    f = datafile(str(tmp_path))
+    f.next()
+    val, t, unit = MS.peak_set([28, 0, MS.mz_max() + 1, 40], 0.05, f)
+    f.close()
+    assert numpy.isnan(val[1]) and numpy.isnan(val[2]) and val[0] > 0 and val[3] > 0
+    P = datafile_reader(f.name()).read('PEAK')['PEAK']
+    assert list(P['mz']) == [28, 0, MS.mz_max() + 1, 40]
+    assert list(P['intensity'][1:3]) == [-1, -1]  # rejected masses are recorded like rgams_SRS.peak()
+    assert list(P['unit']) == ['A', '(none)', '(none)', 'A']
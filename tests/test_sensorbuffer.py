@@ -0,0 +1,80 @@
+import numpy
+
+from ruedipy.sensorbuffer import sensorbuffer
+
+
+def test_ring_eviction():
+    B = sensorbuffer(max_len=6, history=False)
+    t = []
+    x = []
+    for i in range(20):
+        B.add(float(i), 10.0 + i, 'hPa')
+        t.append(float(i))
+        x.append(10.0 + i)
+        tt, xx = B.data()
+        assert numpy.array_equal(tt, t[-6:])
+        assert numpy.array_equal(xx, x[-6:])
+        assert len(B) == min(i + 1, 6)
+    assert B.last() == (19.0, 29.0, 'hPa')
+    assert B.unit() == 'hPa'
+
+
+def test_bulk_add_and_units():
+    B = sensorbuffer(max_len=5, history=False)
+    B.add(numpy.arange(3.0), [1.0, 2.0, 3.0], 'bar')
+    B.add(numpy.arange(3.0, 11.0), numpy.arange(4.0, 12.0), 'hPa')  # more readings than the buffer length
+    B.add(11.0, 12.0, 'bar')
+    t, x, u = B.snapshot()
+    assert numpy.array_equal(t, [7.0, 8.0, 9.0, 10.0, 11.0])
+    assert numpy.array_equal(x, [8.0, 9.0, 10.0, 11.0, 12.0])
+    assert list(u) == ['hPa'] * 4 + ['bar']
+    B.add(12.0, 13.0, 'bar')
+    assert numpy.array_equal(t, [7.0, 8.0, 9.0, 10.0, 11.0])  # snapshot is a copy
+
+
+def test_window_and_stats():
+    B = sensorbuffer(max_len=100, history=False)
+    for k in (B.mean, B.min, B.max):
+        assert numpy.isnan(k())
+    assert B.last() == (None, None, '')
+    assert B.unit() == ''
+
+    t = numpy.arange(50.0)
+    x = numpy.sin(t)
+    x[45] = numpy.nan
+    B.add(t, x, 'V')
+
+    tw, xw = B.window(10)
+    assert numpy.array_equal(tw, t[39:])
+    tw, xw = B.window(10.5)
+    assert numpy.array_equal(tw, t[39:])
+    tw, xw = B.window()
+    assert numpy.array_equal(tw, t)
+
+    y = x[39:]
+    y = y[~numpy.isnan(y)]
+    assert numpy.isclose(B.mean(10), numpy.mean(y), rtol=1e-12, atol=0)
+    assert B.min(10) == numpy.min(y)
+    assert B.max(10) == numpy.max(y)
+    assert numpy.isclose(B.mean(), numpy.nanmean(x), rtol=1e-12, atol=0)
+    assert B.mean(0) == x[-1]
+
+
+def test_set_length_and_clear():
+    B = sensorbuffer(max_len=10, history=True)
+    B.add(numpy.arange(10.0), numpy.arange(10.0), 'C')
+    B.set_length(4)
+    t, x = B.data()
+    assert numpy.array_equal(t, [6.0, 7.0, 8.0, 9.0])
+    B.add(10.0, 10.0, 'C')
+    t, x = B.data()
+    assert numpy.array_equal(t, [7.0, 8.0, 9.0, 10.0])
+    B.set_length(8)
+    B.add(11.0, 11.0, 'C')
+    t, x = B.data()
+    assert numpy.array_equal(t, [7.0, 8.0, 9.0, 10.0, 11.0])
+
+    B.clear()
+    assert len(B) == 0 and len(B.data()[0]) == 0
+    t, x = B.history().raw()
+    assert numpy.array_equal(t, numpy.arange(12.0))  # history is kept